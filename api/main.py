@@ -1,7 +1,9 @@
 import os
+import json
+from contextlib import asynccontextmanager
 from typing import List, Optional, Any, Dict
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Depends
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -12,15 +14,92 @@ from src.document_ingestion.data_ingestion import DocHandler, DocumentComparator
 
 from src.document_analyzer.data_analysis import DocumentAnalyzer
 from src.document_comparison.document_comparator import DocumentComparatorLLM
-from src.document_chat.retrieval import ConversationalRAG
+from src.document_comparison.local_diff import LocalDiffEngine
+from src.document_ingestion.ingestion_jobs import IngestionJobQueue, SUCCEEDED, CANCELLED
+from src.document_chat.session_registry import SessionRegistry
+from src.document_chat.conversation_store import ConversationStore
+from src.document_chat.answer_cache import AnswerCache
+from utils.model_loader import ModelLoader
+from utils.pdf_engine import pdf_metadata
+from utils.file_io import UploadRejected, RequestSizeLimit, blob_dir
+from utils.result_cache import ResultCache, file_sha256
+from utils.storage_manager import StorageManager
+from utils import tracing
+from utils.config_loader import load_config
+from utils.concurrency import run_blocking, endpoint_limiters, shutdown_worker_pool, QueueFullError
+from utils.parallel_loader import shutdown_pool as shutdown_parse_pool
+from logger.custom_logger import CustomLogger
 
 
 
 FAISS_BASE = os.getenv("FAISS_BASE", "faiss_index")
 UPLOAD_BASE = os.getenv("UPLOAD_BASE", "data")
 FAISS_INDEX_NAME = os.getenv("FAISS_INDEX_NAME", "index")
+ANALYZER_BASE = os.getenv("DATA_STORAGE_PATH", os.path.join("data", "document_analyzer"))
+COMPARE_BASE = os.path.join("data", "document_comparison")
+COMPARE_MODES = ("llm", "local")
+
+SESSION_REGISTRY = SessionRegistry.from_config()
+CONVERSATIONS = ConversationStore.from_config()
+ENDPOINT_LIMITS = endpoint_limiters()
+INGESTION_JOBS = IngestionJobQueue.from_config(
+    temp_base=UPLOAD_BASE, faiss_base=FAISS_BASE, on_success=lambda job: SESSION_REGISTRY.invalidate(job["target"])
+)
+
+
+def _on_session_evicted(service: str, session_id: str, paths: List[str]):
+    if service == "chat":
+        SESSION_REGISTRY.invalidate(os.path.join(FAISS_BASE, session_id))
+        CONVERSATIONS.clear(session_id)
+
+STORAGE = StorageManager.from_config(
+    roots={"analyzer": [ANALYZER_BASE], "comparison": [COMPARE_BASE], "chat": [UPLOAD_BASE, FAISS_BASE]},
+    blob_root=str(blob_dir()),
+    pinned=[SESSION_REGISTRY.loaded_dirs, INGESTION_JOBS.active_dirs],
+    on_evict=_on_session_evicted,
+)
+
+log = CustomLogger().get_logger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    '''Build the shared model clients once at startup instead of inside request handlers.'''
+    try:
+        ModelLoader.warmup()
+    except Exception as e:
+        log.error("Model warmup failed; clients will be built on first use", error=str(e))
+    INGESTION_JOBS.start()
+    STORAGE.start()
+    yield
+    await STORAGE.stop()
+    await INGESTION_JOBS.stop()
+    shutdown_worker_pool()
+    shutdown_parse_pool()
+    CONVERSATIONS.close()
+    ModelLoader.reset()
+
+
+def limited(endpoint: str):
+    '''Dependency that holds one of the endpoint's concurrency slots for the request, or returns 429.'''
+    limiter = ENDPOINT_LIMITS.get(endpoint)
+
+    async def _slot():
+        if limiter is None:
+            yield
+            return
+        try:
+            await limiter.acquire()
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+        try:
+            yield
+        finally:
+            limiter.release()
+    return _slot
 
-app = FastAPI(title="Document Portal API", version="0.1")
+
+app = FastAPI(title="Document Portal API", version="0.1", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +108,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestSizeLimit)
+if tracing.enabled():
+    app.add_middleware(tracing.TracingMiddleware)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
@@ -46,41 +128,86 @@ async def serve_ui(request: Request):
 def health() -> Dict[str, str]:
     return {"status": "ok", "service": "document-portal"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Stage latency, request latency, LLM token, item count and cache histograms in Prometheus text format."""
+    return PlainTextResponse(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
+
 # ---------- ANALYZE ----------
-@app.post("/analyze")
-async def analyze_document(file: UploadFile = File(...)) -> Any:
+@app.post("/analyze", dependencies=[Depends(limited("analyze"))])
+async def analyze_document(file: UploadFile = File(...), use_cache: bool = Form(True)) -> Any:
+    """Analyze a PDF. Results are cached by file content unless use_cache is false (see X-Cache)."""
     try:
-        dh = DocHandler()
-        saved_path = dh.save_pdf(FastAPIFileAdapter(file))
-        text = _read_pdf_via_handler(dh, saved_path)
+        params = {"analysis": load_config().get("analysis")}
+        cache, key, cached = await _cached_result(use_cache, "analyze", [file], params)
+        if cached is not None:
+            return JSONResponse(content=cached, headers={"X-Cache": "HIT"})
+        dh = DocHandler(data_dir=ANALYZER_BASE)
+        STORAGE.touch("analyzer", dh.session_id)
+        saved_path = await run_blocking(dh.save_pdf, FastAPIFileAdapter(file))
+        pages = await run_blocking(dh.read_pdf_pages, saved_path)
+        pdf_meta = await run_blocking(pdf_metadata, saved_path)
         analyzer = DocumentAnalyzer()
-        result = analyzer.analyze_document(text)
-        return JSONResponse(content=result)
+        result = await analyzer.aanalyze_pages(pages, pdf_meta)
+        return JSONResponse(content=result, headers=await _store_result(cache, key, "analyze", result, analyzer.failed_calls))
     except HTTPException:
         raise
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {e}")
 
 # ---------- COMPARE ----------
-@app.post("/compare")
-async def compare_documents(reference: UploadFile = File(...), actual: UploadFile = File(...)) -> Any:
+@app.post("/compare", dependencies=[Depends(limited("compare"))])
+async def compare_documents(
+    reference: UploadFile = File(...),
+    actual: UploadFile = File(...),
+    mode: str = Form("llm"),
+    summarize: bool = Form(False),
+    use_cache: bool = Form(True),
+) -> Any:
+    """Compare two PDFs. mode "llm" compares changed pages with the LLM; mode "local" returns a
+    deterministic text diff, optionally explained by the LLM when summarize is set. Results are
+    cached by file content unless use_cache is false (see X-Cache); a cache hit saves no files, so
+    its session_id is null."""
     try:
-        dc = DocumentComparator()
-        ref_path, act_path = dc.save_uploaded_files(
-            FastAPIFileAdapter(reference), FastAPIFileAdapter(actual)
+        if mode not in COMPARE_MODES:
+            raise HTTPException(status_code=400, detail=f"mode must be one of {COMPARE_MODES}")
+        params = {"mode": mode, "summarize": summarize, "comparison": load_config().get("comparison")}
+        cache, key, cached = await _cached_result(use_cache, "compare", [reference, actual], params)
+        if cached is not None:
+            return JSONResponse(content={**cached, "session_id": None}, headers={"X-Cache": "HIT"})
+        dc = DocumentComparator(base_dir=COMPARE_BASE)
+        STORAGE.touch("comparison", dc.session_id)
+        ref_path, act_path = await run_blocking(
+            dc.save_uploaded_files, FastAPIFileAdapter(reference), FastAPIFileAdapter(actual)
         )
-        _ = ref_path, act_path
-        combined_text = dc.combine_documents()
-        comp = DocumentComparatorLLM()
-        df = comp.compare_documents(combined_text)
-        return {"rows": df.to_dict(orient="records"), "session_id": dc.session_id}
+        ref_pages = await run_blocking(dc.read_pdf_pages, ref_path)
+        act_pages = await run_blocking(dc.read_pdf_pages, act_path)
+        failed_calls = 0
+        if mode == "local":
+            rows = await run_blocking(LocalDiffEngine.from_config().compare, ref_pages, act_pages)
+            if summarize:
+                comp = DocumentComparatorLLM()
+                rows = (await comp.asummarize_diff(rows)).to_dict(orient="records")
+                failed_calls = comp.failed_calls
+        else:
+            comp = DocumentComparatorLLM()
+            rows = (await comp.acompare_pages(ref_pages, act_pages)).to_dict(orient="records")
+            failed_calls = comp.failed_calls
+        # The session directory may be evicted later, so only the current response carries its id
+        result = {"rows": rows, "mode": mode}
+        headers = await _store_result(cache, key, "compare", result, failed_calls)
+        return JSONResponse(content={**result, "session_id": dc.session_id}, headers=headers)
     except HTTPException:
         raise
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Comparison failed: {e}")
 
 # ---------- CHAT: INDEX ----------
-@app.post("/chat/index")
+@app.post("/chat/index", dependencies=[Depends(limited("chat_index"))])
 async def chat_build_index(
     files: List[UploadFile] = File(...),
     session_id: Optional[str] = Form(None),
@@ -88,8 +215,14 @@ async def chat_build_index(
     chunk_size: int = Form(1000),
     chunk_overlap: int = Form(200),
     k: int = Form(5),
+    background: bool = Form(True),
 ) -> Any:
+    """Save the uploads and queue an ingestion job (202 + job_id, poll /chat/index/jobs/{job_id}).
+    With background=false the request waits for the job and replies once the index is built.
+    Answers 429 while ingestion.jobs.max_queued jobs are waiting."""
     try:
+        if INGESTION_JOBS.full():
+            raise QueueFullError("Ingestion queue is full")
         wrapped = [FastAPIFileAdapter(f) for f in files]
         ci = ChatIngestor(
             temp_base=UPLOAD_BASE,
@@ -97,17 +230,48 @@ async def chat_build_index(
             use_session_dirs=use_session_dirs,
             session_id=session_id or None,
         )
-        ci.build_retriever(  
-            wrapped, chunk_size=chunk_size, chunk_overlap=chunk_overlap, k=k
-        )
-        return {"session_id": ci.session_id, "k": k, "use_session_dirs": use_session_dirs}
+        if use_session_dirs:
+            STORAGE.touch("chat", ci.session_id)
+        paths = await run_blocking(ci.save_uploads, wrapped)
+        options = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "k": k, "use_session_dirs": use_session_dirs}
+        job = INGESTION_JOBS.submit(ci, paths, options)
+        if not background:
+            job = await INGESTION_JOBS.wait(job["job_id"])
+            if job["status"] == CANCELLED:
+                raise HTTPException(status_code=409, detail="Indexing was cancelled")
+            if job["status"] != SUCCEEDED:
+                raise HTTPException(status_code=500, detail=f"Indexing failed: {job['error'] or job['status']}")
+            return {"session_id": ci.session_id, "k": k, "use_session_dirs": use_session_dirs}
+        return JSONResponse(status_code=202, content={**_job_view(job), "k": k, "use_session_dirs": use_session_dirs})
     except HTTPException:
         raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Indexing failed: {e}")
 
+
+@app.get("/chat/index/jobs/{job_id}")
+def chat_index_job(job_id: str) -> Dict[str, Any]:
+    """Status and stage-level progress of an ingestion job."""
+    job = INGESTION_JOBS.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return _job_view(job)
+
+
+@app.post("/chat/index/jobs/{job_id}/cancel")
+def chat_index_job_cancel(job_id: str) -> Dict[str, Any]:
+    """Cancel a queued job, or stop a running one after its current batch."""
+    job = INGESTION_JOBS.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return _job_view(job)
+
 # ---------- CHAT: QUERY ----------
-@app.post("/chat/query")
+@app.post("/chat/query", dependencies=[Depends(limited("chat_query"))])
 async def chat_query(
     question: str = Form(...),
     session_id: Optional[str] = Form(None),
@@ -121,10 +285,15 @@ async def chat_query(
         index_dir = os.path.join(FAISS_BASE, session_id) if use_session_dirs else FAISS_BASE 
         if not os.path.isdir(index_dir):
             raise HTTPException(status_code=404, detail=f"FAISS index not found at: {index_dir}")
+        if use_session_dirs:
+            STORAGE.touch("chat", session_id, written=False)
 
-        rag = ConversationalRAG(session_id=session_id)
-        rag.load_retriever_from_faiss(index_dir, k=k, index_name=FAISS_INDEX_NAME)
-        response = rag.invoke(question, chat_history=[])
+        rag = await run_blocking(
+            SESSION_REGISTRY.get, index_dir, k=k, index_name=FAISS_INDEX_NAME, session_id=session_id
+        )
+        history = await run_blocking(CONVERSATIONS.window, session_id) if session_id else []
+        response = await rag.ainvoke(question, chat_history=history)
+        await _remember(rag, session_id, question, response)
 
         return {
             "answer": response,
@@ -138,19 +307,121 @@ async def chat_query(
         raise HTTPException(status_code=500, detail=f"Query failed: {e}")
 
 
+# ---------- CHAT: HISTORY ----------
+@app.post("/chat/history/clear")
+async def chat_history_clear(session_id: str = Form(...)) -> Any:
+    """Forget the server-side conversation of a chat session."""
+    await run_blocking(CONVERSATIONS.clear, session_id)
+    return {"session_id": session_id, "cleared": True}
+
+
+@app.get("/storage/usage")
+def storage_usage() -> Dict[str, Any]:
+    """Disk usage of session directories per service, quotas, pinned sessions and evictions so far."""
+    return STORAGE.usage()
+
+
+@app.get("/chat/cache/stats")
+def chat_cache_stats() -> Dict[str, Any]:
+    """Hit rates of the answer cache and of the loaded-session registry."""
+    answers = AnswerCache.shared()
+    return {
+        "answers": answers.stats() if answers is not None else {"enabled": False},
+        "sessions": SESSION_REGISTRY.stats(),
+    }
+
+
+# ---------- CHAT: QUERY (STREAMING) ----------
+@app.post("/chat/query/stream", dependencies=[Depends(limited("chat_query"))])
+async def chat_query_stream(
+    question: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    use_session_dirs: bool = Form(True),
+    k: int = Form(5),
+) -> Any:
+    """Server-Sent Events variant of /chat/query: `token` events as they are generated, then `end`."""
+    if use_session_dirs and not session_id:
+        raise HTTPException(status_code=400, detail="session_id is required when use_session_dirs=True")
+
+    index_dir = os.path.join(FAISS_BASE, session_id) if use_session_dirs else FAISS_BASE
+    if not os.path.isdir(index_dir):
+        raise HTTPException(status_code=404, detail=f"FAISS index not found at: {index_dir}")
+
+    if use_session_dirs:
+        STORAGE.touch("chat", session_id, written=False)
+
+    try:
+        rag = await run_blocking(
+            SESSION_REGISTRY.get, index_dir, k=k, index_name=FAISS_INDEX_NAME, session_id=session_id
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {e}")
+
+    history = await run_blocking(CONVERSATIONS.window, session_id) if session_id else []
+
+    async def events():
+        try:
+            tokens = []
+            async for event in rag.astream(question, chat_history=history):
+                if event["type"] == "token":
+                    tokens.append(event["content"])
+                elif event["type"] == "end":
+                    await _remember(rag, session_id, question, "".join(tokens))
+                    event = {**event, "session_id": session_id, "k": k, "engine": "LCEL-RAG"}
+                yield _sse(event["type"], event)
+        except Exception as e:
+            yield _sse("error", {"detail": f"Query failed: {e}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
 # ---------- Helpers ----------
+async def _remember(rag, session_id: Optional[str], question: str, answer: str):
+    '''Record the exchange server-side; older turns are summarized in the background once over budget.'''
+    if session_id and await run_blocking(CONVERSATIONS.append, session_id, question, answer):
+        CONVERSATIONS.schedule_compaction(session_id, rag.asummarize)
+
+def _job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    '''Public fields of an ingestion job record (no server paths).'''
+    keys = ("job_id", "session_id", "status", "progress", "error", "coalesced", "created_at", "started_at", "finished_at")
+    return {**{key: job.get(key) for key in keys}, "files": len(job["files"])}
+
+
+async def _cached_result(use_cache: bool, kind: str, uploads: List[UploadFile], params: Dict[str, Any]):
+    '''(cache, key, cached result) for an upload request; cache is None when disabled or opted out.'''
+    cache = ResultCache.shared() if use_cache else None
+    if cache is None:
+        return None, None, None
+    digests = [await run_blocking(file_sha256, u.file) for u in uploads]
+    key = cache.key(kind, digests, params)
+    return cache, key, await run_blocking(cache.get, key)
+
+
+async def _store_result(cache: Optional[ResultCache], key: Optional[str], kind: str, result: Any, failed_calls: int) -> Dict[str, str]:
+    '''Cache a fresh result unless some LLM calls failed; returns the X-Cache header to send.'''
+    if cache is None:
+        return {"X-Cache": "BYPASS"}
+    if failed_calls:
+        log.warning("Result not cached after failed LLM calls", kind=kind, failed_calls=failed_calls)
+    else:
+        await run_blocking(cache.put, key, kind, result)
+    return {"X-Cache": "MISS"}
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
 class FastAPIFileAdapter:
-    '''Adapter to provide a file-like interface for FastAPI UploadFile.'''
+    '''Adapter to provide a streaming file-like interface (read/seek) for FastAPI UploadFile.'''
     def __init__(self, uf: UploadFile):
         self._uf = uf
         self.name = uf.filename
-    def getbuffer(self) -> bytes:
-        self._uf.file.seek(0)
-        return self._uf.file.read()
-
-def _read_pdf_via_handler(handler: DocHandler, path: str) -> str:
-    if hasattr(handler, "read_pdf"):
-        return handler.read_pdf(path) 
-    if hasattr(handler, "read_"):
-        return handler.read_(path) 
-    raise RuntimeError("DocHandler has neither read_pdf nor read_ method.")
+        self.size = uf.size
+    def seek(self, offset: int) -> int:
+        return self._uf.file.seek(offset)
+    def read(self, size: int = -1) -> bytes:
+        return self._uf.file.read(size)
@@ -0,0 +1,71 @@
+'''Single-call vs. chunked map-reduce /analyze on a long PDF, with a stubbed LLM.
+
+The single-call path sends the whole text in one prompt; map-reduce sends page chunks concurrently
+and merges the partial analyses. The stub LLM charges --llm-latency per call plus --ms-per-1k-chars
+of prompt, so one huge prompt costs more than many small parallel ones (and a real model would
+reject it once it exceeds the context window). Map-reduce is run at several concurrency limits to
+show wall time scaling with the degree of parallelism. PageCount, Title, Author and dates come from
+the PDF itself in every mode.
+
+Usage: python -m benchmarks.bench_analyzer --pages 100 --concurrency 2 4 8 16 --llm-latency 0.5 --ms-per-1k-chars 10
+'''
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+import fitz
+
+from benchmarks.stubs import install_stub_models
+from benchmarks.corpus import page_texts, write_pdf
+from utils.pdf_engine import iter_pdf_pages, pdf_metadata
+
+RESPONSE = json.dumps({
+    "Summary": ["Clauses on payment, delivery and termination."], "Title": "", "Author": [],
+    "DateCreated": "", "LastModifiedDate": "", "Publisher": "Example Corp", "language": "English",
+    "SentimentTone": "neutral",
+})
+
+
+async def run(pages: int, concurrency, llm_latency: float, ms_per_1k_chars: float):
+    llm, _ = install_stub_models(llm_latency=llm_latency, responses=[RESPONSE])
+    llm.latency_per_1k_chars = ms_per_1k_chars / 1000
+    from src.document_analyzer.data_analysis import DocumentAnalyzer
+
+    path = write_pdf(Path(tempfile.mkdtemp(prefix="bench_analyzer_")) / "contract.pdf", page_texts(pages))
+    with fitz.open(path) as doc:
+        doc.set_metadata({"title": "Master Services Agreement", "author": "Legal; Procurement",
+                          "creationDate": "D:20240102030405+01'00'"})
+        doc.saveIncr()
+    texts = [d.page_content for d in iter_pdf_pages(path)]
+    meta = pdf_metadata(path)
+    total = sum(len(t) for t in texts)
+
+    analyzer = DocumentAnalyzer()
+    prompts = []
+    original = llm._delay
+    object.__setattr__(llm, "_delay", lambda messages: prompts.append(sum(len(str(m.content)) for m in messages)) or original(messages))
+
+    print(f"{pages} pages, {total} chars, LLM latency {llm_latency:.1f}s/call + {ms_per_1k_chars:.0f}ms/1k chars")
+    print(f"{'mode':>16} {'LLM calls':>10} {'largest prompt':>15} {'wall s':>7}")
+    runs = [("single", "single", analyzer.max_concurrency)] + [(f"map-reduce x{c}", "map_reduce", c) for c in concurrency]
+    for name, mode, limit in runs:
+        analyzer.mode, analyzer.max_concurrency = mode, limit
+        prompts.clear()
+        t0 = time.perf_counter()
+        result = await analyzer.aanalyze_pages(texts, meta)
+        wall = time.perf_counter() - t0
+        print(f"{name:>16} {len(prompts):>10} {max(prompts):>15} {wall:>7.2f}")
+    print(f"\nlocal fields: " + ", ".join(f"{k}={result[k]!r}" for k in ("PageCount", "Title", "Author", "DateCreated")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[2, 4, 8, 16])
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--ms-per-1k-chars", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.pages, args.concurrency, args.llm_latency, args.ms_per_1k_chars))
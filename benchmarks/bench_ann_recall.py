@@ -0,0 +1,82 @@
+'''Recall@k vs. per-query latency for the faiss_db.index types on synthetic clustered vectors.
+
+Vectors are drawn around a few hundred random centres and L2-normalised, which is closer to real
+text embeddings than uniform noise. Ground truth is exact flat search; latency is single-query
+(batch of one), which is how the chat endpoints search.
+
+Usage: python -m benchmarks.bench_ann_recall --rows 20000 100000 --dim 256 --k 10 --spread 1.5
+'''
+import time
+import argparse
+
+import faiss
+import numpy as np
+
+from src.document_ingestion.ann_index import IndexSpec, build_index, tune
+
+SWEEPS = [
+    ("flat", {}),
+    ("ivf_flat", {"nprobe": 4}),
+    ("ivf_flat", {"nprobe": 16}),
+    ("ivf_flat", {"nprobe": 64}),
+    ("ivf_pq", {"nprobe": 16}),
+    ("ivf_pq", {"nprobe": 64}),
+    ("ivf_pq", {"nprobe": 16, "pq_m": 32}),
+    ("hnsw", {"ef_search": 16}),
+    ("hnsw", {"ef_search": 64}),
+    ("hnsw", {"ef_search": 128}),
+]
+
+
+def dataset(rows: int, dim: int, queries: int, spread: float, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(16, rows // 200), dim)).astype(np.float32)
+
+    def sample(n):
+        x = centres[rng.integers(len(centres), size=n)] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+        return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+    return np.ascontiguousarray(sample(rows)), np.ascontiguousarray(sample(queries))
+
+
+def index_mb(index) -> float:
+    return faiss.serialize_index(index).nbytes / 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[20000, 100000])
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--spread", type=float, default=1.5, help="cluster noise; larger is harder")
+    args = ap.parse_args()
+
+    for rows in args.rows:
+        xb, xq = dataset(rows, args.dim, args.queries, args.spread)
+        exact = faiss.IndexFlatL2(args.dim)
+        exact.add(xb)
+        _, truth = exact.search(xq, args.k)
+
+        print(f"\n{rows} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k}")
+        print(f"{'type':>9} {'params':>20} {'build s':>8} {'size MB':>8} {'recall':>7} {'ms/query':>9}")
+        built = {}
+        for kind, params in SWEEPS:
+            spec = IndexSpec(type=kind, **params)
+            key = (kind, params.get("pq_m"))
+            if key not in built:
+                t0 = time.perf_counter()
+                built[key] = (build_index(xb, spec), time.perf_counter() - t0)
+            index, build_s = built[key]
+            tune(index, spec)
+
+            t0 = time.perf_counter()
+            found = np.vstack([index.search(xq[i:i + 1], args.k)[1] for i in range(len(xq))])
+            ms = (time.perf_counter() - t0) * 1000 / len(xq)
+            recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+            label = ",".join(f"{k}={v}" for k, v in params.items()) or "-"
+            print(f"{kind:>9} {label:>20} {build_s:>8.1f} {index_mb(index):>8.1f} {recall:>7.3f} {ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
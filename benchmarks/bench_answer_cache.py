@@ -0,0 +1,87 @@
+'''Latency and hit rate of repeated chat questions with the answer cache off, exact-only, and exact + semantic.
+
+Questions are drawn with a skewed (Zipf) popularity from a small pool; each asked question is the
+original, a case/punctuation variant (an exact-tier hit), or a light rephrasing (semantic tier only).
+Halfway through, a batch of documents is appended to the session, which bumps the index version and
+must invalidate every cached answer.
+
+Usage: python -m benchmarks.bench_answer_cache --questions 300 --pool 20 --llm-latency 0.2
+'''
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+from benchmarks.stubs import install_stub_models
+from benchmarks.bench_hybrid_retrieval import HashedBagOfWords
+from utils.model_loader import ModelLoader
+from src.document_ingestion.segment_store import SegmentStore
+from src.document_chat.answer_cache import AnswerCache
+from src.document_chat.retrieval import ConversationalRAG
+
+TOPICS = [
+    "termination notice period", "late delivery penalty", "governing law", "liability cap",
+    "payment terms", "warranty period", "confidentiality obligations", "renewal term",
+    "audit rights", "insurance requirements", "dispute resolution", "assignment restrictions",
+    "subcontractor approval", "acceptance testing", "invoice schedule", "force majeure",
+    "data protection duties", "intellectual property ownership", "service levels", "exit assistance",
+]
+
+
+def variant(question: str, kind: int) -> str:
+    if kind == 1:
+        return question.upper().rstrip("?") + " ?"
+    if kind == 2:
+        return "Please tell me, " + question[0].lower() + question[1:]
+    return question
+
+
+def ingest(store: SegmentStore, emb, start: int, n: int):
+    texts = [f"Clause {i}: the {TOPICS[i % len(TOPICS)]} is set out in schedule {i}." for i in range(start, start + n)]
+    store.append(emb.embed_documents(texts), texts, [{"clause": i} for i in range(start, start + n)])
+
+
+async def run(questions: int, pool: int, llm_latency: float):
+    install_stub_models(llm_latency=llm_latency)
+    emb = HashedBagOfWords(256)
+    ModelLoader.load_embeddings = lambda self: emb
+    rng = np.random.default_rng(0)
+    weights = 1.0 / np.arange(1, pool + 1)
+    picks = rng.choice(pool, size=questions, p=weights / weights.sum())
+    kinds = rng.integers(3, size=questions)
+    asked = [variant(f"What is the {TOPICS[p % len(TOPICS)]}?", k) for p, k in zip(picks, kinds)]
+
+    print(f"{questions} questions over a pool of {pool}, LLM latency {llm_latency * 1000:.0f}ms")
+    print(f"{'cache':>16} {'hit rate':>9} {'p50 ms':>7} {'mean ms':>8} {'invalidated':>12}")
+    for name, cache in (
+        ("off", None),
+        ("exact", AnswerCache(semantic=False)),
+        ("exact+semantic", AnswerCache(semantic=True, similarity_threshold=0.8)),
+    ):
+        work = tempfile.mkdtemp(prefix="bench_answer_cache_")
+        store = SegmentStore(work)
+        ingest(store, emb, 0, 200)
+        rag = ConversationalRAG(session_id="bench")
+        rag.load_retriever_from_faiss(work, k=5)
+        rag.answer_cache = cache
+        latencies = []
+        for i, question in enumerate(asked):
+            if i == questions // 2:
+                ingest(store, emb, 200, 50)
+            t0 = asyncio.get_running_loop().time()
+            await rag.ainvoke(question)
+            latencies.append((asyncio.get_running_loop().time() - t0) * 1000)
+        stats = cache.stats() if cache else {"hit_rate": 0.0, "invalidated": 0}
+        print(f"{name:>16} {stats['hit_rate']:>9.2f} {statistics.median(latencies):>7.1f} "
+              f"{statistics.mean(latencies):>8.1f} {stats['invalidated']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--pool", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(run(args.questions, args.pool, args.llm_latency))
@@ -0,0 +1,90 @@
+'''Load benchmark: p50/p99 latency of /chat/query and /health under concurrent clients with a stubbed LLM.
+
+Usage: python -m benchmarks.bench_api_load --clients 32 --requests 8 --llm-latency 0.2
+'''
+import os
+import time
+import logging
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_api_")
+os.environ["FAISS_BASE"] = os.path.join(WORKDIR, "faiss_index")
+os.environ["UPLOAD_BASE"] = os.path.join(WORKDIR, "data")
+os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(WORKDIR, "embedding_cache")
+os.environ["INGESTION_JOBS_DB"] = os.path.join(WORKDIR, "ingestion_jobs.sqlite")
+
+import httpx
+
+from benchmarks.stubs import install_stub_models
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+async def build_session(client: httpx.AsyncClient) -> str:
+    corpus = "\n\n".join(f"Clause {i}: the supplier shall deliver item {i} within {i % 30} days." for i in range(400))
+    files = [("files", ("contract.txt", corpus.encode("utf-8"), "text/plain"))]
+    resp = await client.post("/chat/index", files=files, data={"background": "false"})
+    resp.raise_for_status()
+    return resp.json()["session_id"]
+
+
+async def run(clients: int, requests: int, llm_latency: float):
+    install_stub_models(llm_latency=llm_latency)
+    from api.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        session_id = await build_session(client)
+        query_lat, health_lat, rejected = [], [], 0
+
+        async def query_worker(i: int):
+            nonlocal rejected
+            for j in range(requests):
+                t0 = time.perf_counter()
+                resp = await client.post(
+                    "/chat/query", data={"question": f"When is item {i * requests + j} due?", "session_id": session_id}
+                )
+                if resp.status_code == 429:
+                    rejected += 1
+                    continue
+                resp.raise_for_status()
+                query_lat.append(time.perf_counter() - t0)
+
+        async def health_probe(stop: asyncio.Event):
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                await client.get("/health")
+                health_lat.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.01)
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(health_probe(stop))
+        t0 = time.perf_counter()
+        await asyncio.gather(*(query_worker(i) for i in range(clients)))
+        wall = time.perf_counter() - t0
+        stop.set()
+        await probe
+
+    print(f"clients={clients} requests/client={requests} llm_latency={llm_latency}s wall={wall:.2f}s")
+    print(f"/chat/query  n={len(query_lat)} rejected(429)={rejected} "
+          f"p50={percentile(query_lat, 50) * 1000:.1f}ms p99={percentile(query_lat, 99) * 1000:.1f}ms "
+          f"mean={statistics.mean(query_lat) * 1000:.1f}ms throughput={len(query_lat) / wall:.1f} req/s")
+    print(f"/health      n={len(health_lat)} p50={percentile(health_lat, 50) * 1000:.1f}ms "
+          f"p99={percentile(health_lat, 99) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.requests, args.llm_latency))
@@ -0,0 +1,76 @@
+'''Single-call vs. page-aligned map-reduce comparison of a revised PDF, with a stubbed LLM.
+
+The actual document is the reference with --edits pages reworded, one page inserted and one
+removed. The single-call path sends both full texts in one prompt (what /compare used to do); the
+map-reduce path aligns pages locally and only sends the changed page pairs, concurrently. The stub
+LLM charges --llm-latency per call plus --ms-per-1k-chars of prompt, so long prompts cost more; note
+that real models would reject the single-call prompt outright once it exceeds their context window.
+
+Usage: python -m benchmarks.bench_compare_pages --pages 200 --edits 10 --llm-latency 1.0 --ms-per-1k-chars 5
+'''
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+from langchain_core.runnables import RunnableLambda
+
+from benchmarks.stubs import install_stub_models
+from benchmarks.corpus import page_texts, synthetic_paragraph, write_pdf
+
+ROW = '[{"Page": "1", "Changes": "Clause wording changed."}]'
+
+
+def revise(texts, edits: int, seed: int = 1):
+    rng = random.Random(seed)
+    revised = list(texts)
+    for n in rng.sample(range(len(revised)), edits):
+        revised[n] = revised[n].replace("payment", "settlement", 1) + " " + synthetic_paragraph(rng, 20)
+    revised.insert(len(revised) // 3, "Section X\n\n" + synthetic_paragraph(rng))
+    del revised[2 * len(revised) // 3]
+    return revised
+
+
+async def run(pages: int, edits: int, llm_latency: float, ms_per_1k_chars: float):
+    llm, _ = install_stub_models(llm_latency=llm_latency, responses=[ROW])
+    llm.latency_per_1k_chars = ms_per_1k_chars / 1000
+    from src.document_ingestion.data_ingestion import DocumentComparator
+    from src.document_comparison.document_comparator import DocumentComparatorLLM
+
+    work = Path(tempfile.mkdtemp(prefix="bench_compare_"))
+    reference = page_texts(pages)
+    ref_path = write_pdf(work / "reference.pdf", reference)
+    act_path = write_pdf(work / "actual.pdf", revise(reference, edits))
+    dc = DocumentComparator(base_dir=str(work / "sessions"))
+    comp = DocumentComparatorLLM()
+
+    t0 = time.perf_counter()
+    combined = f"Document: reference.pdf\n{dc.read_pdf(ref_path)}\n\nDocument: actual.pdf\n{dc.read_pdf(act_path)}"
+    await comp.acompare_documents(combined)
+    single_s = time.perf_counter() - t0
+
+    calls = []
+    comp.page_chain = RunnableLambda(lambda x: calls.append(x) or x) | comp.page_chain
+    t0 = time.perf_counter()
+    df = await comp.acompare_pages(dc.read_pdf_pages(ref_path), dc.read_pdf_pages(act_path))
+    paged_s = time.perf_counter() - t0
+    prompt_chars = sum(len(i["reference_page"]) + len(i["actual_page"]) for i in calls)
+
+    print(f"{pages} pages, {edits} edited + 1 inserted + 1 removed, LLM latency {llm_latency:.1f}s/call")
+    print(f"{'mode':>11} {'LLM calls':>10} {'chars sent':>11} {'largest prompt':>15} {'wall s':>7}")
+    print(f"{'single':>11} {1:>10} {len(combined):>11} {len(combined):>15} {single_s:>7.2f}")
+    largest = max((len(i["reference_page"]) + len(i["actual_page"]) for i in calls), default=0)
+    print(f"{'map-reduce':>11} {len(calls):>10} {prompt_chars:>11} {largest:>15} {paged_s:>7.2f}")
+    print(f"\nrows: {len(df)}; pages reported: {', '.join(df['Page'].astype(str).unique()[:20])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--ms-per-1k-chars", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.pages, args.edits, args.llm_latency, args.ms_per_1k_chars))
@@ -0,0 +1,105 @@
+'''Content-addressed uploads and chunk deduplication when files are re-uploaded into a session.
+
+Every file carries the same boilerplate (a cover note and a disclaimer) with a small per-file
+variation, plus its own clauses. Round 1 uploads the files; round 2 uploads the same bytes again
+under new names, plus a few new files. The exact ledger skips everything seen before; the
+near-duplicate mode (SimHash) also skips the repeated boilerplate that differs only slightly.
+
+Usage: python -m benchmarks.bench_dedup --files 20 --clauses 30 --max-hamming 3
+'''
+import os
+import time
+import sqlite3
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.stubs import install_stub_models
+from benchmarks.corpus import synthetic_paragraph
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="bench_dedup_"))
+os.environ["EMBEDDING_CACHE_DIR"] = str(WORKDIR / "embedding_cache")
+os.environ["UPLOAD_BLOB_DIR"] = str(WORKDIR / "blobs")
+
+COVER = (
+    "This document is provided by the procurement office for the exclusive use of the named parties. "
+    "It supersedes all previous drafts and must be read together with the master services agreement, "
+    "the schedules and any amendments agreed in writing by the authorised representatives of both parties."
+)
+DISCLAIMER = (
+    "Disclaimer: nothing in this document creates a partnership, agency or joint venture between the parties. "
+    "No party may rely on any statement not expressly set out in this document. Confidential, do not forward "
+    "outside the organisations named above without the prior written consent of the legal department."
+)
+
+
+class Upload:
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self._data = data
+
+    def getbuffer(self) -> bytes:
+        return self._data
+
+
+def make_file(n: int, clauses: int) -> bytes:
+    rng = random.Random(n)
+    body = [synthetic_paragraph(rng, 110) for _ in range(clauses)]
+    # Boilerplate differs per file only by its reference number
+    cover = f"Reference PO-{1000 + n}. {COVER}"
+    disclaimer = f"{DISCLAIMER} Ref PO-{1000 + n}."
+    return "\n\n".join([cover] + body + [disclaimer]).encode("utf-8")
+
+
+def dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def run(files: int, clauses: int, max_hamming: int):
+    _, emb = install_stub_models(dim=64)
+    from src.document_ingestion import chunk_ledger
+    from src.document_ingestion.data_ingestion import ChatIngestor
+
+    first = [Upload(f"contract_{i}.txt", make_file(i, clauses)) for i in range(files)]
+    again = [Upload(f"copy_of_contract_{i}.txt", u.getbuffer()) for i, u in enumerate(first)]
+    extra = [Upload(f"new_{i}.txt", make_file(files + i, clauses)) for i in range(max(1, files // 5))]
+
+    print(f"{files} files x {clauses} clauses (+ cover and disclaimer); round 2 = same files renamed + {len(extra)} new")
+    print(f"near-duplicate boilerplate chunks: {2 * (files - 1)} in round 1, {2 * len(extra)} in round 2")
+    # Warm up the parse pool and model clients outside the timed runs
+    ChatIngestor(temp_base=str(WORKDIR / "warmup"), faiss_base=str(WORKDIR / "warmup"), session_id="w").build_retriever(
+        [Upload(f"warmup_{i}.txt", make_file(-1 - i, 2)) for i in range(8)]
+    )
+    warm_blobs, warm_bytes = len(list((WORKDIR / "blobs").rglob("*.txt"))), dir_bytes(WORKDIR / "blobs")
+    print(f"{'mode':>12} {'round':>6} {'chunks':>7} {'embedded':>9} {'skipped':>8} {'s':>6}")
+    for mode, near in (("exact", False), ("exact+near", True)):
+        chunk_ledger.ChunkLedger.from_config = classmethod(
+            lambda cls, d, near=near: cls(d, near_duplicates=near, max_hamming=max_hamming)
+        )
+        ci = ChatIngestor(temp_base=str(WORKDIR / mode / "data"), faiss_base=str(WORKDIR / mode / "faiss"), session_id="bench")
+        for name, uploads in (("1", first), ("2", again + extra)):
+            seen = []
+            t0 = time.perf_counter()
+            ci.build_retriever(uploads, progress=seen.append)
+            chunks, added = seen[-1].chunks, seen[-1].vectors_added
+            print(f"{mode:>12} {name:>6} {chunks:>7} {added:>9} {chunks - added:>8} {time.perf_counter() - t0:>6.2f}")
+        session = WORKDIR / mode / "data" / "bench"
+        index_dir = WORKDIR / mode / "faiss" / "bench"
+        db = sqlite3.connect(index_dir / chunk_ledger.LEDGER)
+        entries = db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        db.close()
+        size = sum(f.stat().st_size for f in index_dir.glob(f"{chunk_ledger.LEDGER}*"))
+        print(f"{'':>12} session files: {len(list(session.iterdir()))}, ledger: {entries} chunks, {size} bytes")
+    received = 2 * (len(first) + len(again) + len(extra))
+    blobs = len(list((WORKDIR / "blobs").rglob("*.txt"))) - warm_blobs
+    print(f"\nuploads received: {received}; blob store: {blobs} blobs, {dir_bytes(WORKDIR / 'blobs') - warm_bytes} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--clauses", type=int, default=30)
+    parser.add_argument("--max-hamming", type=int, default=3)
+    args = parser.parse_args()
+    run(args.files, args.clauses, args.max_hamming)
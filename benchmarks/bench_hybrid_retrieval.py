@@ -0,0 +1,126 @@
+'''Dense vs. BM25 vs. hybrid retrieval on a synthetic contract corpus: hit@k, query latency, index size.
+
+Each chunk cites a unique clause identifier such as "Section 12.3(b)"; each query asks about one.
+Dense search uses a local hashed bag-of-words embedding: like real embedding models it sees the
+tokens of "12.3(b)" but not their order, so it confuses 12.3(b) with 3.12(b).
+
+Usage: python -m benchmarks.bench_hybrid_retrieval --chunks 20000 --queries 200 --k 5
+'''
+import re
+import time
+import zlib
+import sqlite3
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.document_ingestion.segment_store import SegmentStore
+from src.document_chat.hybrid_retriever import HybridRetriever
+
+WORDS = (
+    "agreement party obligation termination notice payment liability indemnity warranty breach "
+    "confidential information license term renewal fee invoice schedule dispute arbitration law "
+    "governing assignment subcontractor insurance audit records delivery acceptance remedy damages"
+).split()
+PARTIES = ["Acme Corp", "Globex", "Initech", "Umbrella Ltd", "Stark Industries", "Wayne Enterprises"]
+
+
+class HashedBagOfWords(Embeddings):
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for tok in re.findall(r"\w+", text.lower()):
+            v[zlib.crc32(tok.encode()) % self.dim] += 1.0
+        n = np.linalg.norm(v)
+        return (v / n if n else v).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def clause_id(i: int) -> str:
+    return f"{i // 260 + 1}.{(i // 26) % 10 + 1}({chr(97 + i % 26)})"
+
+
+def corpus(n: int, rng):
+    texts = []
+    for i in range(n):
+        filler = " ".join(rng.choice(WORDS, size=120))
+        texts.append(f"Section {clause_id(i)}. {rng.choice(PARTIES)} shall {filler}.")
+    return texts
+
+
+def mb(path: Path) -> float:
+    return path.stat().st_size / 1e6
+
+
+def fts_mb(db_path: Path) -> float:
+    db = sqlite3.connect(str(db_path))
+    try:
+        return db.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'docs_fts%'").fetchone()[0] / 1e6
+    except sqlite3.OperationalError:
+        return float("nan")
+    finally:
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=20000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--dim", type=int, default=256)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    work = Path(tempfile.mkdtemp(prefix="bench_hybrid_"))
+    emb = HashedBagOfWords(args.dim)
+    texts = corpus(args.chunks, rng)
+    store = SegmentStore(work, max_segments=1_000_000)
+    t0 = time.perf_counter()
+    for start in range(0, len(texts), 1000):
+        batch = texts[start:start + 1000]
+        store.append(emb.embed_documents(batch), batch, [{"row": start + j} for j in range(len(batch))])
+    store.merge()
+    ingest_s = time.perf_counter() - t0
+
+    vs = store.load(emb)
+    hybrid = HybridRetriever(vectorstore=vs, k=args.k)
+    targets = rng.choice(args.chunks, size=args.queries, replace=False)
+    queries = [(f"What does section {clause_id(int(t))} require?", int(t)) for t in targets]
+
+    def dense(q):
+        return vs.similarity_search(q, k=args.k)
+
+    def sparse(q):
+        rows = [r for r, _ in vs.docstore.keyword_search(q, args.k)]
+        found = vs.docstore.get_many(rows)
+        return [found[r] for r in rows]
+
+    print(f"{args.chunks} chunks, {args.queries} clause queries, k={args.k} (ingest {ingest_s:.1f}s)")
+    print(f"{'mode':>7} {'hit@k':>6} {'p50 ms':>7} {'p95 ms':>7}")
+    for name, fn in (("dense", dense), ("bm25", sparse), ("hybrid", hybrid.invoke)):
+        hits, lat = 0, []
+        for q, target in queries:
+            t0 = time.perf_counter()
+            docs = fn(q)
+            lat.append((time.perf_counter() - t0) * 1000)
+            hits += any(d.metadata.get("row") == target for d in docs)
+        print(f"{name:>7} {hits / len(queries):>6.2f} {np.percentile(lat, 50):>7.2f} {np.percentile(lat, 95):>7.2f}")
+
+    vectors = sum(mb(p) for p in work.glob("*.faiss"))
+    print(f"\nvectors {vectors:.1f} MB, docstore {mb(work / 'docstore.sqlite'):.1f} MB "
+          f"of which BM25 index {fts_mb(work / 'docstore.sqlite'):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
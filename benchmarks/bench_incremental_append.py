@@ -0,0 +1,85 @@
+'''Cost of appending a batch to a growing index: full save_local() rewrite vs. segment append.
+
+Random vectors stand in for embeddings so only the persistence path is measured.
+
+Usage: python -m benchmarks.bench_incremental_append --batches 40 --batch-size 256 --dim 768
+'''
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_community.embeddings import FakeEmbeddings
+
+from src.document_ingestion.segment_store import SegmentStore
+
+
+def dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.iterdir() if p.is_file())
+
+
+def batch(rng, i: int, size: int, dim: int):
+    vectors = rng.standard_normal((size, dim)).astype(np.float32)
+    texts = [f"batch {i} chunk {j} " + "lorem ipsum " * 60 for j in range(size)]
+    metadatas = [{"source": f"doc_{i}.pdf", "page": j} for j in range(size)]
+    return vectors, texts, metadatas
+
+
+def run_legacy(work: Path, batches: int, size: int, dim: int):
+    rng = np.random.default_rng(0)
+    emb = FakeEmbeddings(size=dim)
+    vs, times = None, []
+    for i in range(batches):
+        vectors, texts, metadatas = batch(rng, i, size, dim)
+        t0 = time.perf_counter()
+        pairs = list(zip(texts, vectors.tolist()))
+        if vs is None:
+            vs = FAISS.from_embeddings(pairs, emb, metadatas=metadatas)
+        else:
+            vs.add_embeddings(pairs, metadatas=metadatas)
+        vs.save_local(str(work))
+        times.append(time.perf_counter() - t0)
+    return times, dir_bytes(work)
+
+
+def run_segments(work: Path, batches: int, size: int, dim: int):
+    rng = np.random.default_rng(0)
+    store = SegmentStore(work, max_segments=8)
+    times = []
+    for i in range(batches):
+        vectors, texts, metadatas = batch(rng, i, size, dim)
+        t0 = time.perf_counter()
+        store.append(vectors, texts, metadatas)
+        times.append(time.perf_counter() - t0)
+    time.sleep(0.5)  # let a pending background merge settle before measuring size and load
+    t0 = time.perf_counter()
+    vs = store.load(FakeEmbeddings(size=dim))
+    load_s = time.perf_counter() - t0
+    return times, dir_bytes(work), load_s, vs.index.ntotal, len(store.read_manifest()["segments"])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batches", type=int, default=40)
+    ap.add_argument("--batch-size", type=int, default=256)
+    ap.add_argument("--dim", type=int, default=768)
+    args = ap.parse_args()
+
+    legacy, legacy_bytes = run_legacy(Path(tempfile.mkdtemp()), args.batches, args.batch_size, args.dim)
+    seg, seg_bytes, load_s, rows, segments = run_segments(
+        Path(tempfile.mkdtemp()), args.batches, args.batch_size, args.dim
+    )
+
+    print(f"{'batch':>6} {'rows':>8} {'save_local ms':>14} {'segment ms':>11}")
+    step = max(1, args.batches // 10)
+    for i in list(range(0, args.batches, step)) + [args.batches - 1]:
+        print(f"{i + 1:>6} {(i + 1) * args.batch_size:>8} {legacy[i] * 1000:>14.1f} {seg[i] * 1000:>11.1f}")
+    print(f"\ntotal append time: save_local {sum(legacy):.2f}s, segments {sum(seg):.2f}s")
+    print(f"on disk: save_local {legacy_bytes / 1e6:.1f} MB, segments {seg_bytes / 1e6:.1f} MB ({segments} segments)")
+    print(f"segment load: {rows} rows in {load_s * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
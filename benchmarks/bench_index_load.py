@@ -0,0 +1,96 @@
+'''Session index load time and private memory: FAISS.load_local() (pickle) vs. memory-mapped segments.
+
+Each load runs in a fresh subprocess; "private MB" is the growth in anonymous (non file-backed)
+resident memory, i.e. what every worker process would pay for its own copy of the index.
+
+Usage: python -m benchmarks.bench_index_load --rows 10000 50000 100000 --dim 768
+'''
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+
+def anon_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def build(work: Path, rows: int, dim: int):
+    import numpy as np
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.embeddings import FakeEmbeddings
+    from src.document_ingestion.segment_store import SegmentStore
+
+    rng = np.random.default_rng(0)
+    emb = FakeEmbeddings(size=dim)
+    store = SegmentStore(work / "segments", max_segments=1_000_000)
+    legacy = None
+    for start in range(0, rows, 5000):
+        n = min(5000, rows - start)
+        vectors = rng.standard_normal((n, dim)).astype(np.float32)
+        texts = [f"chunk {start + j} " + "lorem ipsum " * 60 for j in range(n)]
+        metadatas = [{"source": "doc.pdf", "page": (start + j) // 4} for j in range(n)]
+        store.append(vectors, texts, metadatas)
+        pairs = list(zip(texts, vectors.tolist()))
+        if legacy is None:
+            legacy = FAISS.from_embeddings(pairs, emb, metadatas=metadatas)
+        else:
+            legacy.add_embeddings(pairs, metadatas=metadatas)
+    store.merge()
+    legacy.save_local(str(work / "legacy"))
+
+
+def child(work: Path, mode: str, dim: int):
+    import numpy as np
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.embeddings import FakeEmbeddings
+    from src.document_ingestion.segment_store import SegmentStore
+
+    emb = FakeEmbeddings(size=dim)
+    before = anon_mb()
+    t0 = time.perf_counter()
+    if mode == "pickle":
+        vs = FAISS.load_local(str(work / "legacy"), emb, allow_dangerous_deserialization=True)
+    else:
+        vs = SegmentStore(work / "segments").load(emb)
+    load_s = time.perf_counter() - t0
+    query = np.random.default_rng(1).standard_normal(dim).tolist()
+    t0 = time.perf_counter()
+    vs.similarity_search_by_vector(query, k=5)
+    first_query_s = time.perf_counter() - t0
+    print(json.dumps({"load_ms": load_s * 1000, "first_query_ms": first_query_s * 1000, "private_mb": anon_mb() - before}))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 100000])
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(Path(args.child[0]), args.child[1], args.dim)
+        return
+
+    print(f"{'rows':>8} {'mode':>8} {'load ms':>9} {'1st query ms':>13} {'private MB':>11}")
+    for rows in args.rows:
+        work = Path(tempfile.mkdtemp(prefix="bench_load_"))
+        build(work, rows, args.dim)
+        for mode in ("pickle", "mmap"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_index_load", "--dim", str(args.dim), "--child", str(work), mode],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(out)
+            print(f"{rows:>8} {mode:>8} {r['load_ms']:>9.1f} {r['first_query_ms']:>13.1f} {r['private_mb']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+'''Peak RSS of chat ingestion as the corpus grows: materialized pipeline vs. streaming batches.
+
+Each (mode, corpus size) runs in a fresh subprocess so ru_maxrss reflects that run only.
+Parsing is pinned to one in-process worker so both modes are measured in the same process.
+Streaming growth is not flat: it levels off as the SQLite page caches of the docstore, chunk
+ledger and embedding cache reach their per-connection cap, instead of tracking the corpus.
+
+Usage: python -m benchmarks.bench_ingestion_memory --pages 250 500 1000 2000
+'''
+import os
+import sys
+import json
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode: str, pages: int, batch_size: int):
+    work = Path(tempfile.mkdtemp(prefix="bench_mem_"))
+    os.chdir(work)
+    os.environ["EMBEDDING_CACHE_DIR"] = str(work / "embedding_cache")
+
+    from benchmarks.stubs import install_stub_models
+    from benchmarks.corpus import make_pdf
+    import utils.document_ops as ops
+
+    cfg = ops.load_config()
+    cfg["document_parsing"]["max_workers"] = 1
+    ops.load_config = lambda: cfg
+    install_stub_models(dim=64)
+
+    from src.document_ingestion.data_ingestion import ChatIngestor, FaissManager
+    from utils.file_io import save_uploaded_files
+
+    pdfs = [make_pdf(work / f"doc_{i}.pdf", pages=50, seed=i) for i in range(pages // 50)]
+
+    class Upload:
+        def __init__(self, path: Path):
+            self.name = path.name
+            self._path = path
+
+        def getbuffer(self) -> bytes:
+            return self._path.read_bytes()
+
+    uploads = [Upload(p) for p in pdfs]
+    ci = ChatIngestor(temp_base="data", faiss_base="faiss_index", session_id="bench")
+    baseline = rss_mb()
+
+    if mode == "streaming":
+        ci.build_retriever(uploads, batch_size=batch_size)
+    else:
+        paths = save_uploaded_files(uploads, ci.temp_dir)
+        docs = ops.load_documents(paths, max_workers=1)
+        chunks = ci._split(docs)
+        with FaissManager(ci.faiss_dir, ci.model_loader) as fm:
+            fm.load_or_create(texts=[c.page_content for c in chunks], metadatas=[c.metadata for c in chunks])
+            fm.add_documents(chunks)
+
+    print(json.dumps({"baseline_mb": baseline, "peak_mb": rss_mb()}))
+
+
+def main(sizes, batch_size: int):
+    print(f"{'pages':>6} {'materialized':>14} {'streaming':>11}   (peak RSS growth over baseline, MB)")
+    for pages in sizes:
+        row = []
+        for mode in ("materialized", "streaming"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_ingestion_memory", "--child", mode,
+                 "--pages", str(pages), "--batch-size", str(batch_size)],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(out)
+            row.append(r["peak_mb"] - r["baseline_mb"])
+        print(f"{pages:>6} {row[0]:>14.1f} {row[1]:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[250, 500, 1000, 2000])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--child", choices=["materialized", "streaming"])
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.pages[0], args.batch_size)
+    else:
+        main(args.pages, args.batch_size)
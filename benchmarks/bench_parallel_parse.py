@@ -0,0 +1,52 @@
+'''Throughput of load_documents on a synthetic corpus of many PDFs, serial vs. process-parallel.
+
+Usage: python -m benchmarks.bench_parallel_parse --files 40 --pages 20 --workers 1 2 4 8
+'''
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.corpus import make_pdf, make_pdf_corpus
+from utils.document_ops import load_documents
+from utils.parallel_loader import pool_size, shutdown_pool
+
+
+def main(files: int, pages: int, workers_list, repeat: int):
+    work = Path(tempfile.mkdtemp(prefix="bench_parse_"))
+    paths = make_pdf_corpus(work / "pdfs", files, pages)
+    corrupt = work / "pdfs" / "corrupt.pdf"
+    corrupt.write_bytes(b"%PDF-1.7\nthis is not really a pdf")
+    paths.insert(len(paths) // 2, corrupt)
+    print(f"corpus: {files} PDFs x {pages} pages (+1 corrupt file), shared pool of {pool_size()} processes")
+
+    baseline = None
+    for workers in workers_list:
+        load_documents(paths[:2], max_workers=workers)  # warm the pool
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            docs = load_documents(paths, max_workers=workers)
+            best = min(best, time.perf_counter() - t0)
+        order = [(d.metadata["source"], d.metadata["page"]) for d in docs]
+        assert order == sorted(order), "output must stay in (file, page) order"
+        baseline = baseline or best
+        print(f"workers={min(workers, pool_size()):<3} pages={len(docs):<6} time={best:.2f}s "
+              f"pages/s={len(docs) / best:.0f} speedup={baseline / best:.2f}x")
+
+    big = make_pdf(work / "big.pdf", pages=400)
+    for workers in (1, max(workers_list)):
+        t0 = time.perf_counter()
+        docs = load_documents([big], max_workers=workers)
+        print(f"single 400-page PDF, workers={workers}: {time.perf_counter() - t0:.2f}s ({len(docs)} pages)")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+    main(args.files, args.pages, args.workers, args.repeat)
@@ -0,0 +1,41 @@
+'''Single-process PDF text extraction throughput: shared PyMuPDF engine vs. LangChain's PyPDFLoader.
+
+Usage: python -m benchmarks.bench_pdf_extraction --files 10 --pages 50
+'''
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from langchain_community.document_loaders import PyPDFLoader
+
+from benchmarks.corpus import make_pdf_corpus
+from utils.pdf_engine import iter_pdf_pages
+
+
+def timed(label, fn, paths):
+    t0 = time.perf_counter()
+    pages = chars = 0
+    for p in paths:
+        for d in fn(p):
+            pages += 1
+            chars += len(d.page_content)
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<12} pages={pages:<6} chars={chars:<9} time={elapsed:.2f}s pages/s={pages / elapsed:.0f}")
+    return elapsed
+
+
+def main(files: int, pages: int):
+    paths = make_pdf_corpus(Path(tempfile.mkdtemp(prefix="bench_pdf_")), files, pages)
+    print(f"corpus: {files} PDFs x {pages} pages")
+    slow = timed("PyPDFLoader", lambda p: PyPDFLoader(str(p)).lazy_load(), paths)
+    fast = timed("PyMuPDF", iter_pdf_pages, paths)
+    print(f"speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+    main(args.files, args.pages)
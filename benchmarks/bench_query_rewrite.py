@@ -0,0 +1,68 @@
+'''Per-stage latency of a chat turn with the question rewrite always run vs. routed (query_rewrite.mode).
+
+"always" with no cache is the old graph: every turn pays an LLM rewrite before retrieval. "auto" skips
+it without history or for self-contained questions and caches rewrites of repeated follow-ups.
+
+Usage: python -m benchmarks.bench_query_rewrite --turns 5 --llm-latency 0.3
+'''
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.stubs import install_stub_models
+from src.document_ingestion.segment_store import SegmentStore
+from src.document_chat.hybrid_retriever import make_retriever
+from src.document_chat.query_rewrite import QueryRewriter
+from src.document_chat.retrieval import ConversationalRAG
+
+HISTORY = [
+    HumanMessage(content="Which clause covers late delivery penalties?"),
+    AIMessage(content="Clause 14 sets a penalty of 2% of the order value per week of delay."),
+]
+SCENARIOS = [
+    ("no history", "What is the termination notice period?", []),
+    ("self-contained", "What is the termination notice period for the supplier?", HISTORY),
+    ("follow-up", "Is it capped?", HISTORY),
+    ("repeat follow-up", "Is it capped?", HISTORY),
+]
+
+
+async def measure(rag: ConversationalRAG, question: str, history) -> dict:
+    async for event in rag.astream(question, chat_history=history):
+        if event["type"] == "end":
+            return event["timing"]
+
+
+async def run(turns: int, llm_latency: float):
+    _, emb = install_stub_models(llm_latency=llm_latency, responses=["Clause 14 caps penalties at 10%."])
+    store = SegmentStore(tempfile.mkdtemp(prefix="bench_rewrite_"))
+    texts = [f"Clause {i}: the supplier shall pay a penalty of {i}% per week of delay." for i in range(200)]
+    store.append(emb.embed_documents(texts), texts, [{"clause": i} for i in range(len(texts))])
+    retriever = make_retriever(store.load(emb), k=5)
+
+    print(f"LLM latency {llm_latency * 1000:.0f}ms, median of {turns} turns per row")
+    print(f"{'mode':>7} {'scenario':>17} {'rewrite':>8} {'rewrite ms':>11} {'retrieval ms':>13} {'total ms':>9}")
+    for mode, cache_size in (("always", 0), ("auto", 1024)):
+        rag = ConversationalRAG(session_id="bench", retriever=retriever)
+        rag.rewriter = QueryRewriter(rag.rewriter.chain, mode=mode, cache_size=cache_size)
+        for name, question, history in SCENARIOS:
+            if name == "follow-up":
+                rag.rewriter._cache.clear()
+                timings = [await measure(rag, question, history)]
+            else:
+                timings = [await measure(rag, question, history) for _ in range(turns)]
+            med = lambda key: statistics.median(t[key] for t in timings)
+            print(f"{mode:>7} {name:>17} {timings[-1]['rewrite']:>8} {med('rewrite_ms'):>11.1f} "
+                  f"{med('retrieval_ms'):>13.1f} {med('total_ms'):>9.1f}")
+        print(f"{'':>7} {'counts':>17} {rag.rewriter.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    args = parser.parse_args()
+    asyncio.run(run(args.turns, args.llm_latency))
@@ -0,0 +1,74 @@
+'''Storage manager passes over many session directories: full walk vs. the incremental index.
+
+Creates --sessions chat sessions (an upload and an index directory each) plus analyzer sessions,
+then times a naive pass that walks every file of every session, the manager's first pass (which
+measures everything once), a steady-state pass after --touched sessions were written to, and a
+pass that evicts down to a global quota with some sessions pinned as loaded.
+
+Usage: python -m benchmarks.bench_storage_gc --sessions 2000 --files 8 --touched 20
+'''
+import os
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+from utils.storage_manager import StorageManager, disk_usage
+
+
+def make_session(path: Path, files: int, rng: random.Random):
+    path.mkdir(parents=True, exist_ok=True)
+    for i in range(files):
+        (path / f"part_{i}.bin").write_bytes(os.urandom(rng.randint(2, 16) << 10))
+
+
+def run(sessions: int, files: int, touched: int, pinned_count: int):
+    work = Path(tempfile.mkdtemp(prefix="bench_storage_"))
+    roots = {
+        "analyzer": [str(work / "data" / "document_analyzer")],
+        "comparison": [str(work / "data" / "document_comparison")],
+        "chat": [str(work / "data"), str(work / "faiss_index")],
+    }
+    rng = random.Random(0)
+    chat_ids = [f"session_{i:05d}" for i in range(sessions)]
+    for sid in chat_ids:
+        make_session(work / "data" / sid, files // 2, rng)
+        make_session(work / "faiss_index" / sid, files - files // 2, rng)
+    for i in range(sessions // 4):
+        make_session(work / "data" / "document_analyzer" / f"session_a{i:05d}", 2, rng)
+
+    t0 = time.perf_counter()
+    naive = disk_usage(str(work / "data")) + disk_usage(str(work / "faiss_index"))
+    naive_s = time.perf_counter() - t0
+
+    pinned = {os.path.abspath(work / "faiss_index" / sid) for sid in chat_ids[:pinned_count]}
+    sm = StorageManager(str(work / "storage.sqlite"), roots, min_idle_seconds=0, pinned=[lambda: pinned])
+    first = sm.collect()
+    for sid in rng.sample(chat_ids, touched):
+        (work / "faiss_index" / sid / "extra.bin").write_bytes(os.urandom(4 << 10))
+        sm.touch("chat", sid)
+    steady = sm.collect()
+    total = sm.usage()["total_bytes"]
+    sm.max_total_bytes = total // 2
+    evict = sm.collect()
+    after = sm.usage()
+
+    print(f"{sessions} chat + {sessions // 4} analyzer sessions, {files} files each, {total / (1 << 20):.1f} MB")
+    print(f"{'pass':>28} {'measured':>9} {'evicted':>8} {'ms':>8}")
+    print(f"{'naive walk of every file':>28} {sessions + sessions // 4:>9} {0:>8} {naive_s * 1000:>8.1f}")
+    for name, r in (("first (index built)", first), (f"steady ({touched} touched)", steady), ("evict to 50% quota", evict)):
+        print(f"{name:>28} {r['measured']:>9} {r['evicted']:>8} {r['ms']:>8.1f}")
+    chat_left = after["services"]["chat"]
+    print(f"\nafter eviction: {after['total_bytes'] / (1 << 20):.1f} MB, chat sessions left {chat_left['sessions']}"
+          f" ({chat_left['pinned']} pinned, all {pinned_count} kept: {chat_left['pinned'] == pinned_count})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--touched", type=int, default=20)
+    parser.add_argument("--pinned", type=int, default=50)
+    args = parser.parse_args()
+    run(args.sessions, args.files, args.touched, args.pinned)
@@ -0,0 +1,89 @@
+'''Time-to-first-token of /chat/query/stream versus total latency of /chat/query, with a stubbed LLM.
+
+The stub LLM takes --llm-latency seconds per non-streamed call and streams its answer one character
+every --token-delay seconds.
+
+Usage: python -m benchmarks.bench_streaming --queries 10
+'''
+import os
+import time
+import json
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_stream_")
+os.environ["FAISS_BASE"] = os.path.join(WORKDIR, "faiss_index")
+os.environ["UPLOAD_BASE"] = os.path.join(WORKDIR, "data")
+os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(WORKDIR, "embedding_cache")
+os.environ["INGESTION_JOBS_DB"] = os.path.join(WORKDIR, "ingestion_jobs.sqlite")
+
+import httpx
+import uvicorn
+
+from benchmarks.stubs import install_stub_models
+from benchmarks.bench_api_load import build_session
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+ANSWER = "The supplier must deliver each item within the number of days stated in its clause. " * 3
+
+
+def serve(app, port: int) -> uvicorn.Server:
+    '''Run the app on a real server; httpx's in-process ASGI transport buffers whole responses.'''
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run(queries: int, llm_latency: float, token_delay: float, port: int):
+    install_stub_models(llm_latency=llm_latency, token_delay=token_delay, responses=[ANSWER])
+    from api.main import app
+
+    server = serve(app, port)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+        session_id = await build_session(client)
+        data = {"question": "When is item 7 due?", "session_id": session_id}
+
+        blocking = []
+        for _ in range(queries):
+            t0 = time.perf_counter()
+            (await client.post("/chat/query", data=data)).raise_for_status()
+            blocking.append(time.perf_counter() - t0)
+
+        ttft, total, tokens = [], [], 0
+        for _ in range(queries):
+            t0 = time.perf_counter()
+            first = None
+            async with client.stream("POST", "/chat/query/stream", data=data) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if line.startswith("event: token") and first is None:
+                        first = time.perf_counter() - t0
+                    elif line.startswith("data: ") and '"type": "end"' in line:
+                        end = json.loads(line[len("data: "):])
+                        assert end["sources"], "end event carries the retrieved sources"
+                    if line.startswith("event: token"):
+                        tokens += 1
+            ttft.append(first)
+            total.append(time.perf_counter() - t0)
+    server.should_exit = True
+
+    ms = lambda xs: f"{statistics.median(xs) * 1000:.0f}ms"
+    print(f"/chat/query         total(p50)={ms(blocking)}")
+    print(f"/chat/query/stream  first token(p50)={ms(ttft)} total(p50)={ms(total)} tokens/query={tokens // queries}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(run(args.queries, args.llm_latency, args.token_delay, args.port))
@@ -0,0 +1,86 @@
+'''Cost of the tracing layer: per-span overhead and end-to-end ingestion with tracing on vs. off.
+
+The first table times an empty span() block with tracing disabled, enabled, and enabled inside a
+request scope (where timings are also collected for the request log). The second ingests the
+same generated PDFs into fresh indexes with tracing toggled, alternating runs so both modes see
+the same warm caches, and reports the median wall time of each.
+
+Usage: python -m benchmarks.bench_tracing_overhead --spans 200000 --files 6 --pages 40 --runs 5
+'''
+import os
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+from benchmarks.stubs import install_stub_models
+from benchmarks.corpus import make_pdf_corpus
+from utils import tracing
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="bench_tracing_"))
+os.environ["EMBEDDING_CACHE_DIR"] = str(WORKDIR / "embedding_cache")
+os.environ["UPLOAD_BLOB_DIR"] = str(WORKDIR / "blobs")
+
+
+class Upload:
+    def __init__(self, path: Path):
+        self.name = path.name
+        self._path = path
+
+    def getbuffer(self) -> bytes:
+        return self._path.read_bytes()
+
+
+def span_cost(n: int, on: bool, scoped: bool) -> float:
+    '''Nanoseconds per empty span block.'''
+    tracing.set_enabled(on)
+    with tracing.stage_scope() if scoped else tracing._NO_SPAN:
+        t0 = time.perf_counter_ns()
+        for _ in range(n):
+            with tracing.span("bench.noop"):
+                pass
+        return (time.perf_counter_ns() - t0) / n
+
+
+def run(spans: int, files: int, pages: int, runs: int):
+    print(f"{'span() mode':>24} {'ns/span':>8}")
+    baseline_t0 = time.perf_counter_ns()
+    for _ in range(spans):
+        pass
+    print(f"{'(empty loop)':>24} {(time.perf_counter_ns() - baseline_t0) / spans:>8.0f}")
+    for name, on, scoped in (("disabled", False, False), ("enabled", True, False), ("enabled, in request", True, True)):
+        print(f"{name:>24} {span_cost(spans, on, scoped):>8.0f}")
+
+    install_stub_models(dim=64, embedding_latency=0.0)
+    from src.document_ingestion.data_ingestion import ChatIngestor
+
+    pdfs = make_pdf_corpus(WORKDIR / "corpus", files=files, pages=pages)
+    walls, traced = {False: [], True: []}, {}
+    for i in range(runs * 2 + 1):
+        on = bool(i % 2)
+        tracing.set_enabled(on)
+        ci = ChatIngestor(temp_base=str(WORKDIR / "data"), faiss_base=str(WORKDIR / "faiss"), session_id=f"run_{i}")
+        with tracing.stage_scope() as stages:
+            t0 = time.perf_counter()
+            ci.build_retriever([Upload(p) for p in pdfs])
+            wall = time.perf_counter() - t0
+        if i:  # the first run warms the parse pool and embedding cache
+            walls[on].append(wall)
+        if on:
+            traced = stages.summary()
+    off, on = statistics.median(walls[False]), statistics.median(walls[True])
+    print(f"\ningesting {files} PDFs x {pages} pages, median of {runs} runs each")
+    print(f"{'tracing':>10} {'wall s':>8}")
+    print(f"{'off':>10} {off:>8.3f}\n{'on':>10} {on:>8.3f}   ({(on - off) / off * 100:+.1f}%)")
+    print(f"stages of the last traced run (ms): {traced}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--spans", type=int, default=200000)
+    parser.add_argument("--files", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run(args.spans, args.files, args.pages, args.runs)
@@ -0,0 +1,133 @@
+'''Peak RSS of saving uploads: whole-file buffering vs. streaming chunks into the blob store.
+
+The buffered mode hands the saver an upload that only offers getbuffer(), so the whole file is
+read into memory before it is hashed and written (the previous behaviour). The streaming mode reads
+the same on-disk upload in fixed-size chunks, hashing as it copies. Each (mode, size) runs in a
+fresh subprocess so ru_maxrss reflects that run only; --concurrent uploads are saved at once from
+a thread pool, as the API's worker threads would. Finally, a non-PDF and an oversized upload are
+rejected, showing how little of each is read (in the API these files are already spooled; only
+RequestSizeLimit refuses a request before its body is read).
+
+Usage: python -m benchmarks.bench_upload_memory --sizes 16 64 256 --concurrent 4 --chunk-kb 1024
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_upload(path: Path, size_mb: int, seed: int, header: bytes = b"%PDF-1.7\n") -> Path:
+    '''A file of size_mb MB that starts like a PDF, written in 1 MB pieces.'''
+    with open(path, "wb") as f:
+        f.write(header)
+        for i in range(size_mb):
+            f.write(seed.to_bytes(4, "little") + os.urandom((1 << 20) - 4) if i == 0 else os.urandom(1 << 20))
+    return path
+
+
+class BufferedUpload:
+    '''Upload that can only be read whole.'''
+    def __init__(self, path: Path):
+        self.name = path.name
+        self._path = path
+
+    def getbuffer(self) -> bytes:
+        return self._path.read_bytes()
+
+
+class StreamingUpload:
+    '''Upload read in parts from its spooled file, like FastAPIFileAdapter.'''
+    def __init__(self, path: Path):
+        self.name = path.name
+        self.size = path.stat().st_size
+        self._file = open(path, "rb")
+        self.bytes_read = 0
+
+    def seek(self, offset: int) -> int:
+        return self._file.seek(offset)
+
+    def read(self, size: int = -1) -> bytes:
+        block = self._file.read(size)
+        self.bytes_read += len(block)
+        return block
+
+
+def child(mode: str, size_mb: int, concurrent: int, chunk_kb: int):
+    work = Path(tempfile.mkdtemp(prefix="bench_upload_"))
+    from utils.file_io import store_blob
+
+    paths = [write_upload(work / f"upload_{i}.pdf", size_mb, i) for i in range(concurrent)]
+    wrap = BufferedUpload if mode == "buffered" else StreamingUpload
+    baseline = rss_mb()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrent) as pool:
+        list(pool.map(lambda p: store_blob(wrap(p), ".pdf", work / "blobs", 1 << 40, chunk_kb << 10), paths))
+    wall = time.perf_counter() - t0
+    print(json.dumps({"baseline_mb": baseline, "peak_mb": rss_mb(), "wall_s": wall}))
+
+
+def rejections(max_mb: int, chunk_kb: int):
+    from utils.file_io import store_blob, UploadRejected
+
+    work = Path(tempfile.mkdtemp(prefix="bench_upload_"))
+    cases = [
+        ("not a PDF", write_upload(work / "photo.pdf", 8, 0, header=b"\x89PNG\r\n\x1a\n"), False),
+        ("oversized", write_upload(work / "huge.pdf", 2 * max_mb, 1), False),
+        ("oversized, size unknown", work / "huge.pdf", True),
+    ]
+    print(f"\n{'rejected upload':>24} {'file MB':>8} {'read MB':>8} {'status':>7} {'ms':>6}")
+    for name, path, hide_size in cases:
+        upload = StreamingUpload(path)
+        if hide_size:
+            upload.size = None
+        t0 = time.perf_counter()
+        try:
+            store_blob(upload, ".pdf", work / "blobs", max_mb << 20, chunk_kb << 10, name=path.name)
+            status = "stored"
+        except UploadRejected as e:
+            status = e.status_code
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"{name:>24} {path.stat().st_size / (1 << 20):>8.1f} {upload.bytes_read / (1 << 20):>8.1f} {status:>7} {ms:>6.1f}")
+    print(f"blob store after rejections: {len(list((work / 'blobs').rglob('*')))} entries")
+
+
+def main(sizes, concurrent: int, chunk_kb: int, max_mb: int):
+    print(f"{concurrent} concurrent uploads, {chunk_kb} KB chunks   (peak RSS growth over baseline, MB)")
+    print(f"{'MB/upload':>10} {'buffered':>9} {'streaming':>10} {'buffered s':>11} {'streaming s':>12}")
+    for size_mb in sizes:
+        row = {}
+        for mode in ("buffered", "streaming"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_upload_memory", "--child", mode, "--sizes", str(size_mb),
+                 "--concurrent", str(concurrent), "--chunk-kb", str(chunk_kb)],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            row[mode] = json.loads(out)
+        b, s = row["buffered"], row["streaming"]
+        print(f"{size_mb:>10} {b['peak_mb'] - b['baseline_mb']:>9.1f} {s['peak_mb'] - s['baseline_mb']:>10.1f}"
+              f" {b['wall_s']:>11.2f} {s['wall_s']:>12.2f}")
+    rejections(max_mb, chunk_kb)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--concurrent", type=int, default=4)
+    parser.add_argument("--chunk-kb", type=int, default=1024)
+    parser.add_argument("--max-mb", type=int, default=32)
+    parser.add_argument("--child", choices=["buffered", "streaming"])
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.sizes[0], args.concurrent, args.chunk_kb)
+    else:
+        main(args.sizes, args.concurrent, args.chunk_kb, args.max_mb)
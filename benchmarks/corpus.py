@@ -0,0 +1,50 @@
+'''Synthetic document corpora for the benchmarks.'''
+import random
+from pathlib import Path
+from typing import List
+
+import fitz  # PyMuPDF
+
+WORDS = (
+    "agreement party supplier customer clause term payment invoice delivery schedule liability "
+    "warranty termination notice confidential obligation section amendment effective date fee"
+).split()
+
+
+def synthetic_paragraph(rng: random.Random, words: int = 120) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def page_texts(pages: int, seed: int = 0, paragraphs_per_page: int = 4) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        f"Section {n + 1}\n\n" + "\n\n".join(synthetic_paragraph(rng) for _ in range(paragraphs_per_page))
+        for n in range(pages)
+    ]
+
+
+def write_pdf(path: Path, texts: List[str]) -> Path:
+    '''Write one PDF page per text.'''
+    doc = fitz.open()
+    for text in texts:
+        page = doc.new_page()
+        # insert_textbox writes nothing when the text overflows (and clips the last glyph when it only
+        # just fits), so shrink the font until a spare line remains
+        fontsize = 9.0
+        while page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=fontsize) < fontsize and fontsize > 4:
+            doc.delete_page(-1)
+            page = doc.new_page()
+            fontsize -= 0.5
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+def make_pdf(path: Path, pages: int, seed: int = 0, paragraphs_per_page: int = 4) -> Path:
+    '''Write a text PDF with `pages` pages of pseudo-contract prose.'''
+    return write_pdf(path, page_texts(pages, seed, paragraphs_per_page))
+
+
+def make_pdf_corpus(directory: Path, files: int, pages: int) -> List[Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    return [make_pdf(directory / f"doc_{i:04d}.pdf", pages, seed=i) for i in range(files)]
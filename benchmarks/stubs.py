@@ -0,0 +1,69 @@
+'''Offline stand-ins for the remote LLM and embedding clients used by the benchmarks.'''
+import os
+import asyncio
+import time
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+
+from utils.model_loader import ModelLoader
+from utils.tracing import instrument_llm
+
+
+class SlowFakeChatModel(FakeListChatModel):
+    '''Fake chat model that waits `latency` seconds per call (plus `latency_per_1k_chars` per 1000 prompt
+    characters, to model prompt processing) to mimic a remote LLM.'''
+    latency: float = 0.2
+    latency_per_1k_chars: float = 0.0
+
+    # FakeListChatModel runs batches one call at a time; real clients run them concurrently
+    batch = Runnable.batch
+    abatch = Runnable.abatch
+
+    def _delay(self, messages) -> float:
+        chars = sum(len(str(m.content)) for m in messages)
+        return self.latency + self.latency_per_1k_chars * chars / 1000
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._call(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._call(messages)))])
+
+
+class SlowFakeEmbeddings(DeterministicFakeEmbedding):
+    '''Deterministic fake embeddings with a per-batch delay and call counter.'''
+    latency: float = 0.0
+    calls: int = 0
+    texts_embedded: int = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+
+def install_stub_models(
+    llm_latency: float = 0.2,
+    token_delay: Optional[float] = None,
+    embedding_latency: float = 0.0,
+    responses: Optional[List[str]] = None,
+    dim: int = 256,
+):
+    '''Point ModelLoader at fake clients so benchmarks run without API keys or network.'''
+    os.environ.setdefault("GOOGLE_API_KEY", "stub")
+    os.environ.setdefault("GROQ_API_KEY", "stub")
+    llm = instrument_llm(SlowFakeChatModel(responses=responses or ["stub answer"], latency=llm_latency, sleep=token_delay))
+    emb = SlowFakeEmbeddings(size=dim, latency=embedding_latency)
+    ModelLoader.reset()
+    ModelLoader.load_llm = lambda self: llm
+    ModelLoader.load_embeddings = lambda self: emb
+    return llm, emb
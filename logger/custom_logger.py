@@ -33,6 +33,7 @@ class CustomLogger:
         # Configure structlog for structured logging
         structlog.configure(
             processors=[
+                structlog.contextvars.merge_contextvars,
                 structlog.processors.TimeStamper(fmt="iso", utc=True, key="timestamp"),
                 structlog.processors.add_log_level,
                 structlog.processors.EventRenamer(to="event"),
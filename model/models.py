@@ -14,6 +14,16 @@ class Metadata(BaseModel):
     PageCount: Union [int, str]  # can be 'unknown' if not available
     SentimentTone: str
 
+class ChunkSummary(BaseModel):
+    Summary: List[str]
+    Title: str
+    Author: list[str]
+    DateCreated: str
+    LastModifiedDate: str
+    Publisher: str
+    language: str
+    SentimentTone: str
+
 class ChangeFormat(BaseModel):
     Page: str
     Changes: str
@@ -23,6 +33,11 @@ class SummaryResponse(RootModel[list[ChangeFormat]]):
 
 class PromptType(str, Enum):
     DOCUMENT_ANALYSIS = "document_analysis"
+    DOCUMENT_ANALYSIS_MAP = "document_analysis_map"
+    DOCUMENT_ANALYSIS_REDUCE = "document_analysis_reduce"
     DOCUMENT_COMPARISON = "document_comparison"
+    PAGE_COMPARISON = "page_comparison"
+    DIFF_SUMMARY = "diff_summary"
     CONTEXTUALIZE_QUESTION = "contextualize_question"
-    CONTEXT_QA = "context_qa"
\ No newline at end of file
+    CONTEXT_QA = "context_qa"
+    SUMMARIZE_CONVERSATION = "summarize_conversation"
\ No newline at end of file
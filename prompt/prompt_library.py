@@ -7,6 +7,27 @@ document_analysis_prompt = ChatPromptTemplate.from_template("""
     Analyze this document:
     {document_text}""")
 
+document_analysis_map_prompt = ChatPromptTemplate.from_template("""
+    You are a helpful assistant trained to analyze and summarize documents.
+    Below are pages {pages} of a {page_count}-page document.
+    1. Summarize the content of these pages only, in a few short points.
+    2. Fill the other fields only from what these pages state; use "" (or [] for Author) when they do not.
+    Return ONLY the JSON response as specified below.
+    {format_instructions}
+    Pages:
+    {document_text}""")
+
+document_analysis_reduce_prompt = ChatPromptTemplate.from_template("""
+    You are a helpful assistant trained to analyze and summarize documents.
+    Below are partial analyses of consecutive sections of one {page_count}-page document, in page order.
+    1. Merge them into a single analysis of the whole document.
+    2. The Summary must cover the whole document concisely; drop repeated points.
+    3. For the other fields prefer values stated by several sections, or by the first pages.
+    Return ONLY the JSON response as specified below.
+    {format_instructions}
+    Partial analyses:
+    {partials}""")
+
 document_comparison_prompt = ChatPromptTemplate.from_template("""
     You are a helpful assistant trained to compare and contrast documents.
     1. Compare the content in both documents.
@@ -19,6 +40,33 @@ document_comparison_prompt = ChatPromptTemplate.from_template("""
     Return ONLY the JSON response as specified below.
     {format_instructions}""")
 
+page_comparison_prompt = ChatPromptTemplate.from_template("""
+    You are a helpful assistant trained to compare two versions of the same document page.
+    1. Compare the reference page with the actual page.
+    2. List every difference (added, removed or changed content) concisely.
+    3. Use "{page}" as the Page value of every row.
+    4. If the pages have the same content, return a single row whose Changes is "NO CHANGE".
+
+    Reference page:
+    {reference_page}
+
+    Actual page:
+    {actual_page}
+    Return ONLY the JSON response as specified below.
+    {format_instructions}""")
+
+diff_summary_prompt = ChatPromptTemplate.from_template("""
+    You are a helpful assistant trained to explain document revisions.
+    Below are the exact textual changes found on page {page} between the reference and the actual document.
+    1. Summarize what changed in plain language, one row per distinct change.
+    2. Merge fragments that belong to the same edit.
+    3. Use "{page}" as the Page value of every row.
+
+    Changes:
+    {changes}
+    Return ONLY the JSON response as specified below.
+    {format_instructions}""")
+
 contextualize_question_prompt = ChatPromptTemplate.from_messages([
     ("system", (
         "Given a conversation history and the most recent user query, rewrite the query as a standalone question "
@@ -39,9 +87,24 @@ context_qa_prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}"),
 ])
 
+summarize_conversation_prompt = ChatPromptTemplate.from_messages([
+    ("system", (
+        "You maintain a running summary of a conversation about a set of documents. Extend the existing summary "
+        "with the new messages, keeping facts, figures, names and open questions the user may refer back to. "
+        "Return only the updated summary in at most {max_words} words.\n\nExisting summary:\n{summary}"
+    )),
+    MessagesPlaceholder("messages"),
+    ("human", "Update the summary with the messages above."),
+])
+
 PROMPT_REGISTERY = {
     "document_analysis": document_analysis_prompt,
+    "document_analysis_map": document_analysis_map_prompt,
+    "document_analysis_reduce": document_analysis_reduce_prompt,
     "document_comparison": document_comparison_prompt,
+    "page_comparison": page_comparison_prompt,
+    "diff_summary": diff_summary_prompt,
     "contextualize_question": contextualize_question_prompt,
-    "context_qa": context_qa_prompt  
+    "context_qa": context_qa_prompt,
+    "summarize_conversation": summarize_conversation_prompt
 }
\ No newline at end of file
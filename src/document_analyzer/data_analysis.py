@@ -1,15 +1,57 @@
 import os
 import sys
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from utils.model_loader import ModelLoader
+from utils.config_loader import load_config
+from utils.tracing import span, observe_count
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
-from model.models import Metadata, PromptType
+from model.models import ChunkSummary, Metadata, PromptType
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.output_parsers import OutputFixingParser
 from prompt.prompt_library import PROMPT_REGISTERY
 
+ANALYSIS_MODES = ("auto", "single", "map_reduce")
+PAGE_HEADER = "\n--- Page {page} ---\n"
+# Fields taken from the PDF itself (utils.pdf_engine.pdf_metadata) rather than from the LLM
+LOCAL_FIELDS = ("PageCount", "Title", "Author", "DateCreated", "LastModifiedDate")
+
+
+def _page_range(first: int, last: int) -> str:
+    return str(first) if first == last else f"{first}-{last}"
+
+
+def chunk_pages(pages: List[str], chunk_chars: int) -> List[Tuple[int, int, str]]:
+    '''Group consecutive pages into (first_page, last_page, text) chunks of at most chunk_chars;
+    a page longer than chunk_chars is split across several chunks. Blank pages are skipped.'''
+    chunks, first, last, parts, size = [], 0, 0, [], 0
+    for n, text in enumerate(pages, 1):
+        if not text.strip():
+            continue
+        for start in range(0, len(text), chunk_chars):
+            piece = PAGE_HEADER.format(page=n) + text[start: start + chunk_chars]
+            if parts and size + len(piece) > chunk_chars:
+                chunks.append((first, last, "".join(parts)))
+                parts, size = [], 0
+            if not parts:
+                first = n
+            parts.append(piece)
+            size += len(piece)
+            last = n
+    if parts:
+        chunks.append((first, last, "".join(parts)))
+    return chunks
+
+
 class DocumentAnalyzer:
-    '''analyzes the document and extracts relevant information'''
+    '''analyzes the document and extracts relevant information
+
+    Short documents are analyzed in one LLM call. Longer ones are split into page chunks whose
+    partial analyses are extracted concurrently (map) and then merged, hierarchically if they do not
+    fit in one prompt (reduce). Page count, title, author and dates come from the PDF when present.
+    '''
     def __init__(self):
         self.log = CustomLogger().get_logger(__name__)
         try:
@@ -21,6 +63,20 @@ class DocumentAnalyzer:
             self.fixing_parser = OutputFixingParser.from_llm(llm=self.llm, parser=self.parser)
             # preparing prompt
             self.prompt = PROMPT_REGISTERY[PromptType.DOCUMENT_ANALYSIS.value]
+            self.partial_parser = JsonOutputParser(pydantic_object=ChunkSummary)
+            self.map_chain = PROMPT_REGISTERY[PromptType.DOCUMENT_ANALYSIS_MAP.value] | self.llm | self.partial_parser
+            self.reduce_prompt = PROMPT_REGISTERY[PromptType.DOCUMENT_ANALYSIS_REDUCE.value]
+
+            cfg = load_config().get("analysis", {}) or {}
+            self.mode = cfg.get("mode", "auto")
+            if self.mode not in ANALYSIS_MODES:
+                raise ValueError(f"analysis.mode must be one of {ANALYSIS_MODES}, got {self.mode!r}")
+            self.single_call_max_chars = int(cfg.get("single_call_max_chars", 60000))
+            self.chunk_chars = int(cfg.get("chunk_chars", 12000))
+            self.reduce_max_chars = int(cfg.get("reduce_max_chars", 24000))
+            self.max_concurrency = int(cfg.get("max_concurrency", 8))
+            # LLM calls whose result was dropped; a degraded analysis should not be cached
+            self.failed_calls = 0
             self.log.info("DocumentAnalyzer initialized successfully")
 
         except Exception as e:
@@ -31,11 +87,124 @@ class DocumentAnalyzer:
         try:
             chain = self.prompt | self.llm | self.fixing_parser
             self.log.info("metadata extraction chain created successfully")
-            response = chain.invoke({"document_text": document_text, 
-                                    "format_instructions": self.parser.get_format_instructions()})
+            with span("analyze.single"):
+                response = chain.invoke({"document_text": document_text, 
+                                        "format_instructions": self.parser.get_format_instructions()})
+            self.log.info("Metadata extraction successfully", keys=list(response.keys()))
+            return response
+        except Exception as e:
+            self.log.error(f"Metadata extraction failed", error=str(e))
+            raise DocumentPortalException("Metadata extraction failed") from e
+
+    async def aanalyze_document(self, document_text: str) -> dict:
+        try:
+            chain = self.prompt | self.llm | self.fixing_parser
+            with span("analyze.single"):
+                response = await chain.ainvoke({"document_text": document_text,
+                                                "format_instructions": self.parser.get_format_instructions()})
             self.log.info("Metadata extraction successfully", keys=list(response.keys()))
             return response
         except Exception as e:
             self.log.error(f"Metadata extraction failed", error=str(e))
             raise DocumentPortalException("Metadata extraction failed") from e
-        
+
+    async def aanalyze_pages(self, pages: List[str], pdf_meta: Optional[Dict[str, Any]] = None) -> dict:
+        '''Analyze a document given as per-page texts, choosing a single call or map-reduce by size.
+        pdf_meta (from utils.pdf_engine.pdf_metadata) overrides the matching LLM fields.'''
+        try:
+            started = time.perf_counter()
+            local = {k: v for k, v in (pdf_meta or {}).items() if k in LOCAL_FIELDS and v not in ("", [], None)}
+            local.setdefault("PageCount", len(pages))
+            total_chars = sum(len(p) for p in pages)
+            single = self.mode == "single" or (self.mode == "auto" and total_chars <= self.single_call_max_chars)
+            if single:
+                text = "".join(PAGE_HEADER.format(page=n) + t for n, t in enumerate(pages, 1) if t.strip())
+                result = await self.aanalyze_document(text)
+                stats = {"llm_calls": 1}
+            else:
+                result, stats = await self._amap_reduce(pages, local["PageCount"])
+            result = {**result, **local}
+            self.log.info(
+                "Document analyzed", mode="single" if single else "map_reduce", pages=len(pages),
+                chars=total_chars, local_fields=sorted(local), elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+                **stats,
+            )
+            return result
+        except DocumentPortalException:
+            raise
+        except Exception as e:
+            self.log.error("Metadata extraction failed", error=str(e))
+            raise DocumentPortalException("Metadata extraction failed") from e
+
+    async def _amap_reduce(self, pages: List[str], page_count: int) -> Tuple[dict, dict]:
+        chunks = chunk_pages(pages, self.chunk_chars)
+        if not chunks:
+            raise ValueError("Document has no extractable text")
+        inputs = [
+            {"pages": _page_range(first, last), "page_count": page_count, "document_text": text,
+             "format_instructions": self.partial_parser.get_format_instructions()}
+            for first, last, text in chunks
+        ]
+        observe_count("analyze.map", len(chunks))
+        with span("analyze.map"):
+            responses = await self.map_chain.abatch(
+                inputs, config={"max_concurrency": self.max_concurrency}, return_exceptions=True
+            )
+        partials = []
+        for (first, last, _), resp in zip(chunks, responses):
+            if isinstance(resp, Exception):
+                self.log.warning("Chunk analysis failed", pages=_page_range(first, last), error=str(resp))
+            else:
+                partials.append((first, last, resp))
+        if not partials:
+            raise responses[0]
+        stats = {"llm_calls": len(chunks), "map_chunks": len(chunks), "map_failed": len(chunks) - len(partials), "reduce_levels": 0}
+        self.failed_calls += stats["map_failed"]
+
+        # Merge groups of partials until they all fit in one reduce prompt
+        while len(partials) > 1 and sum(len(self._partial_text(p)) for p in partials) > self.reduce_max_chars:
+            groups = self._reduce_groups(partials)
+            chain = self.reduce_prompt | self.llm | self.partial_parser
+            with span("analyze.reduce"):
+                merged = await chain.abatch(
+                    [self._reduce_inputs(g, page_count, self.partial_parser) for g in groups],
+                    config={"max_concurrency": self.max_concurrency},
+                )
+            partials = [(g[0][0], g[-1][1], m) for g, m in zip(groups, merged)]
+            stats["llm_calls"] += len(groups)
+            stats["reduce_levels"] += 1
+
+        chain = self.reduce_prompt | self.llm | self.fixing_parser
+        with span("analyze.reduce"):
+            result = await chain.ainvoke(self._reduce_inputs(partials, page_count, self.parser))
+        stats["llm_calls"] += 1
+        stats["reduce_levels"] += 1
+        return result, stats
+
+    @staticmethod
+    def _partial_text(partial: tuple) -> str:
+        first, last, data = partial
+        return f"Pages {_page_range(first, last)}: {json.dumps(data, ensure_ascii=False)}"
+
+    def _reduce_groups(self, partials: List[tuple]) -> List[List[tuple]]:
+        '''Consecutive groups of at least two partials, each fitting in reduce_max_chars where possible.'''
+        groups, group, size = [], [], 0
+        for p in partials:
+            n = len(self._partial_text(p))
+            if len(group) >= 2 and size + n > self.reduce_max_chars:
+                groups.append(group)
+                group, size = [], 0
+            group.append(p)
+            size += n
+        if len(group) == 1 and groups:
+            groups[-1].append(group[0])
+        elif group:
+            groups.append(group)
+        return groups
+
+    def _reduce_inputs(self, partials: List[tuple], page_count: int, parser: JsonOutputParser) -> dict:
+        return {
+            "page_count": page_count,
+            "partials": "\n\n".join(self._partial_text(p) for p in partials),
+            "format_instructions": parser.get_format_instructions(),
+        }
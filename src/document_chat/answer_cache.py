@@ -0,0 +1,187 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.config_loader import load_config
+from utils.tracing import cache_event
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+_SPACE = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_question(question: str) -> str:
+    '''Case-, whitespace- and trailing-punctuation-insensitive form used as the exact cache key.'''
+    return _TRAILING.sub("", _SPACE.sub(" ", question.strip().lower()))
+
+
+@dataclass
+class _Answer:
+    value: Any
+    created: float
+    embedding: Optional[np.ndarray] = None
+
+
+class AnswerCache:
+    '''Process-wide cache of generated answers keyed by (namespace, index version, normalized question).
+
+    The namespace identifies a session index and retriever settings; the version is the segment
+    manifest version, which FaissManager bumps on every add, so a re-indexed session never serves an
+    answer computed against older content. With semantic enabled, a miss falls back to the cached
+    question of the same namespace/version whose embedding has cosine similarity >= threshold.
+    '''
+    _shared: Optional["AnswerCache"] = None
+    _shared_built = False
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 3600,
+        semantic: bool = False,
+        similarity_threshold: float = 0.95,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, int, str], _Answer]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.counts = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidated": 0}
+
+    @classmethod
+    def from_config(cls) -> Optional["AnswerCache"]:
+        '''Build a cache from the answer_cache section of config.yaml, or None when disabled.'''
+        cfg = load_config().get("answer_cache", {}) or {}
+        if not cfg.get("enabled", True):
+            return None
+        semantic = cfg.get("semantic", {}) or {}
+        return cls(
+            max_entries=int(cfg.get("max_entries", 2048)),
+            ttl_seconds=float(cfg.get("ttl_seconds", 3600)),
+            semantic=bool(semantic.get("enabled", False)),
+            similarity_threshold=float(semantic.get("threshold", 0.95)),
+        )
+
+    @classmethod
+    def shared(cls) -> Optional["AnswerCache"]:
+        '''The process-wide cache built from config on first use (None when disabled).'''
+        with cls._shared_lock:
+            if not cls._shared_built:
+                cls._shared = cls.from_config()
+                cls._shared_built = True
+            return cls._shared
+
+    def _sync_version(self, namespace: str, version: int):
+        '''Drop a namespace's entries once its index version moves on. Caller holds self._lock.'''
+        known = self._versions.get(namespace)
+        if known is not None and version <= known:
+            return
+        self._versions[namespace] = version
+        if known is None:
+            return
+        stale = [key for key in self._entries if key[0] == namespace]
+        for key in stale:
+            del self._entries[key]
+        self.counts["invalidated"] += len(stale)
+        if stale:
+            log.info("Answer cache invalidated", namespace=namespace, version=version, entries=len(stale))
+
+    def _expired(self, entry: _Answer, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created > self.ttl_seconds
+
+    def get(
+        self,
+        namespace: str,
+        version: int,
+        question: str,
+        embedding: Optional[Sequence[float]] = None,
+    ) -> Optional[Tuple[Any, str]]:
+        '''(cached value, "exact"|"semantic") for a cached question, else None.'''
+        key = (namespace, version, normalize_question(question))
+        now = time.time()
+        with self._lock:
+            self._sync_version(namespace, version)
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                self.counts["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counts["exact_hits"] += 1
+                cache_event("answer", True)
+                return entry.value, "exact"
+            if self.semantic and embedding is not None:
+                hit = self._nearest(namespace, version, self._unit(embedding), now)
+                if hit is not None:
+                    self._entries.move_to_end(hit)
+                    self.counts["semantic_hits"] += 1
+                    cache_event("answer", True)
+                    return self._entries[hit].value, "semantic"
+            self.counts["misses"] += 1
+            cache_event("answer", False)
+            return None
+
+    def _nearest(self, namespace: str, version: int, query: np.ndarray, now: float):
+        keys: List[Tuple[str, int, str]] = []
+        vectors = []
+        for key, entry in self._entries.items():
+            if key[:2] != (namespace, version) or entry.embedding is None or self._expired(entry, now):
+                continue
+            keys.append(key)
+            vectors.append(entry.embedding)
+        if not keys:
+            return None
+        scores = np.stack(vectors) @ query
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.similarity_threshold else None
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        n = np.linalg.norm(v)
+        return v / n if n else v
+
+    def put(
+        self,
+        namespace: str,
+        version: int,
+        question: str,
+        value: Any,
+        embedding: Optional[Sequence[float]] = None,
+    ):
+        key = (namespace, version, normalize_question(question))
+        vector = self._unit(embedding) if self.semantic and embedding is not None else None
+        with self._lock:
+            self._sync_version(namespace, version)
+            if self._versions.get(namespace) != version:
+                return
+            self._entries[key] = _Answer(value=value, created=time.time(), embedding=vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counts["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.counts["exact_hits"] + self.counts["semantic_hits"]
+            lookups = hits + self.counts["misses"]
+            return {
+                **self.counts,
+                "entries": len(self._entries),
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,224 @@
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from utils.config_loader import load_config
+from utils.concurrency import run_blocking
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+Summarizer = Callable[[str, List[BaseMessage], int], Awaitable[str]]  # (summary, messages, max_words)
+
+_SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+
+def estimate_tokens(text: str) -> int:
+    '''Rough token count (~4 characters per token); good enough for budgeting, no tokenizer needed.'''
+    return len(text) // 4 + 1
+
+
+def fit_sentences(text: str, max_tokens: int) -> str:
+    '''Leading whole sentences of text within max_tokens (at least the first sentence).'''
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = 0
+    for end in _SENTENCE_END.finditer(text):
+        if cut and estimate_tokens(text[:end.end()]) > max_tokens:
+            break
+        cut = end.end()
+    return text[:cut] if cut else text
+
+
+def _message(role: str, content: str) -> BaseMessage:
+    return HumanMessage(content=content) if role == "human" else AIMessage(content=content)
+
+
+@dataclass
+class _Conversation:
+    summary: str = ""
+    turns: List[Dict[str, str]] = field(default_factory=list)  # {"role": "human"|"ai", "content": ...}
+    compacting: bool = False
+
+    def tokens(self) -> int:
+        return sum(estimate_tokens(t["content"]) for t in self.turns)
+
+
+class ConversationStore:
+    '''Server-side chat history per session_id: an in-memory LRU, optionally written through to SQLite
+    so conversations survive restarts and evicted sessions are reloaded on demand.
+
+    window() returns the rolling summary plus the newest exchanges that fit history_token_budget, so
+    the history sent to the LLM stays bounded. Once recent turns exceed the budget, the oldest are
+    folded into the summary in the background.
+    '''
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        summary_max_tokens: int = 400,
+        max_sessions: int = 1024,
+        sqlite_path: Optional[str] = None,
+    ):
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.max_sessions = max_sessions
+        self.sqlite_path = sqlite_path
+        self._sessions: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self._db = self._connect() if sqlite_path else None
+
+    @property
+    def summary_max_words(self) -> int:
+        '''Word budget passed to the summarizer (~0.75 words per token).'''
+        return max(1, self.summary_max_tokens * 3 // 4)
+
+    @classmethod
+    def from_config(cls) -> "ConversationStore":
+        '''Build a store from the conversation section of config.yaml.'''
+        cfg = load_config().get("conversation", {}) or {}
+        return cls(
+            token_budget=int(cfg.get("history_token_budget", 2000)),
+            summary_max_tokens=int(cfg.get("summary_max_tokens", 400)),
+            max_sessions=int(cfg.get("max_sessions", 1024)),
+            sqlite_path=cfg.get("sqlite_path") or None,
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.sqlite_path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, turns TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        return db
+
+    def _save(self, session_id: str, conv: _Conversation):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?)",
+            (session_id, conv.summary, json.dumps(conv.turns, ensure_ascii=False), time.time()),
+        )
+
+    def _get(self, session_id: str) -> _Conversation:
+        '''Caller holds self._lock.'''
+        conv = self._sessions.get(session_id)
+        if conv is not None:
+            self._sessions.move_to_end(session_id)
+            return conv
+        conv = _Conversation()
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT summary, turns FROM conversations WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row:
+                conv = _Conversation(summary=row[0], turns=json.loads(row[1]))
+        self._sessions[session_id] = conv
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            if self._db is None:
+                log.info("Conversation evicted from memory", session_id=evicted)
+        return conv
+
+    def window(self, session_id: str) -> List[BaseMessage]:
+        '''Summary (if any) plus the newest whole exchanges that fit the token budget, oldest first.'''
+        with self._lock:
+            conv = self._get(session_id)
+            budget = self.token_budget - (estimate_tokens(conv.summary) if conv.summary else 0)
+            kept: List[Dict[str, str]] = []
+            turns = conv.turns
+            end = len(turns)
+            while end >= 2:
+                pair = turns[end - 2:end]
+                cost = sum(estimate_tokens(t["content"]) for t in pair)
+                if cost > budget:
+                    break
+                kept[:0] = pair
+                budget -= cost
+                end -= 2
+            summary = conv.summary
+        messages = [_message(t["role"], t["content"]) for t in kept]
+        if summary:
+            messages.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        return messages
+
+    def append(self, session_id: str, question: str, answer: str) -> bool:
+        '''Record one exchange; returns True when older turns should be folded into the summary.'''
+        with self._lock:
+            conv = self._get(session_id)
+            conv.turns.append({"role": "human", "content": question})
+            conv.turns.append({"role": "ai", "content": answer})
+            self._save(session_id, conv)
+            return conv.tokens() > self.token_budget and not conv.compacting
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+
+    def _plan_compaction(self, session_id: str) -> Optional[Tuple[_Conversation, str, List[Dict[str, str]]]]:
+        '''Mark the conversation as compacting and pick the oldest exchanges to fold so recent turns
+        fit half the budget; None when there is nothing to do.'''
+        with self._lock:
+            conv = self._get(session_id)
+            if conv.compacting or conv.tokens() <= self.token_budget:
+                return None
+            conv.compacting = True
+            remaining, cut = conv.tokens(), 0
+            while cut + 2 < len(conv.turns) and remaining > self.token_budget // 2:
+                remaining -= sum(estimate_tokens(t["content"]) for t in conv.turns[cut:cut + 2])
+                cut += 2
+            return conv, conv.summary, conv.turns[:cut]
+
+    def _apply_compaction(self, session_id: str, conv: _Conversation, summary: str, cut: int) -> bool:
+        with self._lock:
+            if self._sessions.get(session_id) is not conv:
+                # Cleared or evicted while summarizing: writing back would resurrect it
+                log.info("Conversation changed during compaction, result dropped", session_id=session_id)
+                return False
+            # Turns are only ever appended, so the folded prefix is still at the head
+            conv.summary = summary or conv.summary
+            del conv.turns[:cut]
+            self._save(session_id, conv)
+            return True
+
+    async def acompact(self, session_id: str, summarize: Summarizer):
+        '''Fold the oldest exchanges into the summary until recent turns fit half the budget.'''
+        plan = await run_blocking(self._plan_compaction, session_id)
+        if plan is None:
+            return
+        conv, old_summary, folded = plan
+        try:
+            messages = [_message(t["role"], t["content"]) for t in folded]
+            summary = (await summarize(old_summary, messages, self.summary_max_words)).strip()
+            # The prompt asks for max_words; an over-long reply loses whole trailing sentences only
+            summary = fit_sentences(summary, self.summary_max_tokens)
+            if await run_blocking(self._apply_compaction, session_id, conv, summary, len(folded)):
+                log.info("Conversation compacted", session_id=session_id, folded_turns=len(folded), summary_chars=len(summary))
+        except Exception as e:
+            log.error("Conversation summarization failed", session_id=session_id, error=str(e))
+        finally:
+            with self._lock:
+                conv.compacting = False
+
+    def schedule_compaction(self, session_id: str, summarize: Summarizer):
+        '''Run acompact off the request path; the task is referenced until it finishes.'''
+        task = asyncio.get_running_loop().create_task(self.acompact(session_id, summarize))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,84 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores import FAISS
+
+from src.document_ingestion.segment_store import SqliteDocstore
+from utils.concurrency import run_blocking
+from utils.config_loader import load_config
+
+
+class HybridRetriever(BaseRetriever):
+    '''Dense FAISS search fused with local BM25 keyword search by reciprocal rank fusion.
+
+    Each side contributes weight / (rrf_k + rank) for its top fetch_k rows; the k best fused rows
+    are returned. The keyword half runs entirely in SQLite, so only the dense half embeds the query.
+    '''
+    vectorstore: FAISS
+    k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+    dense_weight: float = 1.0
+    sparse_weight: float = 1.0
+    max_df: float = 0.5
+
+    @property
+    def docstore(self) -> SqliteDocstore:
+        return self.vectorstore.docstore
+
+    def _dense_rows(self, embedding: List[float]) -> List[int]:
+        _, ids = self.vectorstore.index.search(np.asarray([embedding], dtype=np.float32), self.fetch_k)
+        return [int(i) for i in ids[0] if i != -1]
+
+    def _fuse(self, dense: List[int], sparse: List[int]) -> List[Document]:
+        scores: Dict[int, float] = {}
+        for weight, rows in ((self.dense_weight, dense), (self.sparse_weight, sparse)):
+            for rank, row in enumerate(rows):
+                scores[row] = scores.get(row, 0.0) + weight / (self.rrf_k + rank + 1)
+        top = sorted(scores, key=scores.get, reverse=True)[: self.k]
+        docs = self.docstore.get_many(top) if top else {}
+        return [docs[r] for r in top if r in docs]
+
+    def _search(self, query: str, embedding: List[float]) -> List[Document]:
+        sparse = [row for row, _ in self.docstore.keyword_search(query, self.fetch_k, self.max_df)]
+        return self._fuse(self._dense_rows(embedding), sparse)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._search(query, self.vectorstore._embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = await self.vectorstore._aembed_query(query)
+        return await run_blocking(self._search, query, embedding)
+
+
+def make_retriever(
+    vectorstore: FAISS,
+    k: int = 5,
+    search_type: str = "similarity",
+    search_kwargs: Optional[Dict[str, Any]] = None,
+) -> BaseRetriever:
+    '''Hybrid retriever for segment-store indexes when retriever.mode is "hybrid", else the plain FAISS one.'''
+    cfg = load_config().get("retriever", {}) or {}
+    search_kwargs = search_kwargs or {"k": k}
+    if (
+        search_type == "similarity"
+        and cfg.get("mode", "hybrid") == "hybrid"
+        and isinstance(vectorstore.docstore, SqliteDocstore)
+    ):
+        return HybridRetriever(
+            vectorstore=vectorstore,
+            k=search_kwargs.get("k", k),
+            fetch_k=int(cfg.get("fetch_k", 20)),
+            rrf_k=int(cfg.get("rrf_k", 60)),
+            dense_weight=float(cfg.get("dense_weight", 1.0)),
+            sparse_weight=float(cfg.get("sparse_weight", 1.0)),
+            max_df=float(cfg.get("keyword_max_df", 0.5)),
+        )
+    return vectorstore.as_retriever(search_type=search_type, search_kwargs=search_kwargs)
@@ -0,0 +1,120 @@
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+
+from utils.config_loader import load_config
+from utils.tracing import cache_event
+
+REWRITE_MODES = ("auto", "always", "never")
+
+_WORD = re.compile(r"\w+")
+# References that only make sense against earlier turns
+_ANAPHORA = re.compile(
+    r"\b(it|its|itself|they|them|their|theirs|this|that|these|those|he|him|his|she|her|hers|"
+    r"there|former|latter|above|aforementioned|same|previous|earlier|again|also|else)\b",
+    re.IGNORECASE,
+)
+_CONTINUATION = re.compile(r"^\s*(and|but|or|so|then|what about|how about|why not|why)\b", re.IGNORECASE)
+
+
+def is_self_contained(question: str, min_words: int = 4) -> bool:
+    '''Cheap check that a question can be retrieved on as-is: long enough, no pronouns or
+    back-references, and not phrased as a continuation ("and the fees?", "what about X").'''
+    if len(_WORD.findall(question)) < min_words:
+        return False
+    if _CONTINUATION.match(question):
+        return False
+    return not _ANAPHORA.search(question)
+
+
+class QueryRewriter:
+    '''Routes the contextualize-question LLM call: skipped when there is no history (mode "auto")
+    or the question is self-contained, otherwise served from an LRU cache keyed by
+    (history, question) before falling back to the LLM.
+    '''
+
+    def __init__(self, chain: Runnable, mode: str = "auto", cache_size: int = 1024):
+        if mode not in REWRITE_MODES:
+            raise ValueError(f"Unknown query_rewrite.mode '{mode}', expected one of {REWRITE_MODES}")
+        self.chain = chain
+        self.mode = mode
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {"skipped": 0, "cached": 0, "llm": 0}
+
+    @classmethod
+    def from_config(cls, chain: Runnable) -> "QueryRewriter":
+        cfg = load_config().get("query_rewrite", {}) or {}
+        return cls(chain, mode=str(cfg.get("mode", "auto")), cache_size=int(cfg.get("cache_size", 1024)))
+
+    def _skip(self, question: str, history: Sequence[BaseMessage]) -> bool:
+        if self.mode == "never":
+            return True
+        return self.mode == "auto" and (not history or is_self_contained(question))
+
+    @staticmethod
+    def _key(question: str, history: Sequence[BaseMessage]) -> str:
+        turns = [[getattr(m, "type", ""), getattr(m, "content", str(m))] for m in history]
+        raw = json.dumps([turns, question.strip()], ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            return value
+
+    def _put(self, key: str, value: str):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _record(self, how: str):
+        with self._lock:
+            self.counts[how] += 1
+
+    def _route(self, question: str, history: Sequence[BaseMessage]) -> Tuple[Optional[str], Optional[str], str]:
+        '''(answer, route) if no LLM call is needed, else (None, cache key, "llm").'''
+        if self._skip(question, history):
+            return question, None, "skipped"
+        key = self._key(question, history)
+        cached = self._get(key)
+        cache_event("rewrite", cached is not None)
+        if cached is not None:
+            return cached, key, "cached"
+        return None, key, "llm"
+
+    def rewrite(self, question: str, history: Optional[List[BaseMessage]] = None) -> Tuple[str, str]:
+        '''Return (standalone question, route) where route is "skipped", "cached" or "llm".'''
+        history = history or []
+        result, key, how = self._route(question, history)
+        if result is None:
+            result = self.chain.invoke({"input": question, "chat_history": history}).strip() or question
+            self._put(key, result)
+        self._record(how)
+        return result, how
+
+    async def arewrite(self, question: str, history: Optional[List[BaseMessage]] = None) -> Tuple[str, str]:
+        history = history or []
+        result, key, how = self._route(question, history)
+        if result is None:
+            result = (await self.chain.ainvoke({"input": question, "chat_history": history})).strip() or question
+            self._put(key, result)
+        self._record(how)
+        return result, how
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counts, "cache_entries": len(self._cache)}
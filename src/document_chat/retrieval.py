@@ -1,23 +1,57 @@
 import sys
 import os
-from operator import itemgetter
-from typing import List, Optional, Dict, Any
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Any, AsyncIterator, Generator, Tuple
 
 from langchain_core.messages import BaseMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.vectorstores import FAISS
 
 from utils.model_loader import ModelLoader
+from utils.tracing import span, observe_count
+from src.document_ingestion.segment_store import load_vectorstore, index_version
+from src.document_chat.hybrid_retriever import make_retriever
+from src.document_chat.query_rewrite import QueryRewriter
+from src.document_chat.answer_cache import AnswerCache
 from exception.custom_exception import DocumentPortalException
 from logger.custom_logger import CustomLogger
 from prompt.prompt_library import PROMPT_REGISTERY
 from model.models import PromptType
 os.environ['KMP_DUPLICATE_LIB_OK']='TRUE'
 
+
+@dataclass
+class _Turn:
+    """One question on its way through the pre-generation steps."""
+    user_input: str
+    chat_history: List[BaseMessage]
+    question: str = ""
+    started: float = field(default_factory=time.perf_counter)
+    scope: Optional[Tuple[str, int]] = None
+    embedding: Optional[List[float]] = None
+    hit: Optional[Tuple[Dict[str, Any], str]] = None
+    how: str = ""
+    docs: List[Any] = field(default_factory=list)
+    rewritten: float = 0.0
+    retrieved: float = 0.0
+
+    def inputs(self) -> Dict[str, Any]:
+        """Variables of the QA prompt. A cacheable turn is answered from the standalone question alone,
+        so its answer does not depend on the history it was asked with."""
+        context = "\n\n".join(getattr(d, "page_content", str(d)) for d in self.docs)
+        if self.scope is not None:
+            return {"input": self.question, "chat_history": [], "context": context}
+        return {"input": self.user_input, "chat_history": self.chat_history, "context": context}
+
+    def sources(self) -> List[Dict[str, Any]]:
+        return [getattr(d, "metadata", {}) for d in self.docs]
+
+
 class ConversationalRAG:
     """
-    LCEL-based Conversational RAG retriever initialization.
+    Conversational RAG: question rewrite, answer cache and retrieval, then an LCEL answer chain
+    (QA prompt | LLM | parser) called synchronously, asynchronously or streamed.
     """
 
     def __init__(self, session_id: Optional[str], retriever=None):
@@ -33,11 +67,18 @@ class ConversationalRAG:
             self.qa_prompt: ChatPromptTemplate = PROMPT_REGISTERY[
                 PromptType.CONTEXT_QA.value
             ]
+            self.summary_chain = (
+                PROMPT_REGISTERY[PromptType.SUMMARIZE_CONVERSATION.value] | self.llm | StrOutputParser()
+            )
 
             self.retriever = retriever
-            self.chain = None
-            if self.retriever is not None:
-                self._build_lcel_chain()
+            self.answer_cache = AnswerCache.shared()
+            self.index_path: Optional[str] = None
+            self._cache_namespace: Optional[str] = None
+            self._embeddings = None
+            self.rewriter = QueryRewriter.from_config(self.contextualize_prompt | self.llm | StrOutputParser())
+            # Answer using retrieved context + original input + chat history
+            self.answer_chain = self.qa_prompt | self.llm | StrOutputParser()
 
             self.log.info("ConversationalRAG initialized", session_id=self.session_id)
         except Exception as e:
@@ -54,27 +95,24 @@ class ConversationalRAG:
             search_kwargs: Optional[Dict[str, Any]] = None,
             ):
         """
-        Load FAISS vectorstore from disk and build retriever + LCEL chain.
+        Load FAISS vectorstore from disk and build the retriever.
+        Segment-store indexes get the hybrid dense + BM25 retriever unless retriever.mode is "dense".
         """
         try:
             if not os.path.isdir(index_path):
                 raise FileNotFoundError(f"FAISS index directory not found: {index_path}")
 
             embeddings = ModelLoader().load_embeddings()
-            vectorstore = FAISS.load_local(
-                index_path,
-                embeddings,
-                index_name=index_name,
-                allow_dangerous_deserialization=True, 
-            )
-
-            if search_kwargs is None:
-                search_kwargs = {"k": k}
-
-            self.retriever = vectorstore.as_retriever(
-                search_type=search_type, search_kwargs=search_kwargs
+            with span("rag.load_index"):
+                vectorstore = load_vectorstore(index_path, embeddings, index_name=index_name)
+                self.retriever = make_retriever(
+                    vectorstore, k=k, search_type=search_type, search_kwargs=search_kwargs
+                )
+            self.index_path = os.path.abspath(index_path)
+            self._embeddings = embeddings
+            self._cache_namespace = "|".join(
+                [self.index_path, index_name, search_type, repr(sorted((search_kwargs or {"k": k}).items()))]
             )
-            self._build_lcel_chain()
 
             self.log.info(
                 "FAISS retriever loaded successfully",
@@ -89,32 +127,189 @@ class ConversationalRAG:
             self.log.error("Failed to load retriever from FAISS", error=str(e))
             raise DocumentPortalException("Loading error in ConversationalRAG", sys)
 
-    def invoke(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None) -> str:
-        """Invoke the LCEL pipeline."""
-        try:
-            if self.chain is None:
-                raise DocumentPortalException(
-                    "RAG chain not initialized. Call load_retriever_from_faiss() before invoke().", sys
-                )
-            chat_history = chat_history or []
-            payload = {"input": user_input, "chat_history": chat_history}
-            answer = self.chain.invoke(payload)
-            if not answer:
-                self.log.warning(
-                    "No answer generated", user_input=user_input, session_id=self.session_id
+    @staticmethod
+    def _ms(start: float, end: float) -> float:
+        return round((end - start) * 1000, 1)
+
+    def _cache_scope(self) -> Optional[Tuple[str, int]]:
+        """(namespace, index version) when answers may be cached, i.e. for an index loaded from disk."""
+        if self.answer_cache is None or self._cache_namespace is None:
+            return None
+        return self._cache_namespace, index_version(self.index_path)
+
+    def _prepare(self, user_input: str, chat_history: List[BaseMessage]) -> Generator[Tuple[str, tuple], Any, _Turn]:
+        """Pre-generation steps shared by invoke(), ainvoke() and astream(): (conditional) question rewrite,
+        answer cache lookup and retrieval.
+
+        The cache is keyed by the standalone question, which already folds in whatever the history
+        contributes, so a question repeated later in the same conversation hits.
+
+        Written once as a generator that yields the calls it needs, ("embed" | "rewrite" | "retrieve", args),
+        and is sent their results; _run_prepare() makes them synchronously, _arun_prepare() awaits them.
+        """
+        turn = _Turn(user_input, chat_history)
+        with span("rag.rewrite"):
+            turn.question, turn.how = yield "rewrite", (user_input, chat_history)
+        turn.rewritten = time.perf_counter()
+        turn.scope = self._cache_scope()
+        if turn.scope is not None:
+            with span("rag.cache_lookup"):
+                if self.answer_cache.semantic:
+                    turn.embedding = yield "embed", (turn.question,)
+                turn.hit = self.answer_cache.get(*turn.scope, turn.question, turn.embedding)
+            if turn.hit is not None:
+                self.log.info(
+                    "Answer served from cache",
+                    session_id=self.session_id,
+                    user_input=user_input,
+                    question=turn.question,
+                    cache=turn.hit[1],
+                    total_ms=self._ms(turn.started, time.perf_counter()),
                 )
-                return "no answer generated."
+                return turn
+        with span("rag.retrieve"):
+            turn.docs = yield "retrieve", (turn.question,)
+        observe_count("rag.retrieve", len(turn.docs))
+        turn.retrieved = time.perf_counter()
+        return turn
+
+    def _run_prepare(self, user_input: str, chat_history: List[BaseMessage]) -> _Turn:
+        calls = {"embed": getattr(self._embeddings, "embed_query", None),
+                 "rewrite": self.rewriter.rewrite, "retrieve": self.retriever.invoke}
+        steps, result = self._prepare(user_input, chat_history), None
+        try:
+            while True:
+                try:
+                    name, args = steps.send(result)
+                except StopIteration as done:
+                    return done.value
+                result = calls[name](*args)
+        finally:
+            steps.close()
+
+    async def _arun_prepare(self, user_input: str, chat_history: List[BaseMessage]) -> _Turn:
+        calls = {"embed": getattr(self._embeddings, "aembed_query", None),
+                 "rewrite": self.rewriter.arewrite, "retrieve": self.retriever.ainvoke}
+        steps, result = self._prepare(user_input, chat_history), None
+        try:
+            while True:
+                try:
+                    name, args = steps.send(result)
+                except StopIteration as done:
+                    return done.value
+                result = await calls[name](*args)
+        finally:
+            steps.close()
+
+    def _require_retriever(self, action: str):
+        if self.retriever is None:
+            raise DocumentPortalException(
+                f"RAG chain not initialized. Call load_retriever_from_faiss() before {action}().", sys
+            )
+
+    def _finish(self, turn: _Turn, answer: str, streamed: bool = False, first_token: Optional[float] = None) -> Dict[str, Any]:
+        """Cache a non-empty answer and log the stage timings; returns the timings."""
+        finished = time.perf_counter()
+        if turn.scope is not None and answer:
+            value = {"answer": answer, "sources": turn.sources()}
+            self.answer_cache.put(*turn.scope, turn.question, value, turn.embedding)
+        timing = {
+            "rewrite": turn.how,
+            "rewrite_ms": self._ms(turn.started, turn.rewritten),
+            "retrieval_ms": self._ms(turn.rewritten, turn.retrieved),
+        }
+        if streamed:
+            timing["first_token_ms"] = self._ms(turn.started, first_token or finished)
+        else:
+            timing["answer_ms"] = self._ms(turn.retrieved, finished)
+        timing["total_ms"] = self._ms(turn.started, finished)
+        if not answer:
+            self.log.warning(
+                "No answer generated", user_input=turn.user_input, session_id=self.session_id, **timing
+            )
+        else:
             self.log.info(
-                "Chain invoked successfully",
+                "Chain streamed successfully" if streamed else "Chain invoked successfully",
                 session_id=self.session_id,
-                user_input=user_input,
+                user_input=turn.user_input,
                 answer_preview=str(answer)[:150],
+                **timing,
             )
-            return answer
+        return timing
+
+    def invoke(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None) -> str:
+        """Invoke the pipeline: (conditional) question rewrite -> answer cache -> retrieval -> answer."""
+        try:
+            self._require_retriever("invoke")
+            turn = self._run_prepare(user_input, chat_history or [])
+            if turn.hit is not None:
+                return turn.hit[0]["answer"]
+            with span("rag.generate"):
+                answer = self.answer_chain.invoke(turn.inputs())
+            self._finish(turn, answer)
+            return answer or "no answer generated."
+        except Exception as e:
+            self.log.error("Failed to invoke ConversationalRAG", error=str(e))
+            raise DocumentPortalException("Invocation error in ConversationalRAG", sys)
+
+    async def ainvoke(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None) -> str:
+        """Invoke the pipeline asynchronously (non-blocking LLM and retriever calls)."""
+        try:
+            self._require_retriever("ainvoke")
+            turn = await self._arun_prepare(user_input, chat_history or [])
+            if turn.hit is not None:
+                return turn.hit[0]["answer"]
+            with span("rag.generate"):
+                answer = await self.answer_chain.ainvoke(turn.inputs())
+            self._finish(turn, answer)
+            return answer or "no answer generated."
         except Exception as e:
             self.log.error("Failed to invoke ConversationalRAG", error=str(e))
             raise DocumentPortalException("Invocation error in ConversationalRAG", sys)
 
+    async def astream(
+        self, user_input: str, chat_history: Optional[List[BaseMessage]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the answer as it is generated.
+
+        Yields {"type": "token", "content": ...} events, then a single {"type": "end"} event
+        with the retrieved source metadata and stage timings. A cached answer is sent as one token.
+        """
+        self._require_retriever("astream")
+        try:
+            turn = await self._arun_prepare(user_input, chat_history or [])
+            if turn.hit is not None:
+                value, tier = turn.hit
+                yield {"type": "token", "content": value["answer"]}
+                yield {
+                    "type": "end",
+                    "sources": value["sources"],
+                    "timing": {"cache": tier, "total_ms": self._ms(turn.started, time.perf_counter())},
+                }
+                return
+            first_token = None
+            chunks = []
+            with span("rag.generate"):
+                async for token in self.answer_chain.astream(turn.inputs()):
+                    if not token:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    chunks.append(token)
+                    yield {"type": "token", "content": token}
+        except Exception as e:
+            self.log.error("Failed to stream ConversationalRAG", error=str(e), session_id=self.session_id)
+            raise DocumentPortalException("Streaming error in ConversationalRAG", e) from e
+
+        timing = self._finish(turn, "".join(chunks), streamed=True, first_token=first_token)
+        yield {"type": "end", "sources": turn.sources(), "timing": timing}
+
+    async def asummarize(self, summary: str, messages: List[BaseMessage], max_words: int = 250) -> str:
+        """Fold older conversation turns into the rolling summary kept by the conversation store."""
+        return await self.summary_chain.ainvoke(
+            {"summary": summary or "(none)", "messages": messages, "max_words": max_words}
+        )
 
     def _load_llm(self):
         try:
@@ -126,40 +321,3 @@ class ConversationalRAG:
         except Exception as e:
             self.log.error("Failed to load LLM", error=str(e))
             raise DocumentPortalException("LLM loading error in ConversationalRAG", sys)
-
-    @staticmethod
-    def _format_docs(docs) -> str:
-        return "\n\n".join(getattr(d, "page_content", str(d)) for d in docs)
-
-    def _build_lcel_chain(self):
-        try:
-            if self.retriever is None:
-                raise DocumentPortalException("No retriever set before building chain", sys)
-
-            # Rewrite user question with chat history context
-            question_rewriter = (
-                {"input": itemgetter("input"), "chat_history": itemgetter("chat_history")}
-                | self.contextualize_prompt
-                | self.llm
-                | StrOutputParser()
-            )
-
-            # Retrieve docs for rewritten question
-            retrieve_docs = question_rewriter | self.retriever | self._format_docs
-
-            # Answer using retrieved context + original input + chat history
-            self.chain = (
-                {
-                    "context": retrieve_docs,
-                    "input": itemgetter("input"),
-                    "chat_history": itemgetter("chat_history"),
-                }
-                | self.qa_prompt
-                | self.llm
-                | StrOutputParser()
-            )
-
-            self.log.info("LCEL graph built successfully", session_id=self.session_id)
-        except Exception as e:
-            self.log.error("Failed to build LCEL chain", error=str(e), session_id=self.session_id)
-            raise DocumentPortalException("Failed to build LCEL chain", sys)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from src.document_chat.retrieval import ConversationalRAG
+from src.document_ingestion.segment_store import MANIFEST
+from utils.config_loader import load_config
+from utils.tracing import cache_event
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+LEGACY_SUFFIXES = (".faiss", ".pkl")
+DATA_SUFFIXES = (".faiss", ".pkl", ".sqlite")
+
+
+@dataclass
+class _Entry:
+    rag: ConversationalRAG
+    signature: Tuple
+    size_bytes: int
+
+
+class SessionRegistry:
+    '''Process-wide LRU registry of loaded vector stores and LCEL chains, keyed by index directory.
+
+    Loads are single-flight: concurrent misses for the same index wait for the first caller's load
+    instead of each reading the index.
+    '''
+
+    def __init__(self, max_entries: int = 32, max_memory_mb: int = 1024):
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self._entries: "OrderedDict[Tuple[str, str, int], _Entry]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str, int], Tuple[Tuple, Future]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_config(cls) -> "SessionRegistry":
+        '''Build a registry from the session_cache section of config.yaml.'''
+        cfg = load_config().get("session_cache", {}) or {}
+        return cls(
+            max_entries=int(cfg.get("max_entries", 32)),
+            max_memory_mb=int(cfg.get("max_memory_mb", 1024)),
+        )
+
+    @staticmethod
+    def _signature(index_dir: str, index_name: str) -> Tuple:
+        '''Fingerprint the on-disk index files so re-indexing invalidates the cached entry.'''
+        sig = []
+        paths = [os.path.join(index_dir, MANIFEST)]
+        paths += [os.path.join(index_dir, f"{index_name}{suffix}") for suffix in LEGACY_SUFFIXES]
+        for path in paths:
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+
+    @staticmethod
+    def _size_of(index_dir: str) -> int:
+        '''Approximate footprint of a loaded index (mapped segments, docstore) by its files on disk.'''
+        try:
+            with os.scandir(index_dir) as it:
+                return sum(e.stat().st_size for e in it if e.is_file() and e.name.endswith(DATA_SUFFIXES))
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(e.size_bytes for e in self._entries.values())
+
+    def get(
+        self,
+        index_dir: str,
+        *,
+        k: int = 5,
+        index_name: str = "index",
+        session_id: Optional[str] = None,
+    ) -> ConversationalRAG:
+        '''Return a ready ConversationalRAG for index_dir, loading it from disk on a miss.'''
+        index_dir = os.path.abspath(index_dir)
+        key = (index_dir, index_name, k)
+        signature = self._signature(index_dir, index_name)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                cache_event("session", True)
+                return entry.rag
+            if entry is not None:
+                del self._entries[key]
+                log.info("Session cache entry stale, reloading", index_dir=index_dir)
+            loading = self._loading.get(key)
+            if loading is not None and loading[0] == signature:
+                self.coalesced += 1
+                future, leader = loading[1], False
+            else:
+                future, leader = Future(), True
+                self._loading[key] = (signature, future)
+                self.misses += 1
+        if not leader:
+            return future.result()
+        cache_event("session", False)
+
+        try:
+            rag = ConversationalRAG(session_id=session_id)
+            rag.load_retriever_from_faiss(index_dir, k=k, index_name=index_name)
+        except Exception as e:
+            log.error("Failed to load session into cache", error=str(e), index_dir=index_dir)
+            error = DocumentPortalException("Failed to load session into cache", e)
+            with self._lock:
+                if self._loading.get(key, (None, None))[1] is future:
+                    del self._loading[key]
+            future.set_exception(error)
+            raise error from e
+
+        with self._lock:
+            # Not cached if invalidated (or superseded by a newer index) while loading
+            if self._loading.get(key, (None, None))[1] is future:
+                del self._loading[key]
+                self._entries[key] = _Entry(rag=rag, signature=signature, size_bytes=self._size_of(index_dir))
+                self._entries.move_to_end(key)
+                self._evict()
+        future.set_result(rag)
+        log.info("Session loaded into cache", index_dir=index_dir, k=k, entries=len(self._entries))
+        return rag
+
+    def _evict(self):
+        '''Drop least recently used entries until both the entry and memory budgets hold.'''
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (len(self._entries) > 1 and self.memory_bytes > self.max_memory_bytes)
+        ):
+            key, entry = self._entries.popitem(last=False)
+            log.info("Session evicted from cache", index_dir=key[0], size_bytes=entry.size_bytes)
+
+    def invalidate(self, index_dir: str):
+        '''Drop every cached entry that points at index_dir.'''
+        index_dir = os.path.abspath(index_dir)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == index_dir]:
+                del self._entries[key]
+            for key in [k for k in self._loading if k[0] == index_dir]:
+                del self._loading[key]
+
+    def loaded_dirs(self) -> Set[str]:
+        '''Index directories with a loaded entry (pinned against disk eviction).'''
+        with self._lock:
+            return {key[0] for key in self._entries}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+            self.hits = self.misses = self.coalesced = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self.memory_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
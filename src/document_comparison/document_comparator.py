@@ -6,6 +6,9 @@ from exception.custom_exception import DocumentPortalException
 from model.models import *
 from prompt.prompt_library import PROMPT_REGISTERY
 from utils.model_loader import ModelLoader
+from utils.config_loader import load_config
+from utils.tracing import span, observe_count
+from src.document_comparison.page_alignment import IDENTICAL_ROW, PAGE_ADDED, PAGE_REMOVED, PagePair, align_pages
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.output_parsers import OutputFixingParser
 
@@ -19,6 +22,14 @@ class DocumentComparatorLLM:
         self.fixing_parser = OutputFixingParser.from_llm(llm=self.llm, parser=self.parser)
         self.prompt = PROMPT_REGISTERY[PromptType.DOCUMENT_COMPARISON.value]
         self.chain = self.prompt | self.llm | self.parser 
+        self.page_chain = PROMPT_REGISTERY[PromptType.PAGE_COMPARISON.value] | self.llm | self.parser
+        self.diff_chain = PROMPT_REGISTERY[PromptType.DIFF_SUMMARY.value] | self.llm | self.parser
+        cfg = load_config().get("comparison", {}) or {}
+        self.max_concurrency = int(cfg.get("max_concurrency", 8))
+        self.min_page_similarity = float(cfg.get("min_page_similarity", 0.3))
+        self.max_page_chars = int(cfg.get("max_page_chars", 12000))
+        # page calls that failed and were reported inline; such results should not be cached
+        self.failed_calls = 0
         self.log.info("DocumentComparator initialized successfully.")
 
     def compare_documents(self, combined_docs: str) -> pd.DataFrame:
@@ -27,7 +38,8 @@ class DocumentComparatorLLM:
             inputs = {"combined_documents" : combined_docs,
                       "format_instructions": self.parser.get_format_instructions()}
             self.log.info("Starting document comparison", inputs=inputs)
-            response = self.chain.invoke(inputs)
+            with span("compare.llm"):
+                response = self.chain.invoke(inputs)
             self.log.info("Chain invoked successfully", response=response)
             return self._format_response(response)
             
@@ -35,6 +47,127 @@ class DocumentComparatorLLM:
             self.log.error(f"Error in compare_documents: {e}")
             raise DocumentPortalException("An error occured while comparing documents", sys)
 
+    async def acompare_documents(self, combined_docs: str) -> pd.DataFrame:
+        """Asynchronously compares two documents and returns the differences."""
+        try:
+            inputs = {"combined_documents" : combined_docs,
+                      "format_instructions": self.parser.get_format_instructions()}
+            self.log.info("Starting document comparison", chars=len(combined_docs))
+            with span("compare.llm"):
+                response = await self.chain.ainvoke(inputs)
+            self.log.info("Chain invoked successfully", response=response)
+            return self._format_response(response)
+
+        except Exception as e:
+            self.log.error(f"Error in acompare_documents: {e}")
+            raise DocumentPortalException("An error occured while comparing documents", sys)
+
+    async def acompare_pages(self, reference_pages: list[str], actual_pages: list[str]) -> pd.DataFrame:
+        """Map-reduce comparison: align pages locally, skip identical ones, compare the rest concurrently."""
+        try:
+            with span("compare.align"):
+                pairs = align_pages(reference_pages, actual_pages, self.min_page_similarity)
+            changed = [p for p in pairs if not p.identical and p.ref_page is not None and p.act_page is not None]
+            self.log.info(
+                "Pages aligned",
+                reference_pages=len(reference_pages),
+                actual_pages=len(actual_pages),
+                identical=sum(p.identical for p in pairs),
+                changed=len(changed),
+                added=sum(p.ref_page is None for p in pairs),
+                removed=sum(p.act_page is None for p in pairs),
+            )
+            inputs = [self._page_inputs(p) for p in changed]
+            observe_count("compare.changed_pages", len(changed))
+            with span("compare.llm"):
+                responses = await self.page_chain.abatch(
+                    inputs, config={"max_concurrency": self.max_concurrency}, return_exceptions=True
+                )
+            return self._format_response(self._merge_pages(pairs, responses))
+        except Exception as e:
+            self.log.error(f"Error in acompare_pages: {e}")
+            raise DocumentPortalException("An error occured while comparing documents", sys)
+
+    def _page_inputs(self, pair: PagePair) -> dict:
+        return {
+            "page": pair.label,
+            "reference_page": pair.ref_text[: self.max_page_chars],
+            "actual_page": pair.act_text[: self.max_page_chars],
+            "format_instructions": self.parser.get_format_instructions(),
+        }
+
+    def _merge_pages(self, pairs: list[PagePair], responses: list) -> list[dict]:
+        """Reduce per-page results (in the order of the changed pairs) into ChangeFormat rows in document order."""
+        rows, results = [], iter(responses)
+        for pair in pairs:
+            if pair.identical:
+                continue
+            if pair.act_page is None:
+                rows.append({"Page": pair.label, "Changes": PAGE_REMOVED})
+                continue
+            if pair.ref_page is None:
+                rows.append({"Page": pair.label, "Changes": PAGE_ADDED})
+                continue
+            response = next(results)
+            if isinstance(response, Exception):
+                self.log.error("Page comparison failed", page=pair.label, error=str(response))
+                self.failed_calls += 1
+                rows.append({"Page": pair.label, "Changes": f"Comparison failed for this page: {response}"})
+                continue
+            rows += self._rows_from(response, pair.label)
+        if not rows:
+            rows.append(dict(IDENTICAL_ROW))
+        return rows
+
+    @staticmethod
+    def _rows_from(response, page: str) -> list[dict]:
+        """ChangeFormat rows of one page's LLM response, labelled with the aligned page."""
+        rows = []
+        for row in response if isinstance(response, list) else [response]:
+            changes = str(row.get("Changes", "")).strip() if isinstance(row, dict) else str(row)
+            if changes and changes.upper() != "NO CHANGE":
+                rows.append(ChangeFormat(Page=page, Changes=changes).model_dump())
+        return rows
+
+    async def asummarize_diff(self, rows: list[dict]) -> pd.DataFrame:
+        """Explain local diff rows with the LLM: one concurrent call per changed page, raw rows on failure."""
+        try:
+            pages: dict[str, list[str]] = {}
+            for row in rows:
+                pages.setdefault(str(row["Page"]), []).append(row["Changes"])
+            todo = [
+                page for page, changes in pages.items()
+                if page != IDENTICAL_ROW["Page"] and changes not in ([PAGE_ADDED], [PAGE_REMOVED])
+            ]
+            inputs = [
+                {
+                    "page": page,
+                    "changes": "\n".join(f"- {c}" for c in pages[page]),
+                    "format_instructions": self.parser.get_format_instructions(),
+                }
+                for page in todo
+            ]
+            with span("compare.summarize"):
+                responses = await self.diff_chain.abatch(
+                    inputs, config={"max_concurrency": self.max_concurrency}, return_exceptions=True
+                )
+            results = dict(zip(todo, responses))
+            merged = []
+            for page, changes in pages.items():
+                response = results.get(page)
+                if isinstance(response, Exception):
+                    self.log.error("Diff summary failed", page=page, error=str(response))
+                    self.failed_calls += 1
+                if response is None or isinstance(response, Exception):
+                    merged += [{"Page": page, "Changes": c} for c in changes]
+                else:
+                    merged += self._rows_from(response, page)
+            self.log.info("Diff summarized", pages=len(pages), llm_calls=len(todo))
+            return self._format_response(merged)
+        except Exception as e:
+            self.log.error(f"Error in asummarize_diff: {e}")
+            raise DocumentPortalException("An error occured while summarizing the diff", sys)
+
     def _format_response(self, response: list[dict]) -> pd.DataFrame:
         """Formats the comparison response."""
         try:
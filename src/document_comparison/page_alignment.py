@@ -0,0 +1,122 @@
+'''Local page alignment of a reference and an actual PDF, so only pages that differ need an LLM.
+
+Pages are fingerprinted on whitespace/hyphenation-normalized text. A diff over the fingerprint
+sequences pairs identical pages and isolates inserted, deleted and changed runs; inside a changed
+run pages are paired by word-shingle similarity with an order-preserving alignment.
+'''
+import re
+import hashlib
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import FrozenSet, List, Optional, Sequence
+
+_HYPHEN_BREAK = re.compile(r"(\w)-\s*\n\s*(\w)")
+_SPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+
+# Changed runs larger than this many page pairs only compare pages near the diagonal
+_MAX_ALIGN_CELLS = 40000
+_BAND = 8
+
+PAGE_REMOVED = "Page removed: present only in the reference document."
+PAGE_ADDED = "Page added: present only in the actual document."
+IDENTICAL_ROW = {"Page": "All", "Changes": "The documents are identical."}
+
+
+def join_hyphenated(text: str) -> str:
+    '''Rejoin words hyphenated across line breaks ("agree-\\nment" -> "agreement").'''
+    return _HYPHEN_BREAK.sub(r"\1\2", text)
+
+
+def normalize_text(text: str) -> str:
+    '''Join words hyphenated across line breaks and collapse all whitespace runs to one space.'''
+    return _SPACE.sub(" ", join_hyphenated(text)).strip()
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _shingles(text: str) -> FrozenSet[str]:
+    words = _WORD.findall(normalize_text(text).lower())
+    if len(words) < 2:
+        return frozenset(words)
+    return frozenset(" ".join(pair) for pair in zip(words, words[1:]))
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    '''Jaccard similarity of two shingle sets (1.0 for two empty pages).'''
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class PagePair:
+    '''One aligned unit; ref_page/act_page are 1-based page numbers, None for an added/removed page.'''
+    ref_page: Optional[int]
+    act_page: Optional[int]
+    ref_text: str = ""
+    act_text: str = ""
+    identical: bool = False
+    similarity: float = 0.0
+
+    @property
+    def label(self) -> str:
+        if self.ref_page is None:
+            return str(self.act_page)
+        if self.act_page is None or self.act_page == self.ref_page:
+            return str(self.ref_page)
+        return f"{self.ref_page} (reference) / {self.act_page} (actual)"
+
+
+def _align_run(
+    ref: Sequence[str], act: Sequence[str], ref_start: int, act_start: int, min_similarity: float
+) -> List[PagePair]:
+    '''Order-preserving pairing of a changed run that maximises total similarity (pairs below
+    min_similarity are reported as a removed plus an added page).'''
+    m, n = len(ref), len(act)
+    ref_sh = [_shingles(t) for t in ref]
+    act_sh = [_shingles(t) for t in act]
+    sim = [[0.0] * n for _ in range(m)]
+    band = None if m * n <= _MAX_ALIGN_CELLS else abs(m - n) + _BAND
+    for i in range(m):
+        lo, hi = (0, n) if band is None else (max(0, i * n // m - band), min(n, i * n // m + band + 1))
+        for j in range(lo, hi):
+            sim[i][j] = similarity(ref_sh[i], act_sh[j])
+    score = [[0.0] * (n + 1) for _ in range(m + 1)]
+    for i in range(m - 1, -1, -1):
+        for j in range(n - 1, -1, -1):
+            best = max(score[i + 1][j], score[i][j + 1])
+            if sim[i][j] >= min_similarity:
+                best = max(best, sim[i][j] + score[i + 1][j + 1])
+            score[i][j] = best
+
+    pairs, i, j = [], 0, 0
+    while i < m or j < n:
+        if i < m and j < n and sim[i][j] >= min_similarity and score[i][j] == sim[i][j] + score[i + 1][j + 1]:
+            pairs.append(PagePair(ref_start + i + 1, act_start + j + 1, ref[i], act[j], similarity=sim[i][j]))
+            i, j = i + 1, j + 1
+        elif i < m and (j == n or score[i][j] == score[i + 1][j]):
+            pairs.append(PagePair(ref_start + i + 1, None, ref_text=ref[i]))
+            i += 1
+        else:
+            pairs.append(PagePair(None, act_start + j + 1, act_text=act[j]))
+            j += 1
+    return pairs
+
+
+def align_pages(ref_pages: Sequence[str], act_pages: Sequence[str], min_similarity: float = 0.3) -> List[PagePair]:
+    '''Align two documents page by page, in document order.'''
+    ref_fp = [fingerprint(t) for t in ref_pages]
+    act_fp = [fingerprint(t) for t in act_pages]
+    pairs: List[PagePair] = []
+    for op, i1, i2, j1, j2 in SequenceMatcher(None, ref_fp, act_fp, autojunk=False).get_opcodes():
+        if op == "equal":
+            pairs += [
+                PagePair(i1 + k + 1, j1 + k + 1, ref_pages[i1 + k], act_pages[j1 + k], identical=True, similarity=1.0)
+                for k in range(i2 - i1)
+            ]
+        else:
+            pairs += _align_run(ref_pages[i1:i2], act_pages[j1:j2], i1, j1, min_similarity)
+    return pairs
@@ -0,0 +1,124 @@
+from __future__ import annotations
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from utils.config_loader import load_config
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "auto")
+_ADD_CHUNK = 20_000
+
+
+@dataclass
+class IndexSpec:
+    '''ANN index settings from the faiss_db.index section of config.yaml.
+
+    With type "auto" the index is picked by vector count: flat below auto_flat_max, HNSW up to
+    auto_hnsw_max and IVF-Flat beyond that, where HNSW build time dominates. IVF-PQ trades recall
+    for a much smaller index and is only used when configured explicitly.
+    '''
+    type: str = "auto"
+    auto_flat_max: int = 50_000
+    auto_hnsw_max: int = 1_000_000
+    nlist: Optional[int] = None
+    nprobe: int = 16
+    pq_m: int = 64
+    pq_nbits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 80
+    ef_search: int = 64
+    train_points_per_list: int = 64
+
+    @classmethod
+    def from_config(cls) -> "IndexSpec":
+        cfg = (load_config().get("faiss_db", {}) or {}).get("index", {}) or {}
+        ivf, pq, hnsw, auto = (cfg.get(k, {}) or {} for k in ("ivf", "pq", "hnsw", "auto"))
+        spec = cls(
+            type=str(cfg.get("type", "auto")).lower(),
+            auto_flat_max=int(auto.get("flat_max", 50_000)),
+            auto_hnsw_max=int(auto.get("hnsw_max", 1_000_000)),
+            nlist=ivf.get("nlist"),
+            nprobe=int(ivf.get("nprobe", 16)),
+            pq_m=int(pq.get("m", 64)),
+            pq_nbits=int(pq.get("nbits", 8)),
+            hnsw_m=int(hnsw.get("m", 32)),
+            ef_construction=int(hnsw.get("ef_construction", 80)),
+            ef_search=int(hnsw.get("ef_search", 64)),
+            train_points_per_list=int(ivf.get("train_points_per_list", 64)),
+        )
+        if spec.type not in INDEX_TYPES:
+            raise DocumentPortalException(f"Unknown faiss_db.index.type '{spec.type}', expected one of {INDEX_TYPES}")
+        return spec
+
+    def resolve(self, ntotal: int) -> str:
+        '''Concrete index type for ntotal vectors.'''
+        if self.type != "auto":
+            return self.type
+        if ntotal < self.auto_flat_max:
+            return "flat"
+        if ntotal < self.auto_hnsw_max:
+            return "hnsw"
+        return "ivf_flat"
+
+    def nlist_for(self, ntotal: int) -> int:
+        '''Number of IVF lists: configured, else ~4*sqrt(n), capped so each list gets enough training points.'''
+        nlist = int(self.nlist) if self.nlist else int(4 * math.sqrt(ntotal))
+        return max(1, min(nlist, ntotal // 39))
+
+    def pq_m_for(self, dim: int) -> int:
+        '''PQ sub-quantizers must divide the dimension; use the largest divisor not above pq_m.'''
+        return next(m for m in range(min(self.pq_m, dim), 0, -1) if dim % m == 0)
+
+
+def build_index(vectors: np.ndarray, spec: IndexSpec) -> faiss.Index:
+    '''Build (and train, if needed) an L2 index over vectors, which may be a read-only memmap.'''
+    ntotal, dim = vectors.shape
+    kind = spec.resolve(ntotal)
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, spec.hnsw_m)
+        index.hnsw.efConstruction = spec.ef_construction
+    else:
+        nlist = spec.nlist_for(ntotal)
+        quantizer = faiss.IndexFlatL2(dim)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, spec.pq_m_for(dim), spec.pq_nbits)
+        index.referenced_objects = [quantizer]
+        n_train = nlist * spec.train_points_per_list
+        if kind == "ivf_pq":
+            n_train = max(n_train, 39 * 2 ** spec.pq_nbits)  # faiss wants >= 39 points per PQ centroid
+        n_train = min(ntotal, n_train)
+        sample = np.sort(np.random.default_rng(0).choice(ntotal, size=n_train, replace=False))
+        index.train(np.ascontiguousarray(vectors[sample], dtype=np.float32))
+
+    extend_index(index, vectors)
+    tune(index, spec)
+    log.info("ANN index built", type=kind, ntotal=ntotal, dim=dim)
+    return index
+
+
+def extend_index(index: faiss.Index, vectors: np.ndarray) -> faiss.Index:
+    '''Add vectors in chunks so a memmapped source is never copied whole.'''
+    for start in range(0, vectors.shape[0], _ADD_CHUNK):
+        index.add(np.ascontiguousarray(vectors[start:start + _ADD_CHUNK], dtype=np.float32))
+    return index
+
+
+def tune(index: faiss.Index, spec: IndexSpec) -> faiss.Index:
+    '''Apply query-time parameters, so they can change without rebuilding the index.'''
+    # read_index() already returns the concrete subclass; a downcast_index() wrapper would not own it
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(spec.nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = spec.ef_search
+    return index
@@ -0,0 +1,189 @@
+'''Record of the chunks already in a session index, used to skip duplicates before embedding.
+
+Chunks are keyed by a hash of their normalized text (Unicode NFKC, case-folded, whitespace
+collapsed), so the same passage is embedded once per index whatever file, upload or session
+directory it came from. Optionally, a 64-bit SimHash over word shingles also drops near-duplicates
+(boilerplate headers, footers and disclaimers repeated across files with small variations): a
+chunk within max_hamming bits of an indexed one is skipped. Near-duplicate lookups split the
+SimHash into max_hamming + 1 bands, one of which must match exactly.
+
+The ledger is a small SQLite table (16-byte keys, WITHOUT ROWID) next to the index. New keys are
+held in memory until commit(), which FaissManager calls right after appending the segment that
+holds their vectors; rollback() releases the keys of a batch that failed before it was appended.
+'''
+from __future__ import annotations
+import re
+import sqlite3
+import hashlib
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from utils.config_loader import load_config
+from src.document_ingestion.segment_store import SegmentStore
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+LEDGER = "ingested.sqlite"
+LEGACY_LEDGER = "ingested_meta.json"
+_SPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+
+
+def normalize_chunk(text: str) -> str:
+    return _SPACE.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def chunk_fingerprint(text: str) -> bytes:
+    '''16-byte key of a chunk's normalized text.'''
+    return hashlib.sha256(normalize_chunk(text).encode("utf-8")).digest()[:16]
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    '''64-bit SimHash of the word shingles of a chunk's normalized text.'''
+    words = _WORD.findall(normalize_chunk(text))
+    grams = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    digests = b"".join(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest() for g in grams)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0) * 2 > len(grams)
+    return int.from_bytes(np.packbits(votes, bitorder="little").tobytes(), "little")
+
+
+def _signed(value: int) -> int:
+    '''SQLite integers are signed 64-bit.'''
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class ChunkLedger:
+    '''Exact (and optionally near-duplicate) chunk ledger of one index directory.'''
+
+    def __init__(self, index_dir: Path, near_duplicates: bool = False, max_hamming: int = 3, min_words: int = 8):
+        self.index_dir = Path(index_dir)
+        self.path = self.index_dir / LEDGER
+        self.near_duplicates = near_duplicates
+        self.max_hamming = max_hamming
+        self.min_words = min_words
+        self._bands = max_hamming + 1
+        self._band_bits = 64 // self._bands
+        fresh = not self.path.exists()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS chunks (fp BLOB PRIMARY KEY, simhash INTEGER) WITHOUT ROWID")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, value INTEGER NOT NULL, fp BLOB NOT NULL,"
+            " PRIMARY KEY (band, value, fp)) WITHOUT ROWID"
+        )
+        self._db.commit()
+        self._pending: Dict[bytes, Optional[int]] = {}
+        self._pending_bands: Dict[tuple, List[int]] = {}
+        self.skipped_exact = 0
+        self.skipped_near = 0
+        if fresh:
+            self._adopt_existing()
+
+    @classmethod
+    def from_config(cls, index_dir: Path) -> "ChunkLedger":
+        cfg = ((load_config().get("ingestion", {}) or {}).get("dedup", {}) or {})
+        return cls(
+            index_dir,
+            near_duplicates=bool(cfg.get("near_duplicates", False)),
+            max_hamming=int(cfg.get("max_hamming", 3)),
+            min_words=int(cfg.get("min_words", 8)),
+        )
+
+    def _adopt_existing(self):
+        '''Build the ledger from the chunks of an index written before it existed.'''
+        store = SegmentStore(self.index_dir)
+        legacy = self.index_dir / LEGACY_LEDGER
+        if store.exists():
+            self.record(store.iter_texts())
+            self.commit()
+            log.info("Chunk ledger rebuilt from index", index_dir=str(self.index_dir), chunks=len(self))
+        legacy.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] + len(self._pending)
+
+    def _band_values(self, sh: int) -> List[tuple]:
+        mask = (1 << self._band_bits) - 1
+        return [(b, sh >> (b * self._band_bits) & mask) for b in range(self._bands)]
+
+    def _has_near(self, sh: int) -> bool:
+        for band, value in self._band_values(sh):
+            candidates = [
+                s & ((1 << 64) - 1)
+                for (s,) in self._db.execute(
+                    "SELECT c.simhash FROM bands b JOIN chunks c ON c.fp = b.fp WHERE b.band = ? AND b.value = ?",
+                    (band, value),
+                )
+            ] + self._pending_bands.get((band, value), [])
+            if any(bin(sh ^ c).count("1") <= self.max_hamming for c in candidates):
+                return True
+        return False
+
+    def _exists(self, fp: bytes) -> bool:
+        return fp in self._pending or self._db.execute("SELECT 1 FROM chunks WHERE fp = ?", (fp,)).fetchone() is not None
+
+    def _add(self, fp: bytes, sh: Optional[int]):
+        self._pending[fp] = sh
+        if sh is not None:
+            for key in self._band_values(sh):
+                self._pending_bands.setdefault(key, []).append(sh)
+
+    def claim(self, texts: Sequence[str]) -> List[bool]:
+        '''For each text, True if it is new (and is now recorded as pending), False if it duplicates
+        an indexed or earlier chunk.'''
+        keep = []
+        for text in texts:
+            fp = chunk_fingerprint(text)
+            if self._exists(fp):
+                self.skipped_exact += 1
+                keep.append(False)
+                continue
+            sh = None
+            if self.near_duplicates and len(_WORD.findall(text)) >= self.min_words:
+                sh = simhash(text)
+                if self._has_near(sh):
+                    self.skipped_near += 1
+                    keep.append(False)
+                    continue
+            self._add(fp, sh)
+            keep.append(True)
+        return keep
+
+    def record(self, texts: Iterable[str]):
+        '''Mark texts as indexed without deduplicating them.'''
+        for text in texts:
+            fp = chunk_fingerprint(text)
+            if not self._exists(fp):
+                self._add(fp, simhash(text) if self.near_duplicates and len(_WORD.findall(text)) >= self.min_words else None)
+
+    def commit(self):
+        if not self._pending:
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO chunks (fp, simhash) VALUES (?, ?)",
+                [(fp, None if sh is None else _signed(sh)) for fp, sh in self._pending.items()],
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO bands (band, value, fp) VALUES (?, ?, ?)",
+                [
+                    (band, value, fp)
+                    for fp, sh in self._pending.items() if sh is not None
+                    for band, value in self._band_values(sh)
+                ],
+            )
+        self._pending.clear()
+        self._pending_bands.clear()
+
+    def rollback(self):
+        '''Forget pending keys, e.g. after embedding their chunks failed.'''
+        self._pending.clear()
+        self._pending_bands.clear()
+
+    def close(self):
+        self._db.close()
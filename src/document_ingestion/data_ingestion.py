@@ -1,105 +1,219 @@
 from __future__ import annotations
 import os
 import sys
-import json
-import uuid
-import hashlib
 import shutil
 from pathlib import Path
-from datetime import datetime, timezone
-from typing import Iterable, List, Optional, Dict, Any
+from dataclasses import dataclass, asdict
+from typing import Callable, Iterable, Iterator, List, Optional, Dict
 
-import fitz
 from langchain.schema import Document
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 
 from utils.model_loader import ModelLoader
+from utils.config_loader import load_config
+from utils.embedding_cache import EmbeddingCache, CachedEmbeddings
+from utils.embedding_executor import BatchedEmbeddings
+from utils.concurrency import run_blocking
+from utils.tracing import span, traced, traced_iter, observe_count
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 
-from utils.file_io import generate_session_id, save_uploaded_files
-from utils.document_ops import load_documents, concat_for_analysis, concat_for_comparison
+from utils.file_io import UploadRejected, generate_session_id, save_upload, save_uploaded_files
+from utils.document_ops import iter_documents
+from utils.pdf_engine import iter_pdf_pages, read_pdf_text
+from src.document_ingestion.segment_store import SegmentStore
+from src.document_ingestion.chunk_ledger import ChunkLedger
+from src.document_chat.hybrid_retriever import make_retriever
 
 SUPPORTED_FILE_TYPES = ['.txt', '.pdf', '.docx']
 
+log = CustomLogger().get_logger(__name__)
+
 class FaissManager:
-    '''Class to manage FAISS vector store creation and loading.'''
+    '''Class to manage FAISS vector store creation and loading.
+
+    Vectors and documents live in an append-only SegmentStore, so adding documents writes only
+    the new rows instead of re-serializing the whole index.
+    '''
     def __init__(self, index_dir: Path, model_loader: Optional[ModelLoader] = None):
         self.index_dir = Path(index_dir)
         self.index_dir.mkdir(parents=True, exist_ok=True)
         
-        self.meta_path = self.index_dir / "ingested_meta.json"
-        self._meta: Dict[str, Any] = {"rows": {}}
-
-        # Load existing metadata if available
-        if self.meta_path.exists():
-            try:
-                self._meta = json.loads(self.meta_path.read_text(encoding="utf-8")) or {"rows": {}}
-            except Exception:
-                self._meta = {"rows": {}}
-        
-        # Initialize model loader and embeddings
+        # Initialize model loader and embeddings: cache hits are served locally, misses go through
+        # the batched, rate-limited executor
         self.model_loader = model_loader or ModelLoader()
-        self.emb = self.model_loader.load_embeddings()
+        self.emb = BatchedEmbeddings.shared(self.model_loader.load_embeddings())
+        cache = EmbeddingCache.shared(self.model_loader.config["embedding_model"]["model_name"])
+        if cache is not None:
+            self.emb = CachedEmbeddings(self.emb, cache)
         self.vs: Optional[FAISS] = None
 
-    def _exists(self)-> bool:
-        '''Check if FAISS index files exist in the index directory.'''
+        self.store = SegmentStore.from_config(self.index_dir)
+        if not self.store.exists() and self._legacy_exists():
+            self._migrate_legacy()
+        # Chunks already in this index, keyed by normalized text (and optionally SimHash)
+        self.ledger = ChunkLedger.from_config(self.index_dir)
+
+    def _legacy_exists(self) -> bool:
         return (self.index_dir / "index.faiss").exists() and (self.index_dir / "index.pkl").exists()
-    
 
-    @staticmethod
-    def _fingerprint(text: str, md: Dict[str, Any]) -> str:
-        '''Generate a unique fingerprint for a document based on its content and metadata.'''
-        src = md.get("source") or md.get("file_path")
-        rid = md.get("row_id")
-        if src is not None:
-            return f"{src}::{'' if rid is None else rid}"
-        return hashlib.sha256(text.encode("utf-8")).hexdigest()
-
-    def _save_meta(self):
-        '''Save the metadata to the meta JSON file.'''
-        self.meta_path.write_text(json.dumps(self._meta, ensure_ascii=False, indent=2), encoding="utf-8")
-
-    def add_documents(self,docs: List[Document]):
-        '''Add documents to the FAISS vector store idempotently.'''
-        if self.vs is None:
-            raise RuntimeError("Call load_or_create() before add_documents().")
-        
-        new_docs: List[Document] = []
+    def _migrate_legacy(self):
+        '''Convert an index written by save_local() into a segment, once.'''
+        vs = FAISS.load_local(str(self.index_dir), embeddings=self.emb, allow_dangerous_deserialization=True)
+        self.store.import_faiss(vs)
+        for name in ("index.faiss", "index.pkl"):
+            (self.index_dir / name).unlink(missing_ok=True)
+        log.info("Legacy FAISS index migrated to segments", index_dir=str(self.index_dir), rows=vs.index.ntotal)
+
+    def _exists(self)-> bool:
+        '''Check if a FAISS index exists in the index directory.'''
+        return self.store.exists()
 
-        # Filter out documents already ingested
-        for d in docs:
-            key = self._fingerprint(d.page_content, d.metadata or {})
-            if key in self._meta["rows"]:
-                continue
-            self._meta["rows"][key] = True
-            new_docs.append(d)
+    @property
+    def version(self) -> int:
+        '''Monotonic index version, bumped on every append.'''
+        return self.store.version
+
+    @traced("index.dedup")
+    def _new_documents(self, docs: List[Document]) -> List[Document]:
+        '''Filter out chunks whose text is already indexed (or repeated in docs) and mark the rest as seen.'''
+        keep = self.ledger.claim([d.page_content for d in docs])
+        new_docs = [d for d, k in zip(docs, keep) if k]
+        if len(new_docs) < len(docs):
+            log.info("Duplicate chunks skipped", index_dir=str(self.index_dir), skipped=len(docs) - len(new_docs),
+                     exact=self.ledger.skipped_exact, near=self.ledger.skipped_near)
+        return new_docs
+
+    @traced("index.persist")
+    def persist(self):
+        '''Commit the chunk ledger; called right after each append so it always matches the index.'''
+        self.ledger.commit()
+
+    def _record(self, texts: List[str]):
+        '''Record what a freshly created index holds so add_documents() does not embed it again.'''
+        self.ledger.record(texts)
+
+    def close(self):
+        '''Close the chunk ledger's SQLite connection; a loaded vector store stays usable.'''
+        self.ledger.close()
+
+    def __enter__(self) -> "FaissManager":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @traced("index.append")
+    def _append(self, texts: List[str], metadatas: List[dict], vectors: List[List[float]]):
+        '''Write a new segment and commit the ledger entries of its chunks; an already loaded
+        vector store is remapped to include it.'''
+        self.store.append(vectors, texts, metadatas)
+        self.persist()
+        if self.vs is not None:
+            self._load()
+
+    def add_documents(self, docs: List[Document]):
+        '''Add documents to the FAISS vector store idempotently, creating the index on first use.
+
+        Each call is durable on its own: the segment and the ledger entries of its chunks are written
+        together, and chunks claimed by a call that fails before its append are released again.
+        '''
+        new_docs = self._new_documents(docs)
 
         # Add new documents to the vector store    
         if new_docs:
-            self.vs.add_documents(new_docs)
-            self.vs.save_local(str(self.index_dir))
-            self._save_meta()
+            texts = [d.page_content for d in new_docs]
+            metadatas = [d.metadata for d in new_docs]
+            try:
+                with span("index.embed"):
+                    vectors = self.emb.embed_documents(texts)
+                observe_count("index.embed", len(texts))
+                self._append(texts, metadatas, vectors)
+            except BaseException:
+                self.ledger.rollback()
+                raise
+        return len(new_docs)
+
+    async def aadd_documents(self, docs: List[Document]):
+        '''Async add_documents(): embeddings are awaited, disk work runs on the worker pool.'''
+        new_docs = self._new_documents(docs)
+        if new_docs:
+            texts = [d.page_content for d in new_docs]
+            metadatas = [d.metadata for d in new_docs]
+            try:
+                with span("index.embed"):
+                    vectors = await self.emb.aembed_documents(texts)
+                observe_count("index.embed", len(texts))
+                await run_blocking(self._append, texts, metadatas, vectors)
+            except BaseException:
+                self.ledger.rollback()
+                raise
         return len(new_docs)
 
+    @traced("index.load")
+    def _load(self):
+        self.vs = self.store.load(self.emb)
+        return self.vs
+
     def load_or_create(self,texts:Optional[List[str]]=None, metadatas: Optional[List[dict]] = None):
         '''Load existing FAISS index or create a new one from provided texts and metadatas.'''
         if self._exists():
-            self.vs = FAISS.load_local(
-                str(self.index_dir),
-                embeddings=self.emb,
-                allow_dangerous_deserialization=True,
-            )
-            return self.vs
+            return self._load()
         if not texts:
             raise DocumentPortalException("No existing FAISS index and no data to create one", sys)
         
-        self.vs = FAISS.from_texts(texts=texts, embedding=self.emb, metadatas=metadatas or [])
-        self.vs.save_local(str(self.index_dir))
-        return self.vs
+        metadatas = metadatas or [{} for _ in texts]
+        with span("index.embed"):
+            vectors = self.emb.embed_documents(texts)
+        self._record(texts)
+        try:
+            self._append(texts, metadatas, vectors)
+        except BaseException:
+            self.ledger.rollback()
+            raise
+        return self._load()
+
+    async def aload_or_create(self, texts: Optional[List[str]] = None, metadatas: Optional[List[dict]] = None):
+        '''Async load_or_create(): disk work runs on the worker pool, embeddings are awaited.'''
+        if self._exists():
+            return await run_blocking(self._load)
+        if not texts:
+            raise DocumentPortalException("No existing FAISS index and no data to create one", sys)
+
+        metadatas = metadatas or [{} for _ in texts]
+        with span("index.embed"):
+            vectors = await self.emb.aembed_documents(texts)
+        self._record(texts)
+        try:
+            await run_blocking(self._append, texts, metadatas, vectors)
+        except BaseException:
+            self.ledger.rollback()
+            raise
+        return await run_blocking(self._load)
+
+@dataclass
+class IngestionProgress:
+    '''Stage-level counters reported while a ChatIngestor run streams through the pipeline.'''
+    files_total: int = 0
+    files_parsed: int = 0
+    pages_parsed: int = 0
+    chunks: int = 0
+    chunks_embedded: int = 0
+    chunks_skipped: int = 0
+    vectors_added: int = 0
+
+    def add_batch(self, batch_size: int, added: int):
+        '''Account for one appended batch: only the chunks that survived dedup reached the embedder.'''
+        self.chunks_embedded += added
+        self.chunks_skipped += batch_size - added
+        self.vectors_added += added
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+class IngestionCancelled(Exception):
+    '''Raised from a progress callback to stop an ingestion run after the current batch.'''
 
 class ChatIngestor:
     '''Class to handle ingestion of documents for chat-based retrieval.'''
@@ -146,38 +260,149 @@ class ChatIngestor:
         self.log.info("Documents split", chunks=len(chunks), chunk_size=chunk_size, overlap=chunk_overlap)
         return chunks
 
+    @traced("ingest.save")
+    def save_uploads(self, uploaded_files: Iterable) -> List[Path]:
+        '''Save uploaded files into this session's upload directory.'''
+        return save_uploaded_files(uploaded_files, self.temp_dir)
+
+    def _iter_batches(
+        self,
+        paths: List[Path],
+        chunk_size: int,
+        chunk_overlap: int,
+        batch_size: int,
+        progress: IngestionProgress,
+    ) -> Iterator[List[Document]]:
+        '''Parse saved files page by page, split and group chunks into fixed-size batches.'''
+        progress.files_total = len(paths)
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        sources = set()
+        batch: List[Document] = []
+        for doc in traced_iter(iter_documents(paths), "ingest.parse"):
+            sources.add(doc.metadata.get("source"))
+            progress.files_parsed = len(sources)
+            progress.pages_parsed += 1
+            with span("ingest.split"):
+                chunks = splitter.split_documents([doc])
+            for chunk in chunks:
+                progress.chunks += 1
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+        observe_count("ingest.pages", progress.pages_parsed)
+        observe_count("ingest.chunks", progress.chunks)
+
+    def _report(self, progress: IngestionProgress, callback: Optional[Callable[[IngestionProgress], None]]):
+        self.log.info("Ingestion progress", session_id=self.session_id, **progress.as_dict())
+        if callback is not None:
+            callback(progress)
+
+    @staticmethod
+    def _batch_size(batch_size: Optional[int]) -> int:
+        return batch_size or int((load_config().get("ingestion", {}) or {}).get("batch_size", 256))
+
     def build_retriever( self,
         uploaded_files: Iterable,
         *,
         chunk_size: int = 1000,
         chunk_overlap: int = 200,
-        k: int = 5,):
-        '''Ingest uploaded files, build FAISS index, and return a retriever.'''
+        k: int = 5,
+        batch_size: Optional[int] = None,
+        progress: Optional[Callable[[IngestionProgress], None]] = None,):
+        '''Ingest uploaded files, build FAISS index, and return a retriever.
+
+        Pages are parsed, split, embedded and appended to the index in batches of batch_size chunks,
+        so no list of pages, chunks or vectors is held for the whole corpus. Peak RSS still rises a
+        little with the corpus while SQLite's page caches (capped per connection) fill up.
+        '''
         try:
-            paths = save_uploaded_files(uploaded_files, self.temp_dir)
-            docs = load_documents(paths)
-            if not docs:
-                raise ValueError("No valid documents loaded")
-            
-            chunks = self._split(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-            fm = FaissManager(self.faiss_dir, self.model_loader)
-            
-            texts = [c.page_content for c in chunks]
-            metas = [c.metadata for c in chunks]
-            
-            try:
-                vs = fm.load_or_create(texts=texts, metadatas=metas)
-            except Exception:
-                vs = fm.load_or_create(texts=texts, metadatas=metas)
-                
-            added = fm.add_documents(chunks)
-            self.log.info("FAISS index updated", added=added, index=str(self.faiss_dir))
+            tracker = IngestionProgress()
+            with FaissManager(self.faiss_dir, self.model_loader) as fm:
+                for batch in self._iter_batches(
+                    self.save_uploads(uploaded_files), chunk_size, chunk_overlap, self._batch_size(batch_size), tracker
+                ):
+                    tracker.add_batch(len(batch), fm.add_documents(batch))
+                    self._report(tracker, progress)
+
+                if not tracker.chunks:
+                    raise ValueError("No valid documents loaded")
+                if fm.vs is None:
+                    fm.load_or_create()
+            self.log.info("FAISS index updated", added=tracker.vectors_added, index=str(self.faiss_dir))
             
-            return vs.as_retriever(search_type="similarity", search_kwargs={"k": k})
+            return make_retriever(fm.vs, k=k)
             
+        except UploadRejected:
+            raise
+        except Exception as e:
+            self.log.error("Failed to build retriever", error=str(e))
+            raise DocumentPortalException("Failed to build retriever", e) from e
+
+    async def abuild_retriever( self,
+        uploaded_files: Iterable,
+        *,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        k: int = 5,
+        batch_size: Optional[int] = None,
+        progress: Optional[Callable[[IngestionProgress], None]] = None,):
+        '''Async build_retriever(): parsing runs on the worker pool and embeddings are awaited.'''
+        try:
+            paths = await run_blocking(self.save_uploads, uploaded_files)
+        except UploadRejected:
+            raise
+        except Exception as e:
+            self.log.error("Failed to build retriever", error=str(e))
+            raise DocumentPortalException("Failed to build retriever", e) from e
+        return await self.aingest_paths(
+            paths, chunk_size=chunk_size, chunk_overlap=chunk_overlap, k=k, batch_size=batch_size, progress=progress
+        )
+
+    async def aingest_paths( self,
+        paths: List[Path],
+        *,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        k: int = 5,
+        batch_size: Optional[int] = None,
+        progress: Optional[Callable[[IngestionProgress], None]] = None,):
+        '''Ingest already saved files into the session index and return a retriever.
+
+        The progress callback runs after every appended batch; raising IngestionCancelled from it
+        stops the run there, keeping the batches already written (and recorded) in the index.
+        '''
+        tracker = IngestionProgress()
+        fm = None
+        try:
+            fm = await run_blocking(FaissManager, self.faiss_dir, self.model_loader)
+            batches = self._iter_batches(paths, chunk_size, chunk_overlap, self._batch_size(batch_size), tracker)
+            while True:
+                batch = await run_blocking(next, batches, None)
+                if batch is None:
+                    break
+                tracker.add_batch(len(batch), await fm.aadd_documents(batch))
+                self._report(tracker, progress)
+
+            if not tracker.chunks:
+                raise ValueError("No valid documents loaded")
+            if fm.vs is None:
+                await run_blocking(fm.load_or_create)
+            self.log.info("FAISS index updated", added=tracker.vectors_added, index=str(self.faiss_dir))
+
+            return make_retriever(fm.vs, k=k)
+
+        except IngestionCancelled:
+            self.log.info("Ingestion cancelled", session_id=self.session_id, **tracker.as_dict())
+            raise
         except Exception as e:
             self.log.error("Failed to build retriever", error=str(e))
             raise DocumentPortalException("Failed to build retriever", e) from e
+        finally:
+            if fm is not None:
+                await run_blocking(fm.close)
 
 class DocHandler:
     '''Class to handle document saving and reading operations.'''
@@ -190,6 +415,7 @@ class DocHandler:
         self.log.info("DocHandler initialized", session_id=self.session_id, session_path=self.session_path)
 
 
+    @traced("doc.save")
     def save_pdf(self, uploaded_file) -> str:
         '''Save uploaded PDF file and return its local path.'''
         try:
@@ -197,32 +423,37 @@ class DocHandler:
             if not filename.lower().endswith(".pdf"):
                 raise ValueError("Invalid file type. Only PDFs are allowed.")
             save_path = os.path.join(self.session_path, filename)
-            with open(save_path, "wb") as f:
-                if hasattr(uploaded_file, "read"):
-                    f.write(uploaded_file.read())
-                else:
-                    f.write(uploaded_file.getbuffer())
+            save_upload(uploaded_file, Path(save_path))
             self.log.info("PDF saved successfully", file=filename, save_path=save_path, session_id=self.session_id)
             return save_path
+        except UploadRejected:
+            raise
         except Exception as e:
             self.log.error("Failed to save PDF", error=str(e), session_id=self.session_id)
             raise DocumentPortalException(f"Failed to save PDF: {str(e)}", e) from e
 
+    @traced("doc.parse")
     def read_pdf(self, pdf_path: str) -> str:
         '''Read text content from a PDF file.'''
         try:
-            text_chunks = []
-            with fitz.open(pdf_path) as doc:
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    text_chunks.append(f"\n--- Page {page_num + 1} ---\n{page.get_text()}") 
-            text = "\n".join(text_chunks)
-            self.log.info("PDF read successfully", pdf_path=pdf_path, session_id=self.session_id, pages=len(text_chunks))
+            text = read_pdf_text(pdf_path)
+            self.log.info("PDF read successfully", pdf_path=pdf_path, session_id=self.session_id, chars=len(text))
             return text
         except Exception as e:
             self.log.error("Failed to read PDF", error=str(e), pdf_path=pdf_path, session_id=self.session_id)
             raise DocumentPortalException(f"Could not process PDF: {pdf_path}", e) from e
 
+    @traced("doc.parse")
+    def read_pdf_pages(self, pdf_path: str) -> List[str]:
+        '''Read the text of each page of a PDF file, in page order.'''
+        try:
+            pages = [d.page_content for d in iter_pdf_pages(pdf_path)]
+            self.log.info("PDF pages read successfully", pdf_path=pdf_path, session_id=self.session_id, pages=len(pages))
+            return pages
+        except Exception as e:
+            self.log.error("Failed to read PDF", error=str(e), pdf_path=pdf_path, session_id=self.session_id)
+            raise DocumentPortalException(f"Could not process PDF: {pdf_path}", e) from e
+
 class DocumentComparator:
     '''Class to handle document comparison operations.'''
     def __init__(self, base_dir: str = "data/document_comparison", session_id: Optional[str] = None):
@@ -233,43 +464,48 @@ class DocumentComparator:
         self.session_path.mkdir(parents=True, exist_ok=True)
         self.log.info("DocumentComparator initialized", session_path=str(self.session_path))
 
+    @traced("doc.save")
     def save_uploaded_files(self, reference_file, actual_file):
         '''Save uploaded reference and actual PDF files, returning their local paths.'''
         try:
             ref_path = self.session_path / reference_file.name
             act_path = self.session_path / actual_file.name
+            if act_path == ref_path:
+                act_path = self.session_path / f"actual_{actual_file.name}"
             for fobj, out in ((reference_file, ref_path), (actual_file, act_path)):
                 if not fobj.name.lower().endswith(".pdf"):
                     raise ValueError("Only PDF files are allowed.")
-                with open(out, "wb") as f:
-                    if hasattr(fobj, "read"):
-                        f.write(fobj.read())
-                    else:
-                        f.write(fobj.getbuffer())
+                save_upload(fobj, out)
             self.log.info("Files saved", reference=str(ref_path), actual=str(act_path), session=self.session_id)
             return ref_path, act_path
+        except UploadRejected:
+            raise
         except Exception as e:
             self.log.error("Error saving PDF files", error=str(e), session=self.session_id)
             raise DocumentPortalException("Error saving files", e) from e
 
+    @traced("doc.parse")
     def read_pdf(self, pdf_path: Path) -> str:
         '''Read text content from a PDF file.'''
         try:
-            with fitz.open(pdf_path) as doc:
-                if doc.is_encrypted:
-                    raise ValueError(f"PDF is encrypted: {pdf_path.name}")
-                parts = []
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    text = page.get_text()  # type: ignore
-                    if text.strip():
-                        parts.append(f"\n --- Page {page_num + 1} --- \n{text}")
-            self.log.info("PDF read successfully", file=str(pdf_path), pages=len(parts))
-            return "\n".join(parts)
+            text = read_pdf_text(pdf_path, header="\n --- Page {page} --- \n", skip_empty=True)
+            self.log.info("PDF read successfully", file=str(pdf_path), chars=len(text))
+            return text
         except Exception as e:
             self.log.error("Error reading PDF", file=str(pdf_path), error=str(e))
             raise DocumentPortalException("Error reading PDF", e) from e
 
+    @traced("doc.parse")
+    def read_pdf_pages(self, pdf_path: Path) -> List[str]:
+        '''Read the text of each page of a PDF file, in page order.'''
+        try:
+            pages = [d.page_content for d in iter_pdf_pages(pdf_path)]
+            self.log.info("PDF pages read successfully", file=str(pdf_path), pages=len(pages))
+            return pages
+        except Exception as e:
+            self.log.error("Error reading PDF pages", file=str(pdf_path), error=str(e))
+            raise DocumentPortalException("Error reading PDF", e) from e
+
     def combine_documents(self) -> str:
         '''Combine text from all PDF documents in the session directory.'''
         try:
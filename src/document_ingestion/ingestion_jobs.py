@@ -0,0 +1,302 @@
+'''Background ingestion jobs for /chat/index.
+
+Uploads are saved inside the request, which then returns a job id. A bounded pool of asyncio
+workers runs ChatIngestor.aingest_paths on them, recording status and stage-level progress in a
+local SQLite table so clients can poll it (and see how a job ended after a restart).
+
+Jobs that target the same index never run at the same time. A job submitted while another job
+for the same index is still queued is coalesced into it: its files are added to the queued job and
+its id is returned, so the index is built once for both uploads. At most max_queued jobs wait at
+once; further submissions raise QueueFullError (429) instead of piling up uploads on disk. Callers that need the index
+before replying (background=false) submit like everyone else and await wait(job_id).
+'''
+from __future__ import annotations
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.config_loader import load_config
+from utils.concurrency import QueueFullError
+from utils.tracing import stage_scope
+from logger.custom_logger import CustomLogger
+from src.document_ingestion.data_ingestion import ChatIngestor, IngestionCancelled, IngestionProgress
+
+log = CustomLogger().get_logger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+_COLUMNS = (
+    "job_id", "session_id", "target", "status", "files", "options", "progress", "error",
+    "coalesced", "created_at", "started_at", "finished_at",
+)
+_JSON_COLUMNS = ("files", "options", "progress")
+
+
+class JobStore:
+    '''Durable job records in SQLite.'''
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, session_id TEXT NOT NULL, target TEXT NOT NULL,"
+            " status TEXT NOT NULL, files TEXT NOT NULL, options TEXT NOT NULL, progress TEXT NOT NULL,"
+            " error TEXT, coalesced INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, started_at REAL,"
+            " finished_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self._db.commit()
+
+    @staticmethod
+    def _row(row) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        for name in _JSON_COLUMNS:
+            job[name] = json.loads(job[name])
+        return job
+
+    def insert(self, job: Dict[str, Any]):
+        values = [json.dumps(job[c]) if c in _JSON_COLUMNS else job.get(c) for c in _COLUMNS]
+        with self._lock:
+            self._db.execute(f"INSERT INTO jobs ({','.join(_COLUMNS)}) VALUES ({','.join('?' * len(_COLUMNS))})", values)
+            self._db.commit()
+
+    def update(self, job_id: str, **fields):
+        names = list(fields)
+        values = [json.dumps(fields[n]) if n in _JSON_COLUMNS else fields[n] for n in names]
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {', '.join(f'{n} = ?' for n in names)} WHERE job_id = ?", values + [job_id])
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {','.join(_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def with_status(self, *statuses: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {','.join(_COLUMNS)} FROM jobs WHERE status IN ({','.join('?' * len(statuses))})"
+                " ORDER BY created_at",
+                statuses,
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def count(self, *statuses: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE status IN ({','.join('?' * len(statuses))})", statuses
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class IngestionJobQueue:
+    '''Bounded worker pool running ingestion jobs, with per-index serialization and coalescing.'''
+
+    def __init__(self, db_path: str = "ingestion_jobs.sqlite", workers: int = 2, max_queued: int = 64,
+                 temp_base: str = "data", faiss_base: str = "faiss_index",
+                 on_success: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.store = JobStore(db_path)
+        self.workers = workers
+        self.max_queued = max_queued
+        self.temp_base = temp_base
+        self.faiss_base = faiss_base
+        self.on_success = on_success
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Dict[str, str] = {}          # target index -> queued job id
+        self._target_locks: Dict[str, asyncio.Lock] = {}
+        self._cancel: Dict[str, asyncio.Event] = {}  # running job id -> cancel flag
+        self._finished: Dict[str, asyncio.Event] = {}  # job id -> set once it reaches a final state
+        self._waiting = 0                               # wait() calls still to read their job record
+
+    @classmethod
+    def from_config(cls, temp_base: str = "data", faiss_base: str = "faiss_index",
+                    on_success: Optional[Callable[[Dict[str, Any]], None]] = None) -> "IngestionJobQueue":
+        cfg = (load_config().get("ingestion", {}) or {}).get("jobs", {}) or {}
+        return cls(
+            db_path=os.getenv("INGESTION_JOBS_DB", cfg.get("db_path", "ingestion_jobs.sqlite")),
+            workers=int(cfg.get("workers", 2)),
+            max_queued=int(cfg.get("max_queued", 64)),
+            temp_base=temp_base,
+            faiss_base=faiss_base,
+            on_success=on_success,
+        )
+
+    def start(self):
+        '''Start the workers on the running event loop and resume jobs left queued by a previous run.'''
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        for job in self.store.with_status(RUNNING):
+            self.store.update(job["job_id"], status=FAILED, error="Interrupted by a server restart", finished_at=time.time())
+        for job in self.store.with_status(QUEUED):
+            self._pending.setdefault(job["target"], job["job_id"])
+            self._queue.put_nowait(job["job_id"])
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        log.info("Ingestion workers started", workers=self.workers, resumed=self._queue.qsize())
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self._queue = [], None
+        for job_id in list(self._finished):
+            self._finish(job_id)
+        # Woken wait() calls read their record before the connection goes away
+        while self._waiting:
+            await asyncio.sleep(0)
+        self.store.close()
+
+    def full(self) -> bool:
+        '''True when max_queued jobs are already waiting (0 = no limit).'''
+        return bool(self.max_queued) and self.store.count(QUEUED) >= self.max_queued
+
+    def submit(self, ingestor: ChatIngestor, paths: List[Path], options: Dict[str, Any]) -> Dict[str, Any]:
+        '''Queue ingestion of files already saved by ingestor; returns the job record (possibly a
+        queued job for the same index that the files were merged into). Raises QueueFullError when
+        a new job is needed and max_queued jobs are already waiting.'''
+        self.start()
+        target = str(ingestor.faiss_dir)
+        files = [str(p) for p in paths]
+        queued_id = self._pending.get(target)
+        queued = self.store.get(queued_id) if queued_id else None
+        if queued and queued["status"] == QUEUED and queued["options"] == options:
+            merged = queued["files"] + [f for f in files if f not in queued["files"]]
+            self.store.update(queued_id, files=merged, coalesced=queued["coalesced"] + 1)
+            log.info("Ingestion job coalesced", job_id=queued_id, session_id=ingestor.session_id, files=len(merged))
+            return self.store.get(queued_id)
+        if self.full():
+            raise QueueFullError(f"Ingestion queue is full ({self.max_queued} jobs waiting)")
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "session_id": ingestor.session_id,
+            "target": target,
+            "status": QUEUED,
+            "files": files,
+            "options": options,
+            "progress": IngestionProgress(files_total=len(files)).as_dict(),
+            "error": None,
+            "coalesced": 0,
+            "created_at": time.time(),
+        }
+        self.store.insert(job)
+        self._pending[target] = job["job_id"]
+        self._queue.put_nowait(job["job_id"])
+        log.info("Ingestion job queued", job_id=job["job_id"], session_id=ingestor.session_id, files=len(files))
+        return self.store.get(job["job_id"])
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    async def wait(self, job_id: str) -> Optional[Dict[str, Any]]:
+        '''Wait until the job has finished (or the queue stopped) and return its record.'''
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINAL_STATES:
+            return job
+        self._waiting += 1
+        try:
+            await self._finished.setdefault(job_id, asyncio.Event()).wait()
+            return self.store.get(job_id)
+        finally:
+            self._waiting -= 1
+
+    def _finish(self, job_id: str):
+        event = self._finished.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def active_dirs(self) -> List[str]:
+        '''Index and upload directories of queued or running jobs (pinned against disk eviction).'''
+        dirs = set()
+        for job in self.store.with_status(QUEUED, RUNNING):
+            dirs.add(job["target"])
+            dirs.update(str(Path(f).parent) for f in job["files"])
+        return sorted(dirs)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        '''Cancel a queued job at once, or a running one after its current batch.'''
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINAL_STATES:
+            return job
+        if job["status"] == QUEUED:
+            if self._pending.get(job["target"]) == job_id:
+                del self._pending[job["target"]]
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+            self._finish(job_id)
+        elif job_id in self._cancel:
+            self._cancel[job_id].set()
+        log.info("Ingestion job cancel requested", job_id=job_id, status=job["status"])
+        return self.store.get(job_id)
+
+    async def _worker(self, n: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                log.error("Ingestion worker error", worker=n, job_id=job_id, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+        target = job["target"]
+        async with self._target_locks.setdefault(target, asyncio.Lock()):
+            # Until here the job could still absorb new submissions for the same index
+            if self._pending.get(target) == job_id:
+                del self._pending[target]
+            job = self.store.get(job_id)
+            if job["status"] != QUEUED:
+                return
+            cancel = self._cancel[job_id] = asyncio.Event()
+            self.store.update(job_id, status=RUNNING, started_at=time.time())
+
+            def on_progress(progress: IngestionProgress):
+                self.store.update(job_id, progress=progress.as_dict())
+                if cancel.is_set():
+                    raise IngestionCancelled(job_id)
+
+            opts = job["options"]
+            with stage_scope() as stages:
+                try:
+                    ingestor = ChatIngestor(
+                        temp_base=self.temp_base,
+                        faiss_base=self.faiss_base,
+                        use_session_dirs=opts.get("use_session_dirs", True),
+                        session_id=job["session_id"],
+                    )
+                    await ingestor.aingest_paths(
+                        [Path(f) for f in job["files"]],
+                        chunk_size=opts.get("chunk_size", 1000),
+                        chunk_overlap=opts.get("chunk_overlap", 200),
+                        k=opts.get("k", 5),
+                        progress=on_progress,
+                    )
+                    self.store.update(job_id, status=SUCCEEDED, finished_at=time.time())
+                    if self.on_success is not None:
+                        self.on_success(self.store.get(job_id))
+                except IngestionCancelled:
+                    self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+                except Exception as e:
+                    self.store.update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+                finally:
+                    self._cancel.pop(job_id, None)
+                    self._finish(job_id)
+            log.info("Ingestion job finished", job_id=job_id, status=self.store.get(job_id)["status"],
+                     stages=stages.summary())
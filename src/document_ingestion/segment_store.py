@@ -0,0 +1,446 @@
+from __future__ import annotations
+import os
+import re
+import json
+import shutil
+import struct
+import sqlite3
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+
+from utils.config_loader import load_config
+from src.document_ingestion.ann_index import IndexSpec, build_index, extend_index, tune
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+log = CustomLogger().get_logger(__name__)
+
+MANIFEST = "manifest.json"
+DOCSTORE = "docstore.sqlite"
+FORMAT = 2
+_WORD = re.compile(r"\w+")
+
+# Serialized faiss.IndexFlatL2: fourcc, d, ntotal, two dummy fields, is_trained, metric_type and
+# the number of floats that follow, then the float32 rows themselves.
+_FLAT_HEADER = struct.Struct("<4siqqqBiQ")
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) or getattr(faiss, "IO_FLAG_MMAP", 0)
+
+
+def _flat_header(dim: int, ntotal: int) -> bytes:
+    return _FLAT_HEADER.pack(b"IxF2", dim, ntotal, 1 << 20, 1 << 20, 1, faiss.METRIC_L2, ntotal * dim)
+
+
+def read_index_mmap(path: Path) -> faiss.Index:
+    '''Open a serialized index memory-mapped, so pages are shared through the OS page cache.'''
+    try:
+        return faiss.read_index(str(path), _MMAP_FLAGS)
+    except RuntimeError:
+        return faiss.read_index(str(path))
+
+
+def fts_query(terms: Sequence[str]) -> str:
+    '''OR of the terms, each quoted as an FTS5 phrase.
+
+    Quoting keeps identifiers such as "12.3(b)" together: the tokenizer splits them into
+    12 / 3 / b and the phrase only matches those tokens adjacent and in order.
+    '''
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+class SqliteDocstore(Docstore):
+    '''Read-only, pickle-free docstore: chunk text and metadata keyed by their row in the index.
+
+    Also serves BM25 keyword search from the FTS5 index kept alongside the chunk text.
+    '''
+
+    def __init__(self, path: Path, ntotal: Optional[int] = None):
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.ntotal = ntotal
+        self._vocab = False
+
+    def search(self, search: Union[str, int]) -> Union[str, Document]:
+        with self._lock:
+            row = self._db.execute("SELECT text, metadata FROM docs WHERE row = ?", (int(search),)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def get_many(self, rows: Sequence[int]) -> Dict[int, Document]:
+        rows = [int(r) for r in rows]
+        with self._lock:
+            found = self._db.execute(
+                f"SELECT row, text, metadata FROM docs WHERE row IN ({','.join('?' * len(rows))})", rows
+            ).fetchall()
+        return {r: Document(page_content=t, metadata=json.loads(m)) for r, t, m in found}
+
+    def _common(self, term: str, max_df: float) -> bool:
+        '''True for a single-word term found in more than max_df of the chunks.'''
+        tokens = _WORD.findall(term.lower())
+        if len(tokens) != 1 or not self.ntotal:
+            return False
+        if not self._vocab:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.docs_vocab USING fts5vocab(main, docs_fts, row)")
+            self._vocab = True
+        row = self._db.execute("SELECT doc FROM temp.docs_vocab WHERE term = ?", tokens).fetchone()
+        return bool(row) and row[0] > max_df * self.ntotal
+
+    def keyword_search(self, query: str, k: int = 20, max_df: float = 0.5) -> List[Tuple[int, float]]:
+        '''Top-k (row, bm25) matches for query; lower bm25 is better, as in SQLite.
+
+        Words present in more than max_df of the chunks add almost nothing to BM25 but make
+        SQLite score nearly every row, so they are dropped unless nothing else is left.
+        '''
+        terms = query.split()
+        if not terms:
+            return []
+        limit = self.ntotal if self.ntotal is not None else -1
+        with self._lock:
+            try:
+                match = fts_query([t for t in terms if not self._common(t, max_df)] or terms)
+                return self._db.execute(
+                    "SELECT rowid, bm25(docs_fts) AS score FROM docs_fts "
+                    "WHERE docs_fts MATCH ? AND (? < 0 OR rowid < ?) ORDER BY score LIMIT ?",
+                    (match, limit, limit, k),
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                log.warning("Keyword search failed", error=str(e))
+                return []
+
+
+class RowIds(Mapping):
+    '''index_to_docstore_id for a SegmentStore: the docstore id of a vector is its row number.'''
+
+    def __init__(self, ntotal: int):
+        self.ntotal = ntotal
+
+    def __getitem__(self, i) -> int:
+        i = int(i)
+        if not 0 <= i < self.ntotal:
+            raise KeyError(i)
+        return i
+
+    def __iter__(self):
+        return iter(range(self.ntotal))
+
+    def __len__(self) -> int:
+        return self.ntotal
+
+
+class SegmentStore:
+    '''Append-friendly, memory-mappable on-disk layout for a FAISS session.
+
+    Each append writes one new segment, `<name>.faiss`, a flat L2 index holding the rows that
+    follow the ones already published, and inserts the chunks into docstore.sqlite (which keeps
+    an FTS5 keyword index over them) under their global row number. A small manifest lists the segments in order and carries a version that
+    is bumped whenever content is added. Segments are merged in a background thread once there
+    are more than max_segments of them. Loading maps the segment files read-only and never unpickles.
+
+    Merged segments keep their flat file (the exact vectors, used by later merges) and, when the
+    IndexSpec asks for one at that size, an ANN index `<name>.ann.faiss` that is searched instead.
+    The ANN index is extended on later merges and rebuilt when the wanted type changes or the
+    data has grown fourfold since training.
+    '''
+    _locks: Dict[str, threading.Lock] = {}
+    _merging: set = set()
+    _registry_lock = threading.Lock()
+
+    def __init__(self, index_dir: Path, max_segments: int = 8, spec: Optional[IndexSpec] = None):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.index_dir / MANIFEST
+        self.docstore_path = self.index_dir / DOCSTORE
+        self.max_segments = max_segments
+        self.spec = spec or IndexSpec(type="flat")
+        key = str(self.index_dir.resolve())
+        with SegmentStore._registry_lock:
+            self._lock = SegmentStore._locks.setdefault(key, threading.Lock())
+        self._key = key
+
+    @classmethod
+    def from_config(cls, index_dir: Path) -> "SegmentStore":
+        cfg = load_config().get("faiss_db", {}) or {}
+        return cls(index_dir, max_segments=int(cfg.get("max_segments", 8)), spec=IndexSpec.from_config())
+
+    # ---------- manifest ----------
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def read_manifest(self) -> Dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {"format": FORMAT, "version": 0, "dim": None, "next_segment": 1, "segments": []}
+        manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("format") != FORMAT:
+            raise DocumentPortalException(f"Unsupported index format in {self.manifest_path}")
+        return manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        '''Serialize manifest updates across threads and, where supported, processes.'''
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.index_dir / "manifest.lock", "a") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    @property
+    def version(self) -> int:
+        return int(self.read_manifest().get("version", 0))
+
+    def __len__(self) -> int:
+        return sum(s["count"] for s in self.read_manifest()["segments"])
+
+    def _path(self, name: str) -> Path:
+        return self.index_dir / f"{name}.faiss"
+
+    def _ann_path(self, name: str) -> Path:
+        return self.index_dir / f"{name}.ann.faiss"
+
+    def _needs_ann(self, segments: List[Dict[str, Any]]) -> bool:
+        '''True when the base segment is not the index type the spec wants for the current size.'''
+        if not segments:
+            return False
+        wanted = self.spec.resolve(sum(s["count"] for s in segments))
+        return segments[0].get("ann", "flat") != wanted
+
+    def _connect(self) -> sqlite3.Connection:
+        '''Writable connection; creates the docs table and its FTS5 keyword index if missing.'''
+        db = sqlite3.connect(str(self.docstore_path))
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS docs (row INTEGER PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)")
+        has_fts = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'docs_fts'").fetchone()
+        if not has_fts:
+            # External-content FTS5 index over docs.text, kept in step by triggers
+            with db:
+                db.execute("CREATE VIRTUAL TABLE docs_fts USING fts5(text, content='docs', content_rowid='row')")
+                db.execute(
+                    "CREATE TRIGGER docs_ai AFTER INSERT ON docs BEGIN "
+                    "INSERT INTO docs_fts(rowid, text) VALUES (new.row, new.text); END"
+                )
+                db.execute(
+                    "CREATE TRIGGER docs_ad AFTER DELETE ON docs BEGIN "
+                    "INSERT INTO docs_fts(docs_fts, rowid, text) VALUES ('delete', old.row, old.text); END"
+                )
+                db.execute("INSERT INTO docs_fts(docs_fts) VALUES ('rebuild')")
+        return db
+
+    # ---------- writes ----------
+    def append(self, vectors: Sequence[Sequence[float]], texts: Sequence[str], metadatas: Sequence[dict]) -> List[int]:
+        '''Write one new segment and publish it in the manifest; cost is proportional to the new rows.'''
+        if not texts:
+            return []
+        arr = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._locked():
+            manifest = self.read_manifest()
+            if manifest["dim"] is None:
+                manifest["dim"] = int(arr.shape[1])
+            elif arr.shape[1] != manifest["dim"]:
+                raise DocumentPortalException(f"Vector dimension {arr.shape[1]} does not match index ({manifest['dim']})")
+            start = sum(s["count"] for s in manifest["segments"])
+            rows = list(range(start, start + len(texts)))
+
+            # Rows past the published total are invisible to readers; clear any left by a crash
+            # before the manifest was replaced.
+            db = self._connect()
+            try:
+                with db:
+                    db.execute("DELETE FROM docs WHERE row >= ?", (start,))
+                    db.executemany(
+                        "INSERT INTO docs (row, text, metadata) VALUES (?, ?, ?)",
+                        [(r, t, json.dumps(md or {}, ensure_ascii=False)) for r, t, md in zip(rows, texts, metadatas)],
+                    )
+            finally:
+                db.close()
+
+            name = f"seg-{manifest['next_segment']:06d}"
+            with open(self._path(name), "wb") as f:
+                f.write(_flat_header(manifest["dim"], len(rows)))
+                f.write(arr.tobytes())
+
+            manifest["segments"].append({"name": name, "count": len(rows)})
+            manifest["next_segment"] += 1
+            manifest["version"] += 1
+            self._write_manifest(manifest)
+            segments = manifest["segments"]
+
+        if len(segments) > self.max_segments or self._needs_ann(segments):
+            self.merge_in_background()
+        return rows
+
+    def iter_texts(self, batch_size: int = 1000) -> Iterator[str]:
+        '''Chunk texts of all published rows, in row order.'''
+        total = len(self)
+        if not total or not self.docstore_path.exists():
+            return
+        db = sqlite3.connect(f"file:{self.docstore_path}?mode=ro", uri=True)
+        try:
+            for start in range(0, total, batch_size):
+                rows = db.execute(
+                    "SELECT text FROM docs WHERE row >= ? AND row < ? ORDER BY row", (start, min(total, start + batch_size))
+                ).fetchall()
+                for (text,) in rows:
+                    yield text
+        finally:
+            db.close()
+
+    def merge_in_background(self):
+        with SegmentStore._registry_lock:
+            if self._key in SegmentStore._merging:
+                return
+            SegmentStore._merging.add(self._key)
+        threading.Thread(target=self._merge_guarded, name="segment-merge", daemon=True).start()
+
+    def _merge_guarded(self):
+        try:
+            self.merge()
+        except Exception as e:
+            log.error("Segment merge failed", index_dir=str(self.index_dir), error=str(e))
+        finally:
+            with SegmentStore._registry_lock:
+                SegmentStore._merging.discard(self._key)
+
+    def merge(self):
+        '''Concatenate the current segments into one; appends made meanwhile are preserved.'''
+        manifest = self.read_manifest()
+        snapshot, dim = manifest["segments"], manifest["dim"]
+        if len(snapshot) < 2 and not self._needs_ann(snapshot):
+            return
+        with self._locked():
+            manifest = self.read_manifest()
+            name = f"seg-{manifest['next_segment']:06d}"
+            manifest["next_segment"] += 1
+            self._write_manifest(manifest)
+
+        total = sum(s["count"] for s in snapshot)
+        path = self._path(name)
+        with open(path, "wb") as out:
+            out.write(_flat_header(dim, total))
+            for seg in snapshot:
+                with open(self._path(seg["name"]), "rb") as f:
+                    f.seek(_FLAT_HEADER.size)
+                    shutil.copyfileobj(f, out)
+        if read_index_mmap(path).ntotal != total:
+            path.unlink(missing_ok=True)
+            raise DocumentPortalException(f"Merged segment {name} is inconsistent")
+        merged = {"name": name, "count": total}
+        merged.update(self._build_ann(name, snapshot, dim))
+
+        with self._locked():
+            manifest = self.read_manifest()
+            names = [s["name"] for s in manifest["segments"]]
+            if names[:len(snapshot)] != [s["name"] for s in snapshot]:
+                path.unlink(missing_ok=True)
+                self._ann_path(name).unlink(missing_ok=True)
+                return
+            manifest["segments"] = [merged] + manifest["segments"][len(snapshot):]
+            self._write_manifest(manifest)
+
+        for seg in snapshot:
+            self._path(seg["name"]).unlink(missing_ok=True)
+            self._ann_path(seg["name"]).unlink(missing_ok=True)
+        log.info("Segments merged", index_dir=str(self.index_dir), merged=len(snapshot), rows=total, ann=merged.get("ann"))
+
+    def _build_ann(self, name: str, snapshot: List[Dict[str, Any]], dim: int) -> Dict[str, Any]:
+        '''Write `<name>.ann.faiss` for a freshly merged segment; returns its manifest fields.'''
+        total = sum(s["count"] for s in snapshot)
+        kind = self.spec.resolve(total)
+        if kind == "flat":
+            return {}
+        vectors = np.memmap(self._path(name), dtype=np.float32, mode="r", offset=_FLAT_HEADER.size, shape=(total, dim))
+        base = snapshot[0]
+        if base.get("ann") == kind and total <= 4 * base.get("trained", base["count"]):
+            index = faiss.read_index(str(self._ann_path(base["name"])))
+            extend_index(index, vectors[base["count"]:])
+            trained = base.get("trained", base["count"])
+        else:
+            index = build_index(vectors, self.spec)
+            trained = total
+        faiss.write_index(index, str(self._ann_path(name)))
+        return {"ann": kind, "trained": trained}
+
+    # ---------- reads ----------
+    def _open_index(self) -> tuple:
+        manifest = self.read_manifest()
+        parts = []
+        for seg in manifest["segments"]:
+            if seg.get("ann"):
+                parts.append(tune(read_index_mmap(self._ann_path(seg["name"])), self.spec))
+            else:
+                parts.append(read_index_mmap(self._path(seg["name"])))
+        if len(parts) == 1:
+            return manifest, parts[0]
+        index = faiss.IndexShards(manifest["dim"], False, True)
+        for part in parts:
+            index.add_shard(part)
+        index.referenced_objects = parts
+        return manifest, index
+
+    def load(self, embeddings: Embeddings) -> FAISS:
+        '''Map the segments read-only and attach the SQLite docstore; load time does not grow with size.'''
+        if not self.exists():
+            raise FileNotFoundError(f"No segment manifest in {self.index_dir}")
+        try:
+            manifest, index = self._open_index()
+        except (FileNotFoundError, RuntimeError):
+            # A merge removed a segment between reading the manifest and opening it; read again.
+            manifest, index = self._open_index()
+        return FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=SqliteDocstore(self.docstore_path, ntotal=index.ntotal),
+            index_to_docstore_id=RowIds(index.ntotal),
+        )
+
+    def import_faiss(self, vs: FAISS):
+        '''One-off migration of a legacy save_local() index into a segment.'''
+        n = vs.index.ntotal
+        vectors = vs.index.reconstruct_n(0, n)
+        docs = [vs.docstore.search(vs.index_to_docstore_id[i]) for i in range(n)]
+        self.append(vectors, [d.page_content for d in docs], [d.metadata for d in docs])
+
+
+def index_version(index_dir) -> int:
+    '''Content version of a session index without opening it; 0 for a legacy or empty directory.'''
+    try:
+        with open(Path(index_dir) / MANIFEST, "r", encoding="utf-8") as fh:
+            return int(json.load(fh).get("version", 0))
+    except FileNotFoundError:
+        return 0
+
+
+def load_vectorstore(index_dir: Path, embeddings: Embeddings, index_name: str = "index") -> FAISS:
+    '''Load a session index in either layout: segments if a manifest exists, else a legacy save_local().'''
+    store = SegmentStore.from_config(index_dir)
+    if store.exists():
+        return store.load(embeddings)
+    return FAISS.load_local(
+        str(index_dir),
+        embeddings,
+        index_name=index_name,
+        allow_dangerous_deserialization=True,
+    )
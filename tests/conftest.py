@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Keep every on-disk store the code under test opens out of the working tree
+_STATE = Path(tempfile.mkdtemp(prefix="docportal_tests_"))
+os.environ.setdefault("EMBEDDING_CACHE_DIR", str(_STATE / "embedding_cache"))
+os.environ.setdefault("UPLOAD_BLOB_DIR", str(_STATE / "blobs"))
+os.environ.setdefault("RESULT_CACHE_PATH", str(_STATE / "results.sqlite"))
+os.environ.setdefault("INGESTION_JOBS_DB", str(_STATE / "jobs.sqlite"))
+os.environ.setdefault("STORAGE_INDEX_DB", str(_STATE / "storage.sqlite"))
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+
+class Upload:
+    '''Streamlit-style upload backed by bytes.'''
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self._data = data
+
+    def getbuffer(self) -> bytes:
+        return self._data
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    '''Point ModelLoader at deterministic offline embeddings; set .fail_after to make later calls raise.'''
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from utils.model_loader import ModelLoader
+
+    class FakeEmbeddings(DeterministicFakeEmbedding):
+        calls: int = 0
+        texts_embedded: int = 0
+        fail_after: int = -1
+
+        def embed_documents(self, texts):
+            if 0 <= self.fail_after <= self.calls:
+                raise RuntimeError("embedding backend down")
+            self.calls += 1
+            self.texts_embedded += len(texts)
+            return super().embed_documents(texts)
+
+    emb = FakeEmbeddings(size=16)
+    ModelLoader.reset()
+    monkeypatch.setattr(ModelLoader, "load_embeddings", lambda self: emb)
+    # Each test gets its own embedding cache namespace so earlier tests cannot serve its vectors
+    config = dict(ModelLoader().config)
+    config["embedding_model"] = {"provider": "google", "model_name": f"fake-{id(emb)}"}
+    monkeypatch.setattr(ModelLoader, "_config", config)
+    yield emb
+    ModelLoader.reset()
@@ -0,0 +1,68 @@
+from src.document_chat.answer_cache import AnswerCache, normalize_question
+from src.document_chat.retrieval import ConversationalRAG
+
+
+def test_normalized_questions_share_an_entry():
+    cache = AnswerCache()
+    cache.put("ns", 1, "What is the refund policy?", {"answer": "30 days"})
+    assert normalize_question("  what is the REFUND policy ") == normalize_question("What is the refund policy?")
+    assert cache.get("ns", 1, "what is the refund   policy") == ({"answer": "30 days"}, "exact")
+    assert cache.get("other", 1, "What is the refund policy?") is None
+
+
+def test_new_index_version_invalidates_namespace():
+    cache = AnswerCache()
+    cache.put("ns", 1, "q", "old")
+    cache.put("other", 1, "q", "kept")
+    assert cache.get("ns", 2, "q") is None
+    assert cache.get("ns", 1, "q") is None  # older version entries are gone, not resurrected
+    assert cache.get("other", 1, "q") == ("kept", "exact")
+    assert cache.stats()["invalidated"] == 1
+
+
+def test_put_for_outdated_version_is_ignored():
+    cache = AnswerCache()
+    cache.get("ns", 3, "q")
+    cache.put("ns", 2, "q", "computed against version 2")
+    assert cache.get("ns", 3, "q") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_ttl_and_lru_bounds(monkeypatch):
+    import src.document_chat.answer_cache as module
+
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "time", lambda: now[0])
+    cache = AnswerCache(max_entries=2, ttl_seconds=10)
+    cache.put("ns", 1, "a", 1)
+    cache.put("ns", 1, "b", 2)
+    cache.get("ns", 1, "a")
+    cache.put("ns", 1, "c", 3)  # evicts b, the least recently used
+    assert cache.get("ns", 1, "b") is None
+    now[0] += 11
+    assert cache.get("ns", 1, "a") is None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["expired"] == 1
+
+
+def test_semantic_tier_matches_near_identical_questions():
+    cache = AnswerCache(semantic=True, similarity_threshold=0.9)
+    cache.put("ns", 1, "how long is the warranty", "two years", [1.0, 0.0, 0.1])
+    assert cache.get("ns", 1, "warranty length?", [0.98, 0.0, 0.12]) == ("two years", "semantic")
+    assert cache.get("ns", 1, "who signed it", [0.0, 1.0, 0.0]) is None
+
+
+def test_cache_scope_follows_the_index_version(monkeypatch):
+    import src.document_chat.retrieval as retrieval
+
+    version = [7]
+    monkeypatch.setattr(retrieval, "index_version", lambda path: version[0])
+    rag = ConversationalRAG.__new__(ConversationalRAG)
+    rag.answer_cache = AnswerCache()
+    rag._cache_namespace = "ns"
+    rag.index_path = "/index"
+
+    assert rag._cache_scope() == ("ns", 7)
+    version[0] = 8
+    assert rag._cache_scope() == ("ns", 8)
+    rag._cache_namespace = None
+    assert rag._cache_scope() is None
@@ -0,0 +1,47 @@
+from src.document_ingestion.chunk_ledger import ChunkLedger, chunk_fingerprint
+
+BOILERPLATE = (
+    "This message and any attachments are confidential and intended solely for the addressee. If you have received "
+    "it in error please notify the sender immediately and delete it from your system. Any unauthorised use, "
+    "disclosure or copying of this message is strictly prohibited and may be unlawful."
+)
+
+
+def test_exact_duplicates_ignore_case_and_whitespace(tmp_path):
+    ledger = ChunkLedger(tmp_path)
+    assert chunk_fingerprint("Hello   World\n") == chunk_fingerprint("hello world")
+    assert ledger.claim(["Hello World", "hello   world", "Something else"]) == [True, False, True]
+    assert ledger.skipped_exact == 1
+
+
+def test_only_committed_keys_survive_reopening(tmp_path):
+    ledger = ChunkLedger(tmp_path)
+    ledger.claim(["first chunk"])
+    ledger.commit()
+    ledger.claim(["second chunk"])
+    ledger.close()
+
+    reopened = ChunkLedger(tmp_path)
+    assert len(reopened) == 1
+    assert reopened.claim(["first chunk", "second chunk"]) == [False, True]
+
+
+def test_rollback_releases_pending_keys(tmp_path):
+    ledger = ChunkLedger(tmp_path, near_duplicates=True)
+    ledger.claim([BOILERPLATE])
+    ledger.rollback()
+    assert len(ledger) == 0
+    assert ledger.claim([BOILERPLATE]) == [True]
+
+
+def test_near_duplicates_are_skipped_when_enabled(tmp_path):
+    variant = BOILERPLATE.replace("strictly ", "")
+    for name in ("exact", "near"):
+        (tmp_path / name).mkdir()
+    assert ChunkLedger(tmp_path / "exact").claim([BOILERPLATE, variant]) == [True, True]
+
+    ledger = ChunkLedger(tmp_path / "near", near_duplicates=True, max_hamming=10)
+    ledger.claim([BOILERPLATE])
+    ledger.commit()
+    assert ledger.claim([variant, "A completely different passage about quarterly revenue and hiring plans"]) == [False, True]
+    assert ledger.skipped_near == 1
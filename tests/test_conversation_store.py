@@ -0,0 +1,114 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from src.document_chat.conversation_store import ConversationStore, estimate_tokens, fit_sentences
+
+
+def fill(store: ConversationStore, session_id: str, exchanges: int, size: int = 80) -> bool:
+    due = False
+    for i in range(exchanges):
+        due = store.append(session_id, f"q{i} " + "x" * size, f"a{i} " + "y" * size)
+    return due
+
+
+def test_window_keeps_newest_whole_exchanges_within_budget():
+    store = ConversationStore(token_budget=100)
+    fill(store, "s", 5)  # ~22 tokens per message, 44 per exchange
+    window = store.window("s")
+    assert [m.content[:2] for m in window] == ["q3", "a3", "q4", "a4"]
+    assert isinstance(window[0], HumanMessage) and isinstance(window[1], AIMessage)
+    assert sum(estimate_tokens(m.content) for m in window) <= 100
+
+
+def test_sessions_are_separate_and_lru_bounded():
+    store = ConversationStore(max_sessions=2)
+    for sid in ("a", "b", "c"):
+        store.append(sid, f"question {sid}", "answer")
+    assert store.window("a") == []
+    assert store.window("c")[0].content == "question c"
+
+
+def test_append_reports_when_compaction_is_due():
+    store = ConversationStore(token_budget=100)
+    assert not fill(store, "s", 2)
+    assert fill(store, "s", 1)
+
+
+def test_compaction_folds_oldest_turns_into_summary():
+    store = ConversationStore(token_budget=100)
+    fill(store, "s", 5)
+    seen = {}
+
+    async def summarize(old, messages, max_words):
+        seen["old"], seen["messages"], seen["max_words"] = old, messages, max_words
+        return "they talked about x and y"
+
+    asyncio.run(store.acompact("s", summarize))
+    window = store.window("s")
+    assert isinstance(window[0], SystemMessage) and "x and y" in window[0].content
+    assert [m.content[:2] for m in seen["messages"]][:2] == ["q0", "a0"]
+    assert seen["max_words"] == store.summary_max_words == 300
+    assert window[-1].content.startswith("a4")
+    assert not store._sessions["s"].compacting
+
+
+def test_history_survives_restart_with_sqlite(tmp_path):
+    path = str(tmp_path / "conv.sqlite")
+    store = ConversationStore(sqlite_path=path)
+    store.append("s", "hello", "hi")
+    store.close()
+    assert [m.content for m in ConversationStore(sqlite_path=path).window("s")] == ["hello", "hi"]
+
+
+def test_clear_during_compaction_is_not_undone(tmp_path):
+    path = str(tmp_path / "conv.sqlite")
+    store = ConversationStore(token_budget=100, sqlite_path=path)
+    fill(store, "s", 5)
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def summarize(old, messages, max_words):
+            started.set()
+            await release.wait()
+            return "stale summary"
+
+        task = asyncio.create_task(store.acompact("s", summarize))
+        await started.wait()
+        store.clear("s")
+        release.set()
+        await task
+
+    asyncio.run(run())
+    assert store.window("s") == []
+    store.close()
+    assert ConversationStore(sqlite_path=path).window("s") == []
+
+
+def test_failed_summarization_leaves_history_and_allows_retry():
+    store = ConversationStore(token_budget=100)
+    fill(store, "s", 5)
+
+    async def broken(old, messages, max_words):
+        raise RuntimeError("llm down")
+
+    asyncio.run(store.acompact("s", broken))
+    assert len(store._sessions["s"].turns) == 10
+    assert fill(store, "s", 1)  # still over budget and no longer marked as compacting
+
+
+def test_overlong_summary_keeps_whole_sentences():
+    text = "The lease runs five years. Rent is due monthly. The deposit is three months of rent."
+    assert fit_sentences(text, 100) == text
+    assert fit_sentences(text, 14) == "The lease runs five years. Rent is due monthly."
+    assert fit_sentences(text, 1) == "The lease runs five years."
+
+    store = ConversationStore(token_budget=100, summary_max_tokens=14)
+    fill(store, "s", 5)
+
+    async def wordy(old, messages, max_words):
+        return text
+
+    asyncio.run(store.acompact("s", wordy))
+    assert store._sessions["s"].summary == "The lease runs five years. Rent is due monthly."
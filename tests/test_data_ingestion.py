@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import Upload
+from exception.custom_exception import DocumentPortalException
+from src.document_ingestion.data_ingestion import ChatIngestor, FaissManager
+from src.document_ingestion.segment_store import SegmentStore
+
+
+def corpus(paragraphs: int) -> bytes:
+    return "\n\n".join(f"Paragraph {i} talks about topic {i} in some detail." for i in range(paragraphs)).encode()
+
+
+def ingest(tmp_path, session: str, upload: Upload, **kwargs):
+    ci = ChatIngestor(temp_base=str(tmp_path / "data"), faiss_base=str(tmp_path / "faiss"), session_id=session)
+    return ci.build_retriever([upload], chunk_size=60, chunk_overlap=0, batch_size=4, **kwargs)
+
+
+def test_failed_run_is_not_embedded_again_on_retry(tmp_path, fake_embeddings):
+    upload = Upload("notes.txt", corpus(20))
+    fake_embeddings.fail_after = 2
+    with pytest.raises(DocumentPortalException):
+        ingest(tmp_path, "s1", upload)
+    store = SegmentStore(tmp_path / "faiss" / "s1")
+    assert len(store) == 8  # two batches landed before the failure
+
+    fake_embeddings.fail_after = -1
+    ingest(tmp_path, "s1", upload)
+    assert len(store) == 20
+    assert sorted(store.iter_texts()) == sorted(set(store.iter_texts()))
+    assert fake_embeddings.texts_embedded == 20
+
+
+def test_reingesting_the_same_upload_adds_nothing(tmp_path, fake_embeddings):
+    upload = Upload("notes.txt", corpus(10))
+    ingest(tmp_path, "s1", upload)
+    ingest(tmp_path, "s1", Upload("copy.txt", corpus(10)))
+    assert len(SegmentStore(tmp_path / "faiss" / "s1")) == 10
+    assert fake_embeddings.texts_embedded == 10
+
+
+def test_progress_counts_only_embedded_chunks(tmp_path, fake_embeddings):
+    # user-008: chunks dropped by the ledger are reported as skipped, not embedded
+    ingest(tmp_path, "s1", Upload("notes.txt", corpus(10)))
+    seen = []
+    ingest(tmp_path, "s1", Upload("more.txt", corpus(14)), progress=lambda p: seen.append(p.as_dict()))
+    assert seen[-1]["chunks"] == 14
+    assert seen[-1]["chunks_embedded"] == seen[-1]["vectors_added"] == 4
+    assert seen[-1]["chunks_skipped"] == 10
+    assert fake_embeddings.texts_embedded == 14
+
+
+def test_failed_batch_releases_its_claims(tmp_path, fake_embeddings):
+    from langchain_core.documents import Document
+
+    fm = FaissManager(tmp_path / "index")
+    docs = [Document(page_content=f"chunk number {i}") for i in range(3)]
+    fake_embeddings.fail_after = 0
+    with pytest.raises(RuntimeError):
+        fm.add_documents(docs)
+    fake_embeddings.fail_after = -1
+    assert fm.add_documents(docs) == 3
+
+
+def test_ingestion_closes_the_ledger_even_on_failure(tmp_path, fake_embeddings, monkeypatch):
+    import asyncio
+    import src.document_ingestion.data_ingestion as data_ingestion
+
+    closed = []
+    real_close = data_ingestion.ChunkLedger.close
+    monkeypatch.setattr(data_ingestion.ChunkLedger, "close", lambda self: closed.append(self.index_dir) or real_close(self))
+
+    ingest(tmp_path, "s1", Upload("notes.txt", corpus(4)))
+    fake_embeddings.fail_after = 0
+    with pytest.raises(DocumentPortalException):
+        ingest(tmp_path, "s2", Upload("more.txt", b"Text that has never been embedded before."))
+    fake_embeddings.fail_after = -1
+    ci = ChatIngestor(temp_base=str(tmp_path / "data"), faiss_base=str(tmp_path / "faiss"), session_id="s3")
+    asyncio.run(ci.aingest_paths(ci.save_uploads([Upload("async.txt", corpus(4))]), chunk_size=60, chunk_overlap=0))
+    assert [p.name for p in closed] == ["s1", "s2", "s3"]
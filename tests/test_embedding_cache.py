@@ -0,0 +1,150 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from utils.embedding_cache import EmbeddingCache, CachedEmbeddings, text_key
+
+
+def vec(text: str, dim: int = 8):
+    rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+    return rng.standard_normal(dim).astype(np.float32).tolist()
+
+
+def _writer(cache_dir: str, worker: int, n: int):
+    cache = EmbeddingCache(cache_dir, "model", max_entries=10_000)
+    for i in range(n):
+        cache.put_many([f"w{worker}-t{i}"], [[float(worker), float(i)]])
+
+
+def test_put_then_get_round_trips(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    texts = ["alpha", "beta", "gamma"]
+    cache.put_many(texts, [vec(t) for t in texts])
+    got = cache.get_many(["beta", "missing", "alpha", "beta"])
+    assert got[1] is None
+    assert np.allclose(got[0], vec("beta")) and np.allclose(got[3], vec("beta"))
+    assert np.allclose(got[2], vec("alpha"))
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_duplicates_are_stored_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many(["a", "a", "b"], [vec("a"), vec("a"), vec("b")])
+    cache.put_many(["a"], [vec("other")])
+    assert len(cache) == 2
+    assert np.allclose(cache.get_many(["a"])[0], vec("a"))
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    from exception.custom_exception import DocumentPortalException
+
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many(["a"], [vec("a", 8)])
+    with pytest.raises(DocumentPortalException):
+        cache.put_many(["b"], [vec("b", 4)])
+
+
+def test_eviction_keeps_recent_entries_and_their_vectors(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model", max_entries=10)
+    first = [f"t{i}" for i in range(8)]
+    cache.put_many(first, [vec(t) for t in first])
+    cache.get_many(first[:3])  # most recently used survive
+    second = [f"u{i}" for i in range(4)]
+    cache.put_many(second, [vec(t) for t in second])
+
+    assert len(cache) == 9
+    assert cache.vectors_path.stat().st_size == 9 * 8 * 4
+    for t, v in zip(first[:3] + second, cache.get_many(first[:3] + second)):
+        assert v is not None and np.allclose(v, vec(t))
+
+
+def test_other_instance_sees_eviction(tmp_path):
+    reader = EmbeddingCache(str(tmp_path), "model", max_entries=10)
+    writer = EmbeddingCache(str(tmp_path), "model", max_entries=10)
+    texts = [f"t{i}" for i in range(8)]
+    writer.put_many(texts, [vec(t) for t in texts])
+    assert np.allclose(reader.get_many(["t7"])[0], vec("t7"))  # reader now holds a memmap
+
+    more = [f"u{i}" for i in range(4)]
+    writer.put_many(more, [vec(t) for t in more])
+    for t, v in zip(texts + more, reader.get_many(texts + more)):
+        assert v is None or np.allclose(v, vec(t))
+    assert np.allclose(reader.get_many(["u3"])[0], vec("u3"))
+
+
+def test_lookups_buffer_recency_until_a_put_or_a_full_batch(tmp_path):
+    # user-003: hits are not written to the index under the shared lock
+    import sqlite3
+
+    cache = EmbeddingCache(str(tmp_path), "model", touch_batch=3)
+    texts = ["a", "b", "c", "d"]
+    cache.put_many(texts, [vec(t) for t in texts])
+    index = sqlite3.connect(str(cache.dir / "index.sqlite"))
+    last_used = lambda: dict(index.execute("SELECT key, last_used FROM entries").fetchall())
+    before = last_used()
+
+    cache.get_many(["a", "b"])
+    assert last_used() == before
+    cache.get_many(["c"])  # third buffered key: flushed under the exclusive lock
+    after = last_used()
+    assert {k for k in after if after[k] > before[k]} == {text_key(t) for t in ("a", "b", "c")}
+
+    cache.get_many(["d"])
+    cache.put_many(["a"], [vec("a")])  # nothing new, but the buffered touch is written
+    assert last_used()[text_key("d")] > before[text_key("d")]
+
+
+def test_puts_keep_a_running_count(tmp_path):
+    # user-003: put_many does not rescan the index to enforce max_entries
+    cache = EmbeddingCache(str(tmp_path), "model", max_entries=10)
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+    for i in range(12):
+        cache.put_many([f"t{i}", f"t{i}"], [vec(f"t{i}")] * 2)
+    assert not [s for s in statements if "COUNT(" in s]
+    assert len(cache) == 10  # evicted to 9 at the 11th put, then one more
+
+    cache._db.execute("DELETE FROM meta WHERE name = 'entries'")  # cache from before the count existed
+    cache._db.commit()
+    roomy = EmbeddingCache(str(tmp_path), "model", max_entries=100)
+    roomy.put_many(["fresh"], [vec("fresh")])
+    assert len(roomy) == len(cache) == 11
+
+
+def test_concurrent_processes_do_not_overwrite_rows(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_writer, args=(str(tmp_path), w, 150)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+    cache = EmbeddingCache(str(tmp_path), "model", max_entries=10_000)
+    assert len(cache) == 600
+    assert cache.vectors_path.stat().st_size == 600 * 2 * 4
+    for w in range(4):
+        texts = [f"w{w}-t{i}" for i in range(150)]
+        assert cache.get_many(texts) == [[float(w), float(i)] for i in range(150)]
+
+
+def test_cached_embeddings_only_embeds_misses(tmp_path):
+    from langchain_core.embeddings import Embeddings
+
+    class Counting(Embeddings):
+        def __init__(self):
+            self.embedded = []
+
+        def embed_documents(self, texts):
+            self.embedded.extend(texts)
+            return [vec(t) for t in texts]
+
+        def embed_query(self, text):
+            return vec(text)
+
+    underlying = Counting()
+    emb = CachedEmbeddings(underlying, EmbeddingCache(str(tmp_path), "model"))
+    assert np.allclose(emb.embed_documents(["a", "b", "a"]), [vec("a"), vec("b"), vec("a")])
+    emb.embed_documents(["b", "c"])
+    assert underlying.embedded == ["a", "b", "c"]
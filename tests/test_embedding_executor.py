@@ -0,0 +1,67 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from utils.embedding_executor import BatchedEmbeddings, is_transient
+
+
+class ProviderError(Exception):
+    '''Stand-in for GoogleGenerativeAIError: no status, a name that says nothing about retrying.'''
+
+
+class FlakyEmbeddings(Embeddings):
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return [[float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+
+def wrapped(cause: BaseException) -> ProviderError:
+    try:
+        try:
+            raise cause
+        except BaseException as e:
+            raise ProviderError(f"Error embedding content: {e}") from e
+    except ProviderError as outer:
+        return outer
+
+
+def test_wrapped_resource_exhausted_is_transient():
+    exceptions = pytest.importorskip("google.api_core.exceptions")
+    assert is_transient(wrapped(exceptions.ResourceExhausted("quota")))
+    assert is_transient(wrapped(exceptions.ServiceUnavailable("down")))
+    assert not is_transient(wrapped(exceptions.InvalidArgument("bad request")))
+
+
+def test_status_found_anywhere_in_chain():
+    class HTTPError(Exception):
+        status_code = 429
+
+    assert is_transient(wrapped(HTTPError()))
+    assert is_transient(wrapped(wrapped(TimeoutError())))
+    assert not is_transient(wrapped(ValueError("bad input")))
+
+
+def test_wrapped_429_is_retried():
+    class RateLimited(Exception):
+        code = 429
+
+    underlying = FlakyEmbeddings([wrapped(RateLimited()), wrapped(RateLimited())])
+    executor = BatchedEmbeddings(underlying, batch_size=2, max_retries=3, base_delay=0.0)
+    assert executor.embed_documents(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert executor.retries == 2
+
+
+def test_fatal_error_is_not_retried():
+    underlying = FlakyEmbeddings([wrapped(ValueError("bad input"))])
+    executor = BatchedEmbeddings(underlying, max_retries=3, base_delay=0.0)
+    with pytest.raises(ProviderError):
+        executor.embed_documents(["a"])
+    assert underlying.calls == 1
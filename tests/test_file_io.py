@@ -0,0 +1,64 @@
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from conftest import Upload
+from utils.file_io import RequestSizeLimit, UploadRejected, store_blob
+
+LIMIT = 64 << 10
+
+
+@pytest.fixture
+def client():
+    calls = []
+    app = FastAPI()
+    app.add_middleware(RequestSizeLimit, max_bytes=LIMIT)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        calls.append(file.filename)
+        return {"ok": True}
+
+    with TestClient(app) as c:
+        c.calls = calls
+        yield c
+
+
+def test_small_request_passes(client):
+    assert client.post("/upload", files={"file": ("a.txt", b"x" * 1000)}).status_code == 200
+    assert client.calls == ["a.txt"]
+
+
+def test_declared_length_over_the_cap_is_refused_unread(client):
+    response = client.post("/upload", files={"file": ("a.txt", b"x" * (2 * LIMIT))})
+    assert response.status_code == 413
+    assert client.calls == []
+
+
+def test_chunked_body_is_cut_off_once_over_the_cap(client):
+    boundary = "b0undary"
+    head = f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="a.txt"\r\n\r\n'.encode()
+
+    def body():
+        yield head
+        for _ in range(8):
+            yield b"x" * (16 << 10)
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    response = client.post(
+        "/upload", content=body(), headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert response.status_code == 413
+    assert client.calls == []
+
+
+def test_store_blob_checks_type_and_size(tmp_path):
+    with pytest.raises(UploadRejected) as e:
+        store_blob(Upload("a.pdf", b"\x89PNG not a pdf"), ".pdf", tmp_path, max_bytes=LIMIT, name="a.pdf")
+    assert e.value.status_code == 415
+    with pytest.raises(UploadRejected) as e:
+        store_blob(Upload("a.txt", b"x" * (LIMIT + 1)), ".txt", tmp_path, max_bytes=LIMIT, chunk_size=4096)
+    assert e.value.status_code == 413
+    blob, digest, size = store_blob(Upload("a.txt", b"hello"), ".txt", tmp_path, max_bytes=LIMIT)
+    assert blob.read_bytes() == b"hello" and size == 5 and blob.name == f"{digest}.txt"
+    assert not list(tmp_path.glob(".upload-*"))
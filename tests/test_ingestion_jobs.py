@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from conftest import Upload
+from src.document_ingestion import ingestion_jobs
+from src.document_ingestion.data_ingestion import ChatIngestor
+from src.document_ingestion.ingestion_jobs import IngestionJobQueue, SUCCEEDED, CANCELLED
+from utils.concurrency import QueueFullError
+
+OPTIONS = {"chunk_size": 1000, "chunk_overlap": 200, "k": 5, "use_session_dirs": True}
+
+
+def make_queue(tmp_path, **kwargs) -> IngestionJobQueue:
+    return IngestionJobQueue(
+        db_path=str(tmp_path / "jobs.sqlite"), temp_base=str(tmp_path / "data"), faiss_base=str(tmp_path / "faiss"), **kwargs
+    )
+
+
+def saved(queue: IngestionJobQueue, session: str, *uploads: Upload):
+    ci = ChatIngestor(temp_base=queue.temp_base, faiss_base=queue.faiss_base, session_id=session)
+    return ci, ci.save_uploads(list(uploads))
+
+
+def test_wait_returns_the_finished_job(tmp_path, fake_embeddings):
+    done = []
+
+    async def scenario():
+        queue = make_queue(tmp_path, on_success=lambda job: done.append(job["job_id"]))
+        job = queue.submit(*saved(queue, "s1", Upload("a.txt", b"alpha beta gamma")), OPTIONS)
+        finished = await queue.wait(job["job_id"])
+        await queue.stop()
+        return job, finished
+
+    job, finished = asyncio.run(scenario())
+    assert finished["status"] == SUCCEEDED
+    assert done == [job["job_id"]]
+
+
+def test_submissions_for_a_queued_job_are_coalesced(tmp_path, fake_embeddings):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        first = queue.submit(*saved(queue, "s1", Upload("a.txt", b"alpha")), OPTIONS)
+        second = queue.submit(*saved(queue, "s1", Upload("b.txt", b"beta")), OPTIONS)
+        finished = await queue.wait(first["job_id"])
+        await queue.stop()
+        return first, second, finished
+
+    first, second, finished = asyncio.run(scenario())
+    assert second["job_id"] == first["job_id"]
+    assert finished["coalesced"] == 1
+    assert len(finished["files"]) == 2
+    assert finished["status"] == SUCCEEDED
+
+
+def test_cancelling_a_queued_job_releases_its_waiters(tmp_path, fake_embeddings):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        job = queue.submit(*saved(queue, "s1", Upload("a.txt", b"alpha")), OPTIONS)
+        waiter = asyncio.ensure_future(queue.wait(job["job_id"]))
+        await asyncio.sleep(0)
+        queue.cancel(job["job_id"])
+        finished = await asyncio.wait_for(waiter, 5)
+        follow_up = queue.submit(*saved(queue, "s1", Upload("b.txt", b"beta")), OPTIONS)
+        follow_up = await queue.wait(follow_up["job_id"])
+        await queue.stop()
+        return job, finished, follow_up
+
+    job, finished, follow_up = asyncio.run(scenario())
+    assert finished["status"] == CANCELLED
+    assert follow_up["job_id"] != job["job_id"]
+    assert len(follow_up["files"]) == 1
+    assert follow_up["status"] == SUCCEEDED
+
+
+def test_jobs_for_the_same_index_never_overlap(tmp_path, fake_embeddings, monkeypatch):
+    active, overlap = set(), []
+
+    async def slow_ingest(self, paths, **kwargs):
+        target = str(self.faiss_dir)
+        overlap.append(target in active)
+        active.add(target)
+        await asyncio.sleep(0.05)
+        active.discard(target)
+
+    monkeypatch.setattr(ingestion_jobs.ChatIngestor, "aingest_paths", slow_ingest)
+
+    async def scenario():
+        queue = make_queue(tmp_path, workers=2)
+        first = queue.submit(*saved(queue, "s1", Upload("a.txt", b"alpha")), OPTIONS)
+        while queue.status(first["job_id"])["status"] != "running":
+            await asyncio.sleep(0.005)
+        second = queue.submit(*saved(queue, "s1", Upload("b.txt", b"beta")), OPTIONS)
+        results = await asyncio.gather(queue.wait(first["job_id"]), queue.wait(second["job_id"]))
+        await queue.stop()
+        return first, second, results
+
+    first, second, results = asyncio.run(scenario())
+    assert first["job_id"] != second["job_id"]
+    assert [r["status"] for r in results] == [SUCCEEDED, SUCCEEDED]
+    assert overlap == [False, False]
+
+
+def test_submissions_beyond_max_queued_are_refused(tmp_path, fake_embeddings):
+    async def scenario():
+        queue = make_queue(tmp_path, max_queued=1)
+        first = queue.submit(*saved(queue, "s1", Upload("a.txt", b"alpha")), OPTIONS)
+        merged = queue.submit(*saved(queue, "s1", Upload("b.txt", b"beta")), OPTIONS)
+        with pytest.raises(QueueFullError):
+            queue.submit(*saved(queue, "s2", Upload("c.txt", b"gamma")), OPTIONS)
+        full = queue.full()
+        await queue.wait(first["job_id"])
+        room = not queue.full()
+        await queue.stop()
+        return first, merged, full, room
+
+    first, merged, full, room = asyncio.run(scenario())
+    assert merged["job_id"] == first["job_id"]  # coalescing needs no new slot
+    assert full and room
+
+
+def test_stop_lets_waiters_read_their_job_first(tmp_path, fake_embeddings, monkeypatch):
+    async def never_done(self, paths, **kwargs):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(ingestion_jobs.ChatIngestor, "aingest_paths", never_done)
+
+    async def scenario():
+        queue = make_queue(tmp_path, workers=1)
+        running = queue.submit(*saved(queue, "s1", Upload("a.txt", b"alpha")), OPTIONS)
+        queued = queue.submit(*saved(queue, "s2", Upload("b.txt", b"beta")), OPTIONS)
+        waiters = [asyncio.ensure_future(queue.wait(j["job_id"])) for j in (running, queued)]
+        while queue.status(running["job_id"])["status"] != "running":
+            await asyncio.sleep(0.005)
+        await queue.stop()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(scenario())
+    assert [r["status"] for r in results] == ["running", "queued"]
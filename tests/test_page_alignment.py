@@ -0,0 +1,30 @@
+from src.document_comparison.page_alignment import align_pages
+
+PAGES = [
+    "Introduction to the services agreement between the parties named below.",
+    "Payment terms: invoices are due within thirty days of receipt.",
+    "Termination: either party may end the agreement with notice.",
+]
+
+
+def test_identical_pages_ignore_layout_noise():
+    actual = [p.replace("agreement", "agree-\n  ment").replace(" ", "   ") for p in PAGES]
+    pairs = align_pages(PAGES, actual)
+    assert [(p.ref_page, p.act_page, p.identical) for p in pairs] == [(1, 1, True), (2, 2, True), (3, 3, True)]
+
+
+def test_inserted_page_shifts_later_pages():
+    actual = PAGES[:1] + ["Definitions: capitalised words have the meaning given here."] + PAGES[1:]
+    pairs = align_pages(PAGES, actual)
+    assert [(p.ref_page, p.act_page) for p in pairs] == [(1, 1), (None, 2), (2, 3), (3, 4)]
+    assert pairs[1].label == "2"
+    assert pairs[2].label == "2 (reference) / 3 (actual)"
+
+
+def test_changed_page_is_paired_and_unrelated_page_is_not():
+    actual = [PAGES[0], PAGES[1].replace("thirty", "sixty"), "Completely unrelated text about weather and birds."]
+    pairs = align_pages(PAGES, actual)
+    changed = [(p.ref_page, p.act_page) for p in pairs if not p.identical]
+    assert (2, 2) in changed
+    assert (3, None) in changed and (None, 3) in changed
+    assert 0.3 <= next(p for p in pairs if p.ref_page == 2).similarity < 1.0
@@ -0,0 +1,94 @@
+import asyncio
+from typing import List
+
+import pytest
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.retrievers import BaseRetriever
+
+import src.document_chat.retrieval as retrieval
+from src.document_chat.answer_cache import AnswerCache
+from src.document_chat.retrieval import ConversationalRAG
+from utils.model_loader import ModelLoader
+
+
+class ListRetriever(BaseRetriever):
+    docs: List[Document]
+    queries: List[str] = []
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        self.queries.append(query)
+        return self.docs
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    llm = FakeListChatModel(responses=["standalone question", "the answer"])
+    monkeypatch.setattr(ModelLoader, "load_llm", lambda self: llm)
+    monkeypatch.setattr(retrieval, "index_version", lambda path: 1)
+    retriever = ListRetriever(docs=[Document(page_content="ctx", metadata={"page": 3})], queries=[])
+    rag = ConversationalRAG("s", retriever=retriever)
+    rag.answer_cache = AnswerCache()
+    rag._cache_namespace, rag.index_path = "ns", "/index"
+    rag.llm = llm
+    return rag
+
+
+def stream(rag, question, history=None):
+    async def collect():
+        return [e async for e in rag.astream(question, chat_history=history)]
+    return asyncio.run(collect())
+
+
+def test_entry_points_share_the_pipeline(rag):
+    rag.answer_cache = None
+    history = [HumanMessage(content="earlier"), AIMessage(content="reply")]
+    assert rag.invoke("what about it", history) == "the answer"
+    rag.rewriter._cache.clear()
+    assert asyncio.run(rag.ainvoke("what about it", history)) == "the answer"
+    rag.rewriter._cache.clear()
+    events = stream(rag, "what about it", history)
+    assert "".join(e["content"] for e in events if e["type"] == "token") == "the answer"
+    end = events[-1]
+    assert end["type"] == "end" and end["sources"] == [{"page": 3}]
+    assert end["timing"]["rewrite"] == "llm" and "first_token_ms" in end["timing"]
+    # each run rewrote the follow-up with the LLM before retrieving
+    assert rag.retriever.queries == ["standalone question"] * 3
+
+
+def test_repeated_question_hits_within_a_conversation(rag):
+    rag.llm.responses = ["What is the notice period of the lease?", "Three months."]
+    history = [HumanMessage(content="Tell me about the lease"), AIMessage(content="It is an office lease.")]
+    assert rag.invoke("and its notice period?", history) == "Three months."
+
+    later = history + [
+        HumanMessage(content="and its notice period?"), AIMessage(content="Three months."),
+        HumanMessage(content="Who signed the lease?"), AIMessage(content="The tenant's director."),
+    ]
+    events = stream(rag, "what was its notice period again", later)
+    assert "".join(e["content"] for e in events if e["type"] == "token") == "Three months."
+    assert events[-1]["timing"]["cache"] == "exact"
+    assert rag.retriever.queries == ["What is the notice period of the lease?"]
+
+
+def test_cached_answer_short_circuits_every_entry_point(rag):
+    rag.llm.responses = ["the answer"]
+    assert rag.invoke("What does the contract say about renewals?") == "the answer"
+    assert asyncio.run(rag.ainvoke("what does the contract say about renewals")) == "the answer"
+    events = stream(rag, "What does the contract say about renewals?")
+    assert [e["type"] for e in events] == ["token", "end"]
+    assert events[-1]["sources"] == [{"page": 3}] and events[-1]["timing"]["cache"] == "exact"
+    assert len(rag.retriever.queries) == 1
+
+
+def test_query_before_loading_fails(monkeypatch):
+    monkeypatch.setattr(ModelLoader, "load_llm", lambda self: FakeListChatModel(responses=["x"]))
+    rag = ConversationalRAG("s")
+    from exception.custom_exception import DocumentPortalException
+
+    with pytest.raises(DocumentPortalException):
+        rag.invoke("question")
+    with pytest.raises(DocumentPortalException):
+        stream(rag, "question")
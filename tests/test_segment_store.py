@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from exception.custom_exception import DocumentPortalException
+from src.document_ingestion.data_ingestion import FaissManager
+from src.document_ingestion.segment_store import SegmentStore, index_version, load_vectorstore
+
+EMB = DeterministicFakeEmbedding(size=16)
+
+
+def append_texts(store: SegmentStore, texts):
+    return store.append(EMB.embed_documents(texts), texts, [{"source": t} for t in texts])
+
+
+def test_appends_are_visible_after_reload(tmp_path):
+    store = SegmentStore(tmp_path, max_segments=100)
+    assert append_texts(store, ["alpha one", "beta two"]) == [0, 1]
+    assert append_texts(store, ["gamma three"]) == [2]
+    assert store.version == index_version(tmp_path) == 2
+    assert len(store.read_manifest()["segments"]) == 2
+
+    vs = SegmentStore(tmp_path).load(EMB)
+    assert vs.index.ntotal == 3
+    hit = vs.similarity_search("gamma three", k=1)[0]
+    assert hit.page_content == "gamma three"
+    assert hit.metadata == {"source": "gamma three"}
+    assert [row for row, _ in vs.docstore.keyword_search("beta")] == [1]
+
+
+def test_merge_keeps_rows_in_order(tmp_path):
+    store = SegmentStore(tmp_path, max_segments=100)
+    texts = [f"chunk {i}" for i in range(6)]
+    for i in range(0, 6, 2):
+        append_texts(store, texts[i:i + 2])
+    store.merge()
+    assert len(store.read_manifest()["segments"]) == 1
+    assert list(store.iter_texts()) == texts
+    vs = store.load(EMB)
+    assert np.allclose(vs.index.reconstruct_n(0, 6), np.array(EMB.embed_documents(texts), dtype=np.float32))
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    store = SegmentStore(tmp_path)
+    append_texts(store, ["alpha"])
+    with pytest.raises(DocumentPortalException):
+        store.append([[0.0] * 8], ["beta"], [{}])
+    assert len(store) == 1
+
+
+def test_legacy_index_is_migrated_once(tmp_path, fake_embeddings):
+    texts = ["legacy alpha", "legacy beta", "legacy gamma"]
+    FAISS.from_texts(texts, fake_embeddings, metadatas=[{"i": i} for i in range(3)]).save_local(str(tmp_path))
+
+    fm = FaissManager(tmp_path)
+    assert not (tmp_path / "index.faiss").exists() and not (tmp_path / "index.pkl").exists()
+    assert list(fm.store.iter_texts()) == texts
+    assert len(fm.ledger) == 3  # the ledger adopts the migrated chunks
+    assert load_vectorstore(tmp_path, fake_embeddings).similarity_search("legacy beta", k=1)[0].metadata == {"i": 1}
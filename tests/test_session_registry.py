@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import src.document_chat.session_registry as session_registry
+from src.document_chat.session_registry import SessionRegistry
+from exception.custom_exception import DocumentPortalException
+
+
+class FakeRAG:
+    loads = 0
+    delay = 0.0
+    fail = False
+    _lock = threading.Lock()
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+
+    def load_retriever_from_faiss(self, index_dir, k=5, index_name="index"):
+        with FakeRAG._lock:
+            FakeRAG.loads += 1
+        time.sleep(FakeRAG.delay)
+        if FakeRAG.fail:
+            raise RuntimeError("corrupt index")
+        self.index_dir = index_dir
+
+
+@pytest.fixture(autouse=True)
+def fake_rag(monkeypatch):
+    FakeRAG.loads, FakeRAG.delay, FakeRAG.fail = 0, 0.0, False
+    monkeypatch.setattr(session_registry, "ConversationalRAG", FakeRAG)
+
+
+def make_index(path, payload=b"{}"):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "manifest.json").write_bytes(payload)
+    (path / "seg-000000.faiss").write_bytes(b"x" * 1024)
+    return str(path)
+
+
+def test_hit_returns_the_same_loaded_session(tmp_path):
+    reg = SessionRegistry()
+    index = make_index(tmp_path / "s1")
+    assert reg.get(index) is reg.get(index)
+    assert FakeRAG.loads == 1
+    assert reg.stats()["hits"] == 1 and reg.stats()["misses"] == 1
+
+
+def test_reindexing_changes_signature_and_reloads(tmp_path):
+    reg = SessionRegistry()
+    index = make_index(tmp_path / "s1")
+    first = reg.get(index)
+    manifest = tmp_path / "s1" / "manifest.json"
+    manifest.write_bytes(b'{"version": 2}')
+    os.utime(manifest, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+    second = reg.get(index)
+    assert second is not first and FakeRAG.loads == 2
+    assert reg.get(index) is second
+
+
+def test_k_is_part_of_the_key(tmp_path):
+    reg = SessionRegistry()
+    index = make_index(tmp_path / "s1")
+    assert reg.get(index, k=5) is not reg.get(index, k=10)
+
+
+def test_lru_eviction_by_entries_and_memory(tmp_path):
+    reg = SessionRegistry(max_entries=2)
+    a, b, c = (make_index(tmp_path / n) for n in "abc")
+    reg.get(a)
+    reg.get(b)
+    reg.get(a)
+    reg.get(c)
+    assert reg.loaded_dirs() == {a, c}
+
+    small = SessionRegistry(max_entries=10, max_memory_mb=0)
+    small.get(a)
+    small.get(b)
+    assert small.loaded_dirs() == {b}  # always keeps the newest entry
+
+
+def test_concurrent_misses_load_once(tmp_path):
+    reg = SessionRegistry()
+    index = make_index(tmp_path / "s1")
+    FakeRAG.delay = 0.2
+    with ThreadPoolExecutor(8) as pool:
+        rags = list(pool.map(lambda _: reg.get(index), range(8)))
+    assert FakeRAG.loads == 1
+    assert all(r is rags[0] for r in rags)
+    assert reg.stats()["coalesced"] == 7
+
+
+def test_failed_load_is_shared_and_not_cached(tmp_path):
+    reg = SessionRegistry()
+    index = make_index(tmp_path / "s1")
+    FakeRAG.delay, FakeRAG.fail = 0.2, True
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(reg.get, index) for _ in range(4)]
+        for f in futures:
+            with pytest.raises(DocumentPortalException):
+                f.result()
+    assert FakeRAG.loads == 1
+    FakeRAG.delay, FakeRAG.fail = 0.0, False
+    reg.get(index)
+    assert FakeRAG.loads == 2
+
+
+def test_invalidate_during_load_does_not_cache(tmp_path):
+    reg = SessionRegistry()
+    index = make_index(tmp_path / "s1")
+    FakeRAG.delay = 0.2
+    with ThreadPoolExecutor(1) as pool:
+        pending = pool.submit(reg.get, index)
+        time.sleep(0.05)
+        reg.invalidate(index)
+        pending.result()
+    assert reg.loaded_dirs() == set()
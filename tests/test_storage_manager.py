@@ -0,0 +1,43 @@
+import os
+import time
+
+from utils.storage_manager import StorageManager
+
+
+def make_session(root, session_id: str, size: int, age: float):
+    path = root / session_id
+    path.mkdir(parents=True)
+    (path / "blob.bin").write_bytes(b"x" * size)
+    past = time.time() - age
+    os.utime(path, (past, past))
+    return str(path)
+
+
+def test_quota_evicts_oldest_unpinned_sessions(tmp_path):
+    root = tmp_path / "chat"
+    oldest = make_session(root, "s-oldest", 1000, 300)
+    middle = make_session(root, "s-middle", 1000, 200)
+    make_session(root, "s-newest", 1000, 100)
+    evicted = []
+    storage = StorageManager(
+        str(tmp_path / "storage.sqlite"), roots={"chat": [str(root)]}, quotas={"chat": 2500}, min_idle_seconds=60,
+        pinned=[lambda: [oldest]], on_evict=lambda service, sid, paths: evicted.append(sid),
+    )
+    result = storage.collect()
+    assert result["added"] == 3 and result["evicted"] == 1
+    assert evicted == ["s-middle"]
+    assert os.path.exists(oldest) and not os.path.exists(middle)
+    assert storage.usage()["services"]["chat"]["pinned"] == 1
+
+
+def test_recently_touched_sessions_are_kept(tmp_path):
+    root = tmp_path / "chat"
+    for i in range(3):
+        make_session(root, f"s{i}", 1000, 300)
+    storage = StorageManager(str(tmp_path / "storage.sqlite"), roots={"chat": [str(root)]}, quotas={"chat": 1500},
+                             min_idle_seconds=60)
+    storage.scan()
+    for i in range(3):
+        storage.touch("chat", f"s{i}", written=False)
+    assert storage.enforce() == 0
+    assert sorted(os.listdir(root)) == ["s0", "s1", "s2"]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.config_loader import load_config
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+_config = load_config().get("concurrency", {}) or {}
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+class QueueFullError(RuntimeError):
+    '''Raised when an endpoint already has as many requests waiting as its queue allows.'''
+
+
+def get_worker_pool() -> ThreadPoolExecutor:
+    '''Shared, sized thread pool for blocking work (PDF parsing, FAISS, file I/O).'''
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=int(_config.get("worker_threads", 16)), thread_name_prefix="portal-worker"
+        )
+    return _pool
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    '''Run a blocking callable on the worker pool without stalling the event loop.'''
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, **kwargs)
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(get_worker_pool(), ctx.run, call)
+
+
+def shutdown_worker_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class EndpointLimiter:
+    '''Caps concurrent executions of one endpoint and rejects new work once its wait queue is full.'''
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.active = 0
+
+    async def acquire(self):
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            log.warning("Endpoint queue full", endpoint=self.name, waiting=self.waiting, active=self.active)
+            raise QueueFullError(f"Too many concurrent '{self.name}' requests, retry later")
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._sem.release()
+
+
+def endpoint_limiters() -> Dict[str, EndpointLimiter]:
+    '''Build one limiter per endpoint from the concurrency.endpoints section of config.yaml.'''
+    endpoints = _config.get("endpoints", {}) or {}
+    return {
+        name: EndpointLimiter(name, int(c.get("max_concurrency", 4)), int(c.get("max_queue", 16)))
+        for name, c in endpoints.items()
+    }
@@ -1,21 +1,11 @@
 from __future__ import annotations
-import os
-import sys
-import json
-import uuid
-import hashlib
-import shutil
 from pathlib import Path
-from datetime import datetime, timezone
-from typing import Iterable, List, Optional, Dict, Any
+from typing import Iterable, Iterator, List, Optional, Dict
 
-import fitz  # PyMuPDF
 from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
-from langchain_community.vectorstores import FAISS
 
-from utils.model_loader import ModelLoader
+from utils.config_loader import load_config
+from utils.parallel_loader import parse_files, plan_tasks, iter_parsed
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 
@@ -23,28 +13,51 @@ log = CustomLogger().get_logger(__name__)
 
 SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
 
-def load_documents(paths: Iterable[Path]) -> List[Document]:
-    """Load docs using appropriate loader based on extension."""
-    docs: List[Document] = []
+def load_documents(paths: Iterable[Path], max_workers: Optional[int] = None) -> List[Document]:
+    """Load docs in parallel (one process per file or PDF page range), in input order.
+
+    Files that fail to parse are logged and left out instead of aborting the whole batch.
+    """
     try:
-        for p in paths:
-            ext = p.suffix.lower()
-            if ext == ".pdf":
-                loader = PyPDFLoader(str(p))
-            elif ext == ".docx":
-                loader = Docx2txtLoader(str(p))
-            elif ext == ".txt":
-                loader = TextLoader(str(p), encoding="utf-8")
-            else:
-                log.warning("Unsupported extension skipped", path=str(p))
-                continue
-            docs.extend(loader.load())
-        log.info("Documents loaded", count=len(docs))
-        return docs
+        cfg = load_config().get("document_parsing", {}) or {}
+        result = parse_files(
+            paths,
+            max_workers=max_workers or cfg.get("max_workers"),
+            pages_per_task=int(cfg.get("pages_per_task", 50)),
+        )
+        for p in result.skipped:
+            log.warning("Unsupported extension skipped", path=p)
+        for failure in result.failures:
+            log.error("Failed to parse document", path=failure["path"], error=failure["error"])
+        log.info("Documents loaded", count=len(result.documents), failed=len(result.failures))
+        return result.documents
     except Exception as e:
         log.error("Failed loading documents", error=str(e))
         raise DocumentPortalException("Error loading documents", e) from e
 
+def iter_documents(paths: Iterable[Path], max_workers: Optional[int] = None) -> Iterator[Document]:
+    """Lazily yield parsed pages/documents in input order, holding only a few parse tasks in memory.
+
+    Unlike load_documents(), a file that fails part-way keeps the pages already yielded;
+    the failing page range is logged and skipped.
+    """
+    cfg = load_config().get("document_parsing", {}) or {}
+    tasks, skipped = plan_tasks(paths, int(cfg.get("pages_per_task", 50)))
+    for p in skipped:
+        log.warning("Unsupported extension skipped", path=p)
+    offsets: Dict[str, int] = {}
+    for task, docs, error in iter_parsed(tasks, max_workers or cfg.get("max_workers")):
+        if error is not None:
+            log.error("Failed to parse document", path=task.path, error=error, start_page=task.start)
+            continue
+        for d in docs:
+            if "start_char" in d.metadata:
+                start = offsets.get(task.path, 0)
+                d.metadata["start_char"] = start
+                d.metadata["end_char"] = start + len(d.page_content)
+                offsets[task.path] = d.metadata["end_char"] + 1
+            yield d
+
 def concat_for_analysis(docs: List[Document]) -> str:
     parts = []
     for d in docs:
@@ -0,0 +1,285 @@
+from __future__ import annotations
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.config_loader import load_config
+from utils.concurrency import run_blocking
+from utils.tracing import cache_event
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+log = CustomLogger().get_logger(__name__)
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    '''Content-addressed on-disk embedding cache for a single embedding model.
+
+    Vectors are stored back to back in a float32 file that is read through a memmap; an SQLite
+    index maps sha256(text) to its row and last-use time for LRU eviction. Several processes may
+    share a cache directory: row allocation, appends and eviction hold an exclusive file lock,
+    lookups a shared one. Lookups only buffer their hits' recency in memory; the buffer is written
+    under the exclusive lock by the next put, or once it holds touch_batch keys.
+    '''
+    _shared: Dict[str, "EmbeddingCache"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 200_000, touch_batch: int = 1000):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.dir = Path(cache_dir) / re.sub(r"[^a-zA-Z0-9_\-]", "_", model_name)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.f32"
+        self.vectors_path.touch(exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.dir / "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        # Writers keep the entry count in meta so a put does not rescan the index; caches written
+        # before that get it counted once here.
+        self._db.execute("INSERT OR IGNORE INTO meta (name, value) SELECT 'entries', COUNT(*) FROM entries")
+        self._db.commit()
+        self.dim: Optional[int] = self._get_meta("dim")
+        self._mm: Optional[np.memmap] = None
+        self._mm_ino: Optional[int] = None
+        self._touched: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def shared(cls, model_name: str) -> Optional["EmbeddingCache"]:
+        '''Return the process-wide cache for model_name configured in config.yaml, or None if disabled.'''
+        cfg = load_config().get("embedding_cache", {}) or {}
+        if not cfg.get("enabled", True):
+            return None
+        with cls._shared_lock:
+            cache = cls._shared.get(model_name)
+            if cache is None:
+                cache = cls(
+                    cache_dir=os.getenv("EMBEDDING_CACHE_DIR", cfg.get("cache_dir", "embedding_cache")),
+                    model_name=model_name,
+                    max_entries=int(cfg.get("max_entries", 200_000)),
+                    touch_batch=int(cfg.get("touch_batch", 1000)),
+                )
+                cls._shared[model_name] = cache
+            return cache
+
+    def _get_meta(self, name: str) -> Optional[int]:
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: int):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    @contextmanager
+    def _locked(self, shared: bool = False) -> Iterator[None]:
+        '''Serialize access across threads and, where supported, processes sharing the directory.'''
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.dir / "index.lock", "a") as fh:
+                fcntl.flock(fh, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _rows_on_disk(self) -> int:
+        if not self.dim:
+            return 0
+        return self.vectors_path.stat().st_size // (4 * self.dim)
+
+    def _vectors(self) -> np.memmap:
+        '''Memmap over the vector file, remapped when it has grown or was rewritten by an eviction.'''
+        st = self.vectors_path.stat()
+        rows = st.st_size // (4 * self.dim)
+        if self._mm is None or self._mm_ino != st.st_ino or self._mm.shape[0] != rows:
+            self._mm = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._mm_ino = st.st_ino
+        return self._mm
+
+    def __len__(self) -> int:
+        return self._get_meta("entries") or 0
+
+    def _flush_touched(self):
+        '''Write buffered last_used updates; called with the exclusive lock held, committed by the caller.'''
+        if self._touched:
+            self._db.executemany(
+                "UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(used, k) for k, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def flush(self):
+        '''Persist the recency of lookups made since the last put.'''
+        with self._locked():
+            self._flush_touched()
+            self._db.commit()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        '''Batched lookup; returns a vector per text, or None on a miss.'''
+        keys = [text_key(t) for t in texts]
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        with self._locked(shared=True):
+            if self.dim is None:
+                self.dim = self._get_meta("dim")
+            if not self.dim or not keys:
+                self.misses += len(keys)
+                return out
+            found: Dict[str, int] = {}
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                q = f"SELECT key, row FROM entries WHERE key IN ({','.join('?' * len(batch))})"
+                found.update(self._db.execute(q, batch).fetchall())
+            if found:
+                mm = self._vectors()
+                for i, k in enumerate(keys):
+                    row = found.get(k)
+                    if row is not None and row < mm.shape[0]:
+                        out[i] = mm[row].tolist()
+                self._touched.update(dict.fromkeys(found, time.time()))
+            hit = sum(1 for v in out if v is not None)
+            self.hits += hit
+            self.misses += len(keys) - hit
+            flush = len(self._touched) >= self.touch_batch
+        if flush:
+            self.flush()
+        cache_event("embedding", True, hit)
+        cache_event("embedding", False, len(keys) - hit)
+        return out
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        '''Batched insert of new vectors; texts already cached are skipped.'''
+        if not texts:
+            return
+        arr = np.asarray(vectors, dtype=np.float32)
+        with self._locked():
+            if self.dim is None:
+                self.dim = self._get_meta("dim")
+            if self.dim is None:
+                self.dim = int(arr.shape[1])
+                self._set_meta("dim", self.dim)
+            elif arr.shape[1] != self.dim:
+                raise DocumentPortalException(
+                    f"Embedding dimension mismatch for {self.model_name}: {arr.shape[1]} != {self.dim}"
+                )
+
+            self._flush_touched()
+            seen = set()
+            new_rows, new_keys = [], []
+            for t, v in zip(texts, arr):
+                k = text_key(t)
+                if k in seen:
+                    continue
+                seen.add(k)
+                if self._db.execute("SELECT 1 FROM entries WHERE key = ?", (k,)).fetchone():
+                    continue
+                new_keys.append(k)
+                new_rows.append(v)
+            if not new_keys:
+                self._db.commit()
+                return
+
+            start = self._rows_on_disk()
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(new_rows).astype(np.float32).tobytes())
+            now = time.time()
+            self._db.executemany(
+                "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                [(k, start + i, now) for i, k in enumerate(new_keys)],
+            )
+            count = len(self) + len(new_keys)
+            self._set_meta("entries", count)
+            self._db.commit()
+            if count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        '''Drop least recently used entries down to 90% of capacity and compact the vector file.
+
+        Called with the exclusive lock held; other processes notice the new file by its inode.
+        '''
+        keep = int(self.max_entries * 0.9)
+        survivors = self._db.execute(
+            "SELECT key, row, last_used FROM entries ORDER BY last_used DESC LIMIT ?", (keep,)
+        ).fetchall()
+        mm = self._vectors()
+        tmp = self.vectors_path.with_suffix(".f32.tmp")
+        with open(tmp, "wb") as f:
+            for _, row, _ in survivors:
+                f.write(np.asarray(mm[row]).tobytes())
+        self._mm = self._mm_ino = None
+        os.replace(tmp, self.vectors_path)
+        self._db.execute("DELETE FROM entries")
+        self._db.executemany(
+            "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+            [(k, i, used) for i, (k, _, used) in enumerate(survivors)],
+        )
+        self._set_meta("entries", len(survivors))
+        self._db.commit()
+        log.info("Embedding cache evicted", model=self.model_name, kept=len(survivors))
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+
+class CachedEmbeddings(Embeddings):
+    '''Embeddings wrapper that serves document vectors from an EmbeddingCache and only embeds misses.'''
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache):
+        self.underlying = underlying
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            fresh = self.underlying.embed_documents(missing)
+            self.cache.put_many(missing, fresh)
+            by_text = dict(zip(missing, fresh))
+            vectors = [v if v is not None else list(by_text[t]) for t, v in zip(texts, vectors)]
+        log.info("Embedding cache lookup", requested=len(texts), embedded=len(missing))
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = await run_blocking(self.cache.get_many, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            fresh = await self.underlying.aembed_documents(missing)
+            await run_blocking(self.cache.put_many, missing, fresh)
+            by_text = dict(zip(missing, fresh))
+            vectors = [v if v is not None else list(by_text[t]) for t, v in zip(texts, vectors)]
+        log.info("Embedding cache lookup", requested=len(texts), embedded=len(missing))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries use a different task type for some providers, so they are not cached.
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.underlying.aembed_query(text)
@@ -0,0 +1,228 @@
+from __future__ import annotations
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from utils.config_loader import load_config
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+TRANSIENT_NAMES = ("Timeout", "Connection", "RateLimit", "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded")
+TRANSIENT_GRPC = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "ABORTED", "INTERNAL"}
+
+
+def _is_transient_link(error: BaseException) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status in TRANSIENT_STATUS:
+        return True
+    # google.api_core exceptions carry the HTTP status as `code` and the gRPC status as `grpc_status_code`
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in TRANSIENT_STATUS:
+        return True
+    if getattr(getattr(error, "grpc_status_code", None), "name", None) in TRANSIENT_GRPC:
+        return True
+    return any(n in type(error).__name__ for n in TRANSIENT_NAMES)
+
+
+def is_transient(error: BaseException) -> bool:
+    '''Best-effort check for errors worth retrying (rate limits, timeouts, 5xx, dropped connections).
+
+    Provider SDKs often wrap the transport error (GoogleGenerativeAIError raised from a
+    google.api_core ResourceExhausted), so every link of the __cause__/__context__ chain is checked.
+    '''
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if _is_transient_link(error):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class TokenBucket:
+    '''Thread-safe token bucket: `rate` tokens per second, bursting up to `capacity`.'''
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        '''Take one token and return how long the caller must wait before using it.'''
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class BatchedEmbeddings(Embeddings):
+    '''Embeddings wrapper that splits inputs into batches, runs a bounded number concurrently,
+    respects a token-bucket rate limit and retries transient failures with jittered backoff.
+    Output order always matches input order.
+    '''
+    _shared: Dict[int, "BatchedEmbeddings"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+    ):
+        self.underlying = underlying
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60.0) if requests_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed")
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self.texts_total = 0
+        self.batches_total = 0
+        self.batches_in_flight = 0
+        self.retries = 0
+        self.busy_seconds = 0.0
+        self._busy_since = 0.0
+
+    @classmethod
+    def from_config(cls, underlying: Embeddings) -> "BatchedEmbeddings":
+        '''Wrap underlying with the settings from the embedding_executor section of config.yaml.'''
+        cfg = load_config().get("embedding_executor", {}) or {}
+        return cls(
+            underlying,
+            batch_size=int(cfg.get("batch_size", 100)),
+            max_concurrency=int(cfg.get("max_concurrency", 4)),
+            requests_per_minute=cfg.get("requests_per_minute"),
+            max_retries=int(cfg.get("max_retries", 5)),
+        )
+
+    @classmethod
+    def shared(cls, underlying: Embeddings) -> "BatchedEmbeddings":
+        '''Process-wide executor per embeddings client, so the rate limit and concurrency are global.'''
+        with cls._shared_lock:
+            executor = cls._shared.get(id(underlying))
+            if executor is None or executor.underlying is not underlying:
+                executor = cls.from_config(underlying)
+                cls._shared[id(underlying)] = executor
+            return executor
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    def _backoff(self, attempt: int) -> float:
+        '''Full-jitter exponential backoff.'''
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _track(self, delta: int):
+        '''Update batches in flight and accumulate wall time during which any batch was running.'''
+        with self._lock:
+            now = time.perf_counter()
+            if self.batches_in_flight == 0 and delta > 0:
+                self._busy_since = now
+            self.batches_in_flight += delta
+            if self.batches_in_flight == 0:
+                self.busy_seconds += now - self._busy_since
+
+    def _record(self, texts: int):
+        with self._lock:
+            self.texts_total += texts
+            self.batches_total += 1
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            if self.bucket:
+                self.bucket.acquire()
+            self._track(1)
+            try:
+                vectors = self.underlying.embed_documents(batch)
+                self._record(len(batch))
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient(e):
+                    raise
+                self.retries += 1
+                delay = self._backoff(attempt)
+                log.warning("Transient embedding failure, retrying", error=str(e), attempt=attempt + 1, delay=round(delay, 2))
+                time.sleep(delay)
+            finally:
+                self._track(-1)
+
+    async def _aembed_batch(self, batch: List[str], sem: asyncio.Semaphore) -> List[List[float]]:
+        async with sem:
+            for attempt in range(self.max_retries + 1):
+                if self.bucket:
+                    await self.bucket.aacquire()
+                self._track(1)
+                try:
+                    vectors = await self.underlying.aembed_documents(batch)
+                    self._record(len(batch))
+                    return vectors
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_transient(e):
+                        raise
+                    self.retries += 1
+                    delay = self._backoff(attempt)
+                    log.warning("Transient embedding failure, retrying", error=str(e), attempt=attempt + 1, delay=round(delay, 2))
+                    await asyncio.sleep(delay)
+                finally:
+                    self._track(-1)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = self._batches(texts)
+        if len(batches) <= 1:
+            results = [self._embed_batch(b) for b in batches]
+        else:
+            results = list(self._pool.map(self._embed_batch, batches))
+        return [v for batch in results for v in batch]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # One semaphore per event loop so concurrency is bounded across concurrent callers
+        sem = self._semaphores.setdefault(id(asyncio.get_running_loop()), asyncio.Semaphore(self.max_concurrency))
+        results = await asyncio.gather(*(self._aembed_batch(b, sem) for b in self._batches(texts)))
+        return [v for batch in results for v in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.underlying.aembed_query(text)
+
+    def metrics(self) -> Dict[str, Any]:
+        '''Throughput counters; texts/sec is over wall time with at least one batch in flight.'''
+        with self._lock:
+            return {
+                "texts_total": self.texts_total,
+                "batches_total": self.batches_total,
+                "batches_in_flight": self.batches_in_flight,
+                "retries": self.retries,
+                "texts_per_sec": round(self.texts_total / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            }
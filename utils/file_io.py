@@ -1,11 +1,17 @@
 from __future__ import annotations
+import io
+import os
 import re
 import uuid
+import shutil
+import hashlib
 from pathlib import Path
 from datetime import datetime
 from zoneinfo import ZoneInfo
-import uuid
-from typing import Iterable, List
+from typing import Iterable, List, Optional, Tuple
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from utils.config_loader import load_config
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 
@@ -16,10 +22,165 @@ def generate_session_id(prefix: str = "session") -> str:
     ist = ZoneInfo("Asia/Kolkata")
     return f"{prefix}_{datetime.now(ist).strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
 
+# Magic bytes a file must carry to be accepted under its extension, and how far in they may start
+_MAGIC = {".pdf": (b"%PDF-", 1024), ".docx": (b"PK\x03\x04", 0)}
+
+
+class UploadRejected(ValueError):
+    '''Raised while saving an upload that is too large (413) or whose content does not match its type (415).'''
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _uploads_config() -> dict:
+    return load_config().get("uploads", {}) or {}
+
+def blob_dir(cfg: Optional[dict] = None) -> Path:
+    '''Directory of the content-addressed upload store (uploads.blob_dir, or UPLOAD_BLOB_DIR).'''
+    cfg = _uploads_config() if cfg is None else cfg
+    return Path(os.getenv("UPLOAD_BLOB_DIR", cfg.get("blob_dir", "data/blobs")))
+
+def max_upload_bytes(cfg: Optional[dict] = None) -> int:
+    cfg = _uploads_config() if cfg is None else cfg
+    return int(float(cfg.get("max_file_mb", 200)) * (1 << 20))
+
+def max_request_bytes(cfg: Optional[dict] = None) -> int:
+    cfg = _uploads_config() if cfg is None else cfg
+    return int(float(cfg.get("max_request_mb", 0) or 0) * (1 << 20))
+
+
+class RequestSizeLimit:
+    '''ASGI middleware capping request bodies at uploads.max_request_mb before they are spooled.
+
+    A larger Content-Length is refused with 413 before any of the body is read; a body that grows
+    past the cap while it is received (chunked, or with a wrong length) is cut off with 413 as well.
+    The per-file size and type checks in store_blob() only run once the upload has been spooled.
+    '''
+
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = max_request_bytes() if max_bytes is None else max_bytes
+
+    def _detail(self) -> str:
+        return f"Request body exceeds the {self.max_bytes >> 20} MB limit"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > self.max_bytes:
+            await JSONResponse({"detail": self._detail()}, status_code=413)(scope, receive, send)
+            return
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+def _stream(uf):
+    '''Binary stream of an upload: the object itself when it can be read in parts, else its buffer.'''
+    if hasattr(uf, "read"):
+        if hasattr(uf, "seek"):
+            uf.seek(0)
+        return uf
+    return io.BytesIO(uf.getbuffer())
+
+def _sniff(first: bytes, ext: str, name: str):
+    magic = _MAGIC.get(ext)
+    if magic is None:
+        return
+    signature, window = magic
+    if first[: window + len(signature)].find(signature) < 0:
+        raise UploadRejected(f"{name} is not a valid {ext[1:].upper()} file", 415)
+
+def store_blob(uf, ext: str, root: Optional[Path] = None, max_bytes: Optional[int] = None,
+               chunk_size: int = 1 << 20, name: str = "file") -> Tuple[Path, str, int]:
+    '''Stream an upload into the blob store in chunk_size pieces, hashing it on the way.
+
+    The first chunk is checked against the magic bytes of ext and the copy stops as soon as it
+    exceeds max_bytes, raising UploadRejected; content already stored under the same sha256 is
+    kept once. Returns (blob path, hex digest, size). For API uploads these checks run on the
+    spooled file; RequestSizeLimit is what bounds the request before it is read.
+    '''
+    root = root or blob_dir()
+    max_bytes = max_upload_bytes() if max_bytes is None else max_bytes
+    declared = getattr(uf, "size", None)
+    if declared is not None and declared > max_bytes:
+        raise UploadRejected(f"{name} exceeds the {max_bytes >> 20} MB upload limit", 413)
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / f".upload-{uuid.uuid4().hex}.tmp"
+    digest, size = hashlib.sha256(), 0
+    try:
+        src = _stream(uf)
+        with open(tmp, "wb") as out:
+            while True:
+                block = src.read(chunk_size)
+                if not block:
+                    break
+                if size == 0:
+                    _sniff(block, ext, name)
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadRejected(f"{name} exceeds the {max_bytes >> 20} MB upload limit", 413)
+                digest.update(block)
+                out.write(block)
+        if size == 0:
+            _sniff(b"", ext, name)
+        hexdigest = digest.hexdigest()
+        blob = root / hexdigest[:2] / f"{hexdigest}{ext}"
+        if blob.exists():
+            # Refresh the mtime so the storage manager's blob sweep leaves it alone while it is linked
+            os.utime(blob)
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, blob)
+        return blob, hexdigest, size
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def link_blob(blob: Path, out: Path):
+    '''Hard-link a stored blob to out (copying when links are not possible, e.g. across devices).'''
+    if out.exists():
+        if out.samefile(blob):
+            return
+        out.unlink()
+    try:
+        os.link(blob, out)
+    except OSError:
+        shutil.copyfile(blob, out)
+
+def save_upload(uf, out: Path) -> str:
+    '''Stream one upload to out through the blob store; returns its sha256.'''
+    out.parent.mkdir(parents=True, exist_ok=True)
+    cfg = _uploads_config()
+    blob, digest, _ = store_blob(
+        uf, out.suffix.lower(), blob_dir(cfg), max_upload_bytes(cfg), int(cfg.get("chunk_kb", 1024)) << 10,
+        name=getattr(uf, "name", out.name),
+    )
+    link_blob(blob, out)
+    return digest
+
 def save_uploaded_files(uploaded_files: Iterable, target_dir: Path) -> List[Path]:
-    """Save uploaded files (Streamlit-like) and return local paths."""
+    """Save uploaded files (Streamlit-like) and return local paths.
+
+    Files are named after their content hash, so uploading the same bytes again (under any name)
+    maps to the same path and is saved only once.
+    """
     try:
         target_dir.mkdir(parents=True, exist_ok=True)
+        cfg = _uploads_config()
+        root, max_bytes, chunk_size = blob_dir(cfg), max_upload_bytes(cfg), int(cfg.get("chunk_kb", 1024)) << 10
         saved: List[Path] = []
         for uf in uploaded_files:
             name = getattr(uf, "name", "file")
@@ -27,19 +188,17 @@ def save_uploaded_files(uploaded_files: Iterable, target_dir: Path) -> List[Path
             if ext not in SUPPORTED_EXTENSIONS:
                 log.warning("Unsupported file skipped", filename=name)
                 continue
-            # Clean file name (only alphanum, dash, underscore)
-            safe_name = re.sub(r'[^a-zA-Z0-9_\-]', '_', Path(name).stem).lower()
-            fname = f"{safe_name}_{uuid.uuid4().hex[:6]}{ext}"
-            fname = f"{uuid.uuid4().hex[:8]}{ext}"
-            out = target_dir / fname
-            with open(out, "wb") as f:
-                if hasattr(uf, "read"):
-                    f.write(uf.read())
-                else:
-                    f.write(uf.getbuffer())  # fallback
+            blob, digest, size = store_blob(uf, ext, root, max_bytes, chunk_size, name=name)
+            out = target_dir / f"{digest[:16]}{ext}"
+            if out in saved:
+                log.info("Duplicate upload skipped", uploaded=name, saved_as=str(out))
+                continue
+            link_blob(blob, out)
             saved.append(out)
-            log.info("File saved for ingestion", uploaded=name, saved_as=str(out))
+            log.info("File saved for ingestion", uploaded=name, saved_as=str(out), sha256=digest, bytes=size)
         return saved
+    except UploadRejected:
+        raise
     except Exception as e:
         log.error("Failed to save uploaded files", error=str(e), dir=str(target_dir))
-        raise DocumentPortalException("Failed to save uploaded files", e) from e
\ No newline at end of file
+        raise DocumentPortalException("Failed to save uploaded files", e) from e
@@ -1,8 +1,11 @@
 import os
 import sys
 import json
+import threading
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
 from utils.config_loader import load_config
+from utils.tracing import span, instrument_llm
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 from logger.custom_logger import CustomLogger
@@ -11,13 +14,54 @@ from exception.custom_exception import DocumentPortalException
 log = CustomLogger().get_logger(__name__)
 
 class ModelLoader:
-    '''Class to load and initialize the model based on configuration.'''
+    '''Class to load and initialize the model based on configuration.
+
+    Configuration and model clients are shared process-wide: the YAML and .env are read once,
+    and each distinct (provider, model, parameters) client is built once and reused so that all
+    components share the same warm HTTP connection pool.
+    '''
+    _config: Optional[Dict[str, Any]] = None
+    _clients: Dict[tuple, Any] = {}
+    _lock = threading.RLock()
+
     def __init__(self):
         '''Initialize the ModelLoader with configuration and environment variables.'''
-        self.config = load_config()
-        load_dotenv()
+        with ModelLoader._lock:
+            if ModelLoader._config is None:
+                load_dotenv()
+                ModelLoader._config = load_config()
+                log.info("Configuration loaded successfully",  config_keys = list(ModelLoader._config.keys()))
+        self.config = ModelLoader._config
         self._validate_env()
-        log.info("Configuration loaded successfully",  config_keys = list(self.config.keys()))
+
+    @classmethod
+    def reset(cls):
+        '''Drop the cached configuration and model clients (used by tests and config reloads).'''
+        with cls._lock:
+            cls._config = None
+            cls._clients.clear()
+
+    @classmethod
+    def warmup(cls):
+        '''Build the configured LLM and embedding clients ahead of the first request.'''
+        loader = cls()
+        loader.load_embeddings()
+        loader.load_llm()
+        log.info("Model clients warmed up", clients=len(cls._clients))
+
+    def _shared(self, key: tuple, factory):
+        '''Return the client registered under key, building it with factory on first use.'''
+        client = ModelLoader._clients.get(key)
+        if client is not None:
+            return client
+        with ModelLoader._lock:
+            client = ModelLoader._clients.get(key)
+            if client is None:
+                with span("model.load"):
+                    client = factory()
+                ModelLoader._clients[key] = client
+                log.info("Model client created", key=list(key))
+            return client
 
     def _validate_env(self):
         '''Validate required environment variables.'''
@@ -31,9 +75,11 @@ class ModelLoader:
     def load_embeddings(self):
         '''Load and return the embedding model based on configuration.'''
         try:
-            log.info("Loading embedding model...")
             model_name = self.config['embedding_model']['model_name']
-            return GoogleGenerativeAIEmbeddings(model=model_name)
+            return self._shared(
+                ("embeddings", "google", model_name),
+                lambda: GoogleGenerativeAIEmbeddings(model=model_name),
+            )
         except Exception as e:
             log.error("Failed to load embedding model", error=str(e))
             raise DocumentPortalException("Failed to load embedding model", sys)
@@ -41,7 +87,6 @@ class ModelLoader:
     def load_llm(self):
         '''Load and return the language model based on configuration.'''
         llm_block = self.config['llm']
-        log.info("Loading language model...")
         provider_key = os.getenv("LLM_PROVIDER", "google") # default
         if provider_key not in llm_block:
             log.error("LLM provider not supported", provider=provider_key)
@@ -53,12 +98,12 @@ class ModelLoader:
         temperature = llm_config.get('temperature', 0.2) 
         max_tokens = llm_config.get('max_tokens', 2048)
 
-        log.info("LLM configuration", provider=provider, model_name=model_name, temperature=temperature, max_tokens=max_tokens)
+        key = ("llm", provider, model_name, temperature, max_tokens)
 
         if provider == "groq":
-            return ChatGroq(model=model_name, api_key=self.api_keys["GROQ_API_KEY"], temperature=temperature, max_tokens=max_tokens)
+            return self._shared(key, lambda: instrument_llm(ChatGroq(model=model_name, api_key=self.api_keys["GROQ_API_KEY"], temperature=temperature, max_tokens=max_tokens)))
         elif provider == "google":
-            return ChatGoogleGenerativeAI(model=model_name, api_key=self.api_keys["GOOGLE_API_KEY"], temperature=temperature, max_output_tokens=max_tokens)
+            return self._shared(key, lambda: instrument_llm(ChatGoogleGenerativeAI(model=model_name, api_key=self.api_keys["GOOGLE_API_KEY"], temperature=temperature, max_output_tokens=max_tokens)))
         else:
             log.error("LLM provider not supported", provider=provider)
             raise ValueError(f"LLM provider '{provider}' is not supported")
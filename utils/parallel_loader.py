@@ -0,0 +1,162 @@
+'''Process-parallel document parsing used by utils.document_ops.load_documents.
+
+Kept free of logging/model imports so that spawned worker processes start quickly.
+'''
+from __future__ import annotations
+import os
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from utils.config_loader import load_config
+from utils.pdf_engine import iter_pdf_pages, page_count, rebase_offsets
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ParseTask:
+    '''One unit of parsing work: a whole file, or a page range [start, end) of a PDF.'''
+    path: str
+    ext: str
+    start: int = 0
+    end: Optional[int] = None
+
+
+@dataclass
+class ParseResult:
+    documents: List[Document] = field(default_factory=list)
+    failures: List[Dict[str, str]] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+
+def parse_task(task: ParseTask) -> Tuple[List[Document], Optional[str]]:
+    '''Parse one task; errors are returned rather than raised so one bad file cannot sink a batch.'''
+    try:
+        if task.ext == ".pdf":
+            return list(iter_pdf_pages(task.path, task.start, task.end)), None
+        from langchain_community.document_loaders import Docx2txtLoader, TextLoader
+
+        if task.ext == ".docx":
+            return Docx2txtLoader(task.path).load(), None
+        return TextLoader(task.path, encoding="utf-8").load(), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+
+def _pdf_page_count(path: str) -> Optional[int]:
+    try:
+        return page_count(path)
+    except Exception:
+        return None
+
+
+def plan_tasks(paths: Iterable[Path], pages_per_task: int = 50) -> Tuple[List[ParseTask], List[str]]:
+    '''Split the input into parse tasks, fanning large PDFs out into page ranges.'''
+    tasks: List[ParseTask] = []
+    skipped: List[str] = []
+    for p in paths:
+        ext = Path(p).suffix.lower()
+        if ext not in SUPPORTED_EXTENSIONS:
+            skipped.append(str(p))
+            continue
+        pages = _pdf_page_count(str(p)) if ext == ".pdf" and pages_per_task > 0 else None
+        if pages and pages > pages_per_task:
+            for start in range(0, pages, pages_per_task):
+                tasks.append(ParseTask(str(p), ext, start, start + pages_per_task))
+        else:
+            tasks.append(ParseTask(str(p), ext))
+    return tasks, skipped
+
+
+def pool_size() -> int:
+    '''Worker processes in the shared pool: document_parsing.max_workers, else the CPU count.'''
+    cfg = load_config().get("document_parsing", {}) or {}
+    return max(1, int(cfg.get("max_workers") or os.cpu_count() or 1))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    '''Persistent worker pool, created once at pool_size() and shared by every caller.
+
+    Spawned (not forked) because the server process is multi-threaded. It is never resized:
+    callers limit their own parallelism by how many tasks they keep submitted.
+    '''
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = pool_size()
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+            _pool_workers = 0
+
+
+def iter_parsed(
+    tasks: Sequence[ParseTask],
+    max_workers: Optional[int] = None,
+) -> Iterator[Tuple[ParseTask, List[Document], Optional[str]]]:
+    '''Yield (task, documents, error) in task order, keeping at most max_workers tasks in flight.
+
+    max_workers only bounds this call; the shared pool keeps its size, so concurrent callers
+    queue on the same workers instead of replacing the pool under each other.
+    '''
+    workers = max(1, min(max_workers or len(tasks), len(tasks)))
+    if workers == 1:
+        for task in tasks:
+            yield (task, *parse_task(task))
+        return
+
+    pool = _get_pool()
+    workers = max(1, min(workers, _pool_workers))
+    pending = iter(tasks)
+    window = deque((t, pool.submit(parse_task, t)) for t in itertools.islice(pending, workers))
+    while window:
+        task, future = window.popleft()
+        docs, error = future.result()
+        nxt = next(pending, None)
+        if nxt is not None:
+            window.append((nxt, pool.submit(parse_task, nxt)))
+        yield task, docs, error
+
+
+def parse_files(
+    paths: Iterable[Path],
+    max_workers: Optional[int] = None,
+    pages_per_task: int = 50,
+) -> ParseResult:
+    '''Parse files across a process pool, returning documents in input (file, page) order.'''
+    tasks, skipped = plan_tasks(paths, pages_per_task)
+
+    result = ParseResult(skipped=skipped)
+    by_file: Dict[str, List[Document]] = {}
+    errors: Dict[str, str] = {}
+    for task, docs, error in iter_parsed(tasks, max_workers):
+        if error is not None:
+            errors.setdefault(task.path, error)
+        by_file.setdefault(task.path, []).extend(docs)
+    for path, docs in by_file.items():
+        if path in errors:
+            result.failures.append({"path": path, "error": errors[path]})
+        elif Path(path).suffix.lower() == ".pdf":
+            result.documents.extend(rebase_offsets(docs))
+        else:
+            result.documents.extend(docs)
+    return result
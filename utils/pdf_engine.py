@@ -0,0 +1,117 @@
+'''PyMuPDF-based PDF extraction shared by the analyzer, comparator and chat ingestion.
+
+Pages are produced lazily as Documents with consistent metadata:
+source, page (0-based), total_pages, start_char/end_char (offsets of the page in the
+concatenated document text, pages joined by a single newline).
+'''
+from __future__ import annotations
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import fitz  # PyMuPDF
+from langchain_core.documents import Document
+
+PathLike = Union[str, Path]
+
+_PDF_DATE = re.compile(r"^D:(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?([Zz]|[+-]\d{2}'?\d{2}'?)?")
+_AUTHOR_SPLIT = re.compile(r"\s*(?:;|,|\band\b|&)\s*")
+
+
+def _open(path: PathLike) -> "fitz.Document":
+    doc = fitz.open(str(path))
+    if doc.needs_pass:
+        doc.close()
+        raise ValueError(f"PDF is encrypted: {Path(path).name}")
+    return doc
+
+
+def page_count(path: PathLike) -> int:
+    with _open(path) as doc:
+        return doc.page_count
+
+
+def iter_pdf_pages(
+    path: PathLike,
+    start: int = 0,
+    end: Optional[int] = None,
+    start_char: int = 0,
+) -> Iterator[Document]:
+    '''Yield one Document per page in [start, end) without materializing the whole text.
+
+    start_char is the offset of page `start` in the document text; it is only known
+    by the caller when iterating a later page range.
+    '''
+    with _open(path) as doc:
+        total = doc.page_count
+        end = total if end is None else min(end, total)
+        offset = start_char
+        for n in range(start, end):
+            text = doc.load_page(n).get_text()
+            yield Document(
+                page_content=text,
+                metadata={
+                    "source": str(path),
+                    "page": n,
+                    "total_pages": total,
+                    "start_char": offset,
+                    "end_char": offset + len(text),
+                },
+            )
+            offset += len(text) + 1
+
+
+def rebase_offsets(pages: Iterable[Document]) -> List[Document]:
+    '''Recompute start_char/end_char for consecutive pages of one file (e.g. after parallel page ranges).'''
+    out, offset = [], 0
+    for d in pages:
+        d.metadata["start_char"] = offset
+        d.metadata["end_char"] = offset + len(d.page_content)
+        offset += len(d.page_content) + 1
+        out.append(d)
+    return out
+
+
+def read_pdf_text(path: PathLike, header: str = "\n--- Page {page} ---\n", skip_empty: bool = False) -> str:
+    '''Concatenate all pages, each prefixed with `header` (formatted with the 1-based page number).'''
+    parts = []
+    for d in iter_pdf_pages(path):
+        if skip_empty and not d.page_content.strip():
+            continue
+        parts.append(header.format(page=d.metadata["page"] + 1) + d.page_content)
+    return "\n".join(parts)
+
+
+
+def _pdf_date(value: str) -> str:
+    '''ISO 8601 form of a PDF date string ("D:20240102030405+01'00'"), or "" if it cannot be parsed.'''
+    m = _PDF_DATE.match(value or "")
+    if not m:
+        return ""
+    year, month, day, hour, minute, second, tz = m.groups()
+    date = f"{year}-{month or '01'}-{day or '01'}"
+    if hour is None:
+        return date
+    out = f"{date}T{hour}:{minute or '00'}:{second or '00'}"
+    if tz:
+        out += "Z" if tz in "Zz" else f"{tz[:3]}:{tz.replace(chr(39), '')[3:5] or '00'}"
+    return out
+
+
+def pdf_metadata(path: PathLike) -> Dict[str, Any]:
+    '''Document-level fields available without reading any text: Title, Author, DateCreated,
+    LastModifiedDate, PageCount. Fields missing from the PDF info dictionary are omitted.'''
+    with _open(path) as doc:
+        info = doc.metadata or {}
+        out: Dict[str, Any] = {"PageCount": doc.page_count}
+    title = (info.get("title") or "").strip()
+    if title:
+        out["Title"] = title
+    authors = [a for a in _AUTHOR_SPLIT.split((info.get("author") or "").strip()) if a]
+    if authors:
+        out["Author"] = authors
+    for key, field in (("creationDate", "DateCreated"), ("modDate", "LastModifiedDate")):
+        date = _pdf_date(info.get(key) or "")
+        if date:
+            out[field] = date
+    return out
@@ -0,0 +1,147 @@
+from __future__ import annotations
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from utils.config_loader import load_config
+from utils.tracing import cache_event
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+
+def file_sha256(fileobj, chunk_size: int = 1 << 20) -> str:
+    '''sha256 of a binary file object read from the start in chunks; the position is reset to 0 afterwards.'''
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    '''Persistent cache of /analyze and /compare results keyed by the uploaded content.
+
+    Keys combine the sha256 of each uploaded file with the request options, the configured prompt
+    version and the LLM model name, so editing prompts (and bumping result_cache.prompt_version) or
+    switching models never serves stale results. Values are JSON in an SQLite table capped at
+    max_bytes, evicted least recently used first.
+    '''
+    _shared: Optional["ResultCache"] = None
+    _shared_built = False
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: str, max_bytes: int = 256 << 20, ttl_seconds: float = 0,
+                 prompt_version: str = "1", model_name: str = ""):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.prompt_version = str(prompt_version)
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def shared(cls) -> Optional["ResultCache"]:
+        '''Return the process-wide cache configured in config.yaml, or None if disabled.'''
+        with cls._shared_lock:
+            if not cls._shared_built:
+                config = load_config()
+                cfg = config.get("result_cache", {}) or {}
+                if cfg.get("enabled", True):
+                    llm = (config.get("llm", {}) or {}).get(os.getenv("LLM_PROVIDER", "google"), {}) or {}
+                    cls._shared = cls(
+                        path=os.getenv("RESULT_CACHE_PATH", cfg.get("path", "result_cache/results.sqlite")),
+                        max_bytes=int(float(cfg.get("max_mb", 256)) * (1 << 20)),
+                        ttl_seconds=float(cfg.get("ttl_seconds", 0) or 0),
+                        prompt_version=str(cfg.get("prompt_version", 1)),
+                        model_name=f"{llm.get('provider', '')}/{llm.get('model_name', '')}",
+                    )
+                cls._shared_built = True
+            return cls._shared
+
+    def key(self, kind: str, digests: Sequence[str], params: Optional[Dict[str, Any]] = None) -> str:
+        '''Cache key of one request: upload digests in order, options, prompt version and model.'''
+        payload = {
+            "kind": kind,
+            "files": list(digests),
+            "params": params or {},
+            "prompt_version": self.prompt_version,
+            "model": self.model_name,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                cache_event("result", False)
+                return None
+            self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        cache_event("result", True)
+        return json.loads(row[0])
+
+    def put(self, key: str, kind: str, value: Any):
+        data = json.dumps(value, ensure_ascii=False, default=str)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            log.warning("Result too large to cache", kind=kind, bytes=size)
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, kind, value, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, data, size, now, now),
+            )
+            self._db.commit()
+            if self._total_bytes() > self.max_bytes:
+                self._evict()
+
+    def _total_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _evict(self):
+        '''Drop least recently used results down to 90% of max_bytes.'''
+        target = int(self.max_bytes * 0.9)
+        total, dropped = self._total_bytes(), []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY last_used ASC").fetchall():
+            if total <= target:
+                break
+            dropped.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM results WHERE key = ?", dropped)
+        self._db.commit()
+        log.info("Result cache evicted", dropped=len(dropped), bytes=total)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries, "bytes": size, "max_bytes": self.max_bytes, "hits": self.hits,
+            "misses": self.misses, "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,348 @@
+'''Disk quotas and garbage collection for per-request session directories.
+
+Each service keeps one directory per session under its roots (the chat service has two: uploads
+and FAISS index, sharing the session id). A small SQLite index records every session's paths,
+size and last access. Requests only touch() their session, which marks it dirty; a background pass
+lists the roots (top level only), measures dirty or changed sessions, and evicts the least recently
+used ones while a per-service or global byte quota is exceeded. Sessions that are pinned (loaded
+in the session registry, or part of a queued/running ingestion job) or used within min_idle_seconds
+are never evicted. The same pass removes blob-store files no session links to any more.
+
+Files hard-linked between a session and the blob store are counted size / link count in each
+place, so the totals add up to the bytes actually on disk.
+'''
+from __future__ import annotations
+import os
+import json
+import time
+import shutil
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from utils.config_loader import load_config
+from utils.concurrency import run_blocking
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+
+def disk_usage(path: str) -> int:
+    '''Bytes under path, with hard-linked files split across their links.'''
+    total = 0.0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    total += disk_usage(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    total += st.st_size / max(st.st_nlink, 1)
+    except FileNotFoundError:
+        pass
+    return int(total)
+
+
+class StorageManager:
+    '''Session size/last-access index with per-service and global LRU quotas.'''
+
+    def __init__(self, db_path: str, roots: Dict[str, List[str]], quotas: Optional[Dict[str, int]] = None,
+                 max_total_bytes: int = 0, interval_seconds: float = 60, min_idle_seconds: float = 600,
+                 blob_root: Optional[str] = None, blob_grace_seconds: float = 3600, enabled: bool = True,
+                 pinned: Iterable[Callable[[], Iterable[str]]] = (),
+                 on_evict: Optional[Callable[[str, str, List[str]], None]] = None):
+        self.roots = {name: [os.path.abspath(r) for r in paths] for name, paths in roots.items()}
+        self.quotas = {name: int((quotas or {}).get(name, 0) or 0) for name in self.roots}
+        self.max_total_bytes = max_total_bytes
+        self.interval_seconds = interval_seconds
+        self.min_idle_seconds = min_idle_seconds
+        self.blob_root = os.path.abspath(blob_root) if blob_root else None
+        self.blob_grace_seconds = blob_grace_seconds
+        self.enabled = enabled
+        self.pinned = list(pinned)
+        self.on_evict = on_evict
+        # Service roots, the blob store and their parents are never sessions of another root
+        self._excluded: Set[str] = set()
+        for path in [r for paths in self.roots.values() for r in paths] + ([self.blob_root] if self.blob_root else []):
+            self._excluded.update([path] + [str(p) for p in Path(path).parents])
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (service TEXT NOT NULL, session_id TEXT NOT NULL, paths TEXT NOT NULL,"
+            " bytes INTEGER NOT NULL DEFAULT 0, dirty INTEGER NOT NULL DEFAULT 1, signature INTEGER,"
+            " created REAL NOT NULL, last_access REAL NOT NULL, PRIMARY KEY (service, session_id))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_lru ON sessions (last_access)")
+        self._db.commit()
+        self._task: Optional[asyncio.Task] = None
+        self._blob_usage = {"files": 0, "bytes": 0}
+        self._next_blob_pass = 0.0
+        self.evicted_sessions = 0
+        self.evicted_bytes = 0
+        self.blobs_removed = 0
+        self.last_collect: Dict[str, Any] = {}
+
+    @classmethod
+    def from_config(cls, roots: Dict[str, List[str]], blob_root: Optional[str] = None,
+                    pinned: Iterable[Callable[[], Iterable[str]]] = (),
+                    on_evict: Optional[Callable[[str, str, List[str]], None]] = None) -> "StorageManager":
+        '''Build a manager from the storage section of config.yaml (db path overridable by STORAGE_INDEX_DB).'''
+        cfg = load_config().get("storage", {}) or {}
+        mb = 1 << 20
+        return cls(
+            db_path=os.getenv("STORAGE_INDEX_DB", cfg.get("db_path", "storage_index.sqlite")),
+            roots=roots,
+            quotas={name: int(float(v or 0) * mb) for name, v in (cfg.get("quotas_mb", {}) or {}).items()},
+            max_total_bytes=int(float(cfg.get("max_total_mb", 0) or 0) * mb),
+            interval_seconds=float(cfg.get("interval_seconds", 60)),
+            min_idle_seconds=float(cfg.get("min_idle_seconds", 600)),
+            blob_root=blob_root,
+            blob_grace_seconds=float(cfg.get("blob_grace_seconds", 3600)),
+            enabled=bool(cfg.get("enabled", True)),
+            pinned=pinned,
+            on_evict=on_evict,
+        )
+
+    # ---------- request path ----------
+    def touch(self, service: str, session_id: str, written: bool = True):
+        '''Record an access to a session; sessions written to are re-measured on the next pass.'''
+        now = time.time()
+        paths = json.dumps([os.path.join(r, session_id) for r in self.roots[service]])
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (service, session_id, paths, dirty, created, last_access) VALUES (?, ?, ?, 1, ?, ?)"
+                " ON CONFLICT (service, session_id) DO UPDATE SET last_access = excluded.last_access,"
+                " dirty = MAX(dirty, ?)",
+                (service, session_id, paths, now, now, int(written)),
+            )
+            self._db.commit()
+
+    # ---------- background pass ----------
+    def start(self):
+        '''Run collect() every interval_seconds on the running event loop.'''
+        if self._task is None and self.enabled:
+            self._task = asyncio.create_task(self._loop())
+            log.info("Storage manager started", interval_seconds=self.interval_seconds, roots=self.roots)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        with self._lock:
+            self._db.close()
+
+    async def _loop(self):
+        while True:
+            try:
+                await run_blocking(self.collect)
+            except Exception as e:
+                log.error("Storage collection failed", error=str(e))
+            await asyncio.sleep(self.interval_seconds)
+
+    def _list_sessions(self, service: str) -> Dict[str, Dict[str, Any]]:
+        '''Session directories of a service on disk: id -> paths and newest directory mtime.'''
+        found: Dict[str, Dict[str, Any]] = {}
+        for root in self.roots[service]:
+            try:
+                with os.scandir(root) as it:
+                    for entry in it:
+                        if not entry.is_dir(follow_symlinks=False) or entry.path in self._excluded:
+                            continue
+                        session = found.setdefault(entry.name, {"signature": 0})
+                        session["signature"] = max(session["signature"], entry.stat().st_mtime_ns)
+            except FileNotFoundError:
+                continue
+        for session_id, session in found.items():
+            session["paths"] = [os.path.join(r, session_id) for r in self.roots[service]]
+        return found
+
+    def scan(self) -> Dict[str, int]:
+        '''Reconcile the index with the session directories on disk and re-measure changed sessions.'''
+        added = removed = measured = 0
+        for service in self.roots:
+            on_disk = self._list_sessions(service)
+            with self._lock:
+                rows = {
+                    sid: (dirty, sig)
+                    for sid, dirty, sig in self._db.execute(
+                        "SELECT session_id, dirty, signature FROM sessions WHERE service = ?", (service,)
+                    )
+                }
+            gone = [(service, sid) for sid in rows if sid not in on_disk]
+            started, new_rows, sizes = time.time(), [], []
+            for session_id, session in on_disk.items():
+                if session_id in rows and not rows[session_id][0] and rows[session_id][1] == session["signature"]:
+                    continue
+                if session_id not in rows:
+                    # Sessions found on disk start from their directory mtime
+                    last = session["signature"] / 1e9
+                    new_rows.append((service, session_id, json.dumps(session["paths"]), last, last))
+                sizes.append((sum(disk_usage(p) for p in session["paths"]), session["signature"], started, service, session_id))
+            if sizes:
+                with self._lock:
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO sessions (service, session_id, paths, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                        new_rows,
+                    )
+                    # A session touched while it was being measured stays dirty
+                    self._db.executemany(
+                        "UPDATE sessions SET bytes = ?, signature = ?, dirty = CASE WHEN last_access > ? THEN dirty ELSE 0 END"
+                        " WHERE service = ? AND session_id = ?",
+                        sizes,
+                    )
+                    self._db.commit()
+                added += len(new_rows)
+                measured += len(sizes)
+            if gone:
+                # Rows touched but not yet written to disk are kept while recent
+                cutoff = time.time() - self.min_idle_seconds
+                with self._lock:
+                    cur = self._db.executemany(
+                        "DELETE FROM sessions WHERE service = ? AND session_id = ? AND last_access < ?",
+                        [(s, sid, cutoff) for s, sid in gone],
+                    )
+                    removed += cur.rowcount
+                    self._db.commit()
+        return {"added": added, "removed": removed, "measured": measured}
+
+    def _pinned_paths(self) -> Set[str]:
+        paths: Set[str] = set()
+        for source in self.pinned:
+            try:
+                paths.update(os.path.abspath(p) for p in source())
+            except Exception as e:
+                log.warning("Pinned session source failed", error=str(e))
+        return paths
+
+    def _candidates(self, service: Optional[str], pinned: Set[str], now: float) -> List[tuple]:
+        '''Evictable sessions, least recently used first.'''
+        sql = "SELECT service, session_id, paths, bytes, last_access FROM sessions"
+        args: tuple = ()
+        if service is not None:
+            sql, args = sql + " WHERE service = ?", (service,)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY last_access ASC", args).fetchall()
+        return [
+            (svc, sid, json.loads(paths), size)
+            for svc, sid, paths, size, last in rows
+            if now - last >= self.min_idle_seconds and not pinned.intersection(json.loads(paths))
+        ]
+
+    def _evict(self, service: str, session_id: str, paths: List[str], size: int):
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE service = ? AND session_id = ?", (service, session_id))
+            self._db.commit()
+        self.evicted_sessions += 1
+        self.evicted_bytes += size
+        log.info("Session evicted from disk", service=service, session_id=session_id, bytes=size)
+        if self.on_evict is not None:
+            self.on_evict(service, session_id, paths)
+
+    def _over(self, service: Optional[str]) -> int:
+        '''Bytes to free (down to 90% of the quota) for a service, or globally when service is None.'''
+        limit = self.max_total_bytes if service is None else self.quotas.get(service, 0)
+        if not limit:
+            return 0
+        used = self._usage_bytes(service)
+        return used - int(limit * 0.9) if used > limit else 0
+
+    def enforce(self) -> int:
+        '''Evict least recently used sessions until every quota holds; returns the sessions evicted.'''
+        now, pinned, evicted = time.time(), self._pinned_paths(), 0
+        for service in list(self.roots) + [None]:
+            excess = self._over(service)
+            if not excess:
+                continue
+            for svc, sid, paths, size in self._candidates(service, pinned, now):
+                if excess <= 0:
+                    break
+                self._evict(svc, sid, paths, size)
+                excess -= size
+                evicted += 1
+            if excess > 0:
+                log.warning("Storage quota still exceeded; remaining sessions are pinned or in use",
+                            service=service or "total", excess_bytes=excess)
+        return evicted
+
+    def collect_blobs(self) -> int:
+        '''Delete blob-store files no session links to (and stale partial uploads) older than the grace period.'''
+        if not self.blob_root:
+            return 0
+        cutoff, removed, files, size = time.time() - self.blob_grace_seconds, 0, 0, 0.0
+        for dirpath, _, names in os.walk(self.blob_root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if st.st_mtime < cutoff and (st.st_nlink <= 1 or name.startswith(".upload-")):
+                    os.unlink(path)
+                    removed += 1
+                    continue
+                files += 1
+                size += st.st_size / max(st.st_nlink, 1)
+        self._blob_usage = {"files": files, "bytes": int(size)}
+        self.blobs_removed += removed
+        return removed
+
+    def collect(self) -> Dict[str, Any]:
+        '''One garbage-collection pass: reconcile, enforce quotas, and (at most every grace period) sweep blobs.'''
+        t0 = time.perf_counter()
+        result: Dict[str, Any] = self.scan()
+        result["evicted"] = self.enforce()
+        if time.time() >= self._next_blob_pass or result["evicted"]:
+            result["blobs_removed"] = self.collect_blobs()
+            self._next_blob_pass = time.time() + min(self.blob_grace_seconds, 3600)
+        result["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        result["at"] = time.time()
+        self.last_collect = result
+        if result["evicted"] or result["added"] or result["removed"] or result.get("blobs_removed"):
+            log.info("Storage collection finished", **result)
+        return result
+
+    # ---------- stats ----------
+    def _usage_bytes(self, service: Optional[str]) -> int:
+        with self._lock:
+            if service is None:
+                return self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM sessions").fetchone()[0] + self._blob_usage["bytes"]
+            return self._db.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM sessions WHERE service = ?", (service,)
+            ).fetchone()[0]
+
+    def usage(self) -> Dict[str, Any]:
+        pinned = self._pinned_paths()
+        with self._lock:
+            rows = self._db.execute("SELECT service, paths, bytes, dirty, last_access FROM sessions").fetchall()
+        services = {
+            name: {"sessions": 0, "bytes": 0, "max_bytes": self.quotas.get(name, 0), "pinned": 0, "unmeasured": 0,
+                   "oldest_access": None}
+            for name in self.roots
+        }
+        for service, paths, size, dirty, last in rows:
+            s = services.setdefault(service, {"sessions": 0, "bytes": 0, "max_bytes": 0, "pinned": 0,
+                                              "unmeasured": 0, "oldest_access": None})
+            s["sessions"] += 1
+            s["bytes"] += size
+            s["unmeasured"] += dirty
+            s["pinned"] += bool(pinned.intersection(json.loads(paths)))
+            s["oldest_access"] = last if s["oldest_access"] is None else min(s["oldest_access"], last)
+        return {
+            "total_bytes": sum(s["bytes"] for s in services.values()) + self._blob_usage["bytes"],
+            "max_total_bytes": self.max_total_bytes,
+            "services": services,
+            "blobs": dict(self._blob_usage),
+            "evicted_sessions": self.evicted_sessions,
+            "evicted_bytes": self.evicted_bytes,
+            "blobs_removed": self.blobs_removed,
+            "last_collect": self.last_collect,
+        }
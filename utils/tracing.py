@@ -0,0 +1,315 @@
+'''Lightweight stage tracing and Prometheus-style metrics.
+
+span("stage") times a block of work: the duration goes to the docportal_stage_seconds histogram
+and, inside a request (or any stage_scope()), to that scope's stage totals, which the API logs
+with the request. Scopes live in a ContextVar, so timings recorded on worker threads
+(run_blocking copies the context) and in child tasks land in the right request. LLM token counts
+come from a LangChain callback attached to the model clients; caches and chunk counts report
+through cache_event() and observe_count(). render_metrics() returns the Prometheus text format.
+
+With tracing.enabled false in config.yaml every helper returns after one flag check, span()
+hands back a shared no-op context manager, and no callback or middleware is installed.
+'''
+from __future__ import annotations
+import os
+import time
+import uuid
+import bisect
+import inspect
+import functools
+import threading
+import contextvars
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import structlog
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils.config_loader import load_config
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+_enabled: Optional[bool] = None
+_scope: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("trace_scope", default=None)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    '''Cumulative-bucket histogram with labels, rendered in the Prometheus text format.'''
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: Any):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in sorted(self._series.items())]
+        for labels, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = _labels(self.labelnames, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]:.6g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    '''Monotonic counter with labels.'''
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: Any):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._series.items())
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {value:.6g}" for labels, value in items]
+        return lines
+
+
+STAGE_SECONDS = Histogram("docportal_stage_seconds", "Time spent in each pipeline stage.", ("stage",))
+REQUEST_SECONDS = Histogram("docportal_request_seconds", "HTTP request latency.", ("route", "method", "status"))
+LLM_TOKENS = Histogram("docportal_llm_tokens", "Tokens per LLM call.", ("kind",), TOKEN_BUCKETS)
+COUNTS = Histogram("docportal_items", "Items handled per stage (chunks, pages, documents).", ("stage",), COUNT_BUCKETS)
+CACHE_EVENTS = Counter("docportal_cache_events_total", "Cache lookups by cache and result.", ("cache", "result"))
+METRICS = (STAGE_SECONDS, REQUEST_SECONDS, LLM_TOKENS, COUNTS, CACHE_EVENTS)
+
+
+def enabled() -> bool:
+    '''Whether tracing is on (tracing.enabled in config.yaml, overridable by TRACING_ENABLED); read once.'''
+    global _enabled
+    if _enabled is None:
+        env = os.getenv("TRACING_ENABLED")
+        if env is not None:
+            _enabled = env.strip().lower() in ("1", "true", "yes", "on")
+        else:
+            _enabled = bool((load_config().get("tracing", {}) or {}).get("enabled", True))
+    return _enabled
+
+
+def set_enabled(value: bool):
+    global _enabled
+    _enabled = value
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.stage)
+        scope = _scope.get()
+        if scope is not None:
+            scope.append((self.stage, elapsed))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    '''Context manager timing one stage.'''
+    if _enabled is False or not enabled():
+        return _NO_SPAN
+    return _Span(stage)
+
+
+def traced(stage: str):
+    '''Decorator form of span() for sync and async functions.'''
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def traced_iter(iterable: Iterable, stage: str) -> Iterator:
+    '''Yield from iterable, timing only the work of producing each item (e.g. parsing in a pipeline).'''
+    if not enabled():
+        yield from iterable
+        return
+    it = iter(iterable)
+    while True:
+        with span(stage):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def observe_count(stage: str, n: int):
+    if enabled():
+        COUNTS.observe(n, stage)
+
+
+def cache_event(cache: str, hit: bool, n: int = 1):
+    if enabled() and n:
+        CACHE_EVENTS.inc(n, cache, "hit" if hit else "miss")
+
+
+class stage_scope:
+    '''Collect the stage timings recorded inside the block (in this context and its children).'''
+    __slots__ = ("entries", "_token")
+
+    def __enter__(self) -> "stage_scope":
+        self.entries: List[Tuple[str, float]] = []
+        self._token = _scope.set(self.entries if enabled() else None)
+        return self
+
+    def __exit__(self, *exc):
+        _scope.reset(self._token)
+        return False
+
+    def summary(self) -> Dict[str, float]:
+        '''Milliseconds per stage, summed over repeated spans.'''
+        totals: Dict[str, float] = {}
+        for stage, seconds in list(self.entries):
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return {stage: round(s * 1000, 1) for stage, s in totals.items()}
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    '''Records prompt/completion token counts of every LLM call.'''
+
+    def on_llm_end(self, response, **kwargs: Any):
+        for generations in response.generations:
+            for gen in generations:
+                usage = getattr(getattr(gen, "message", None), "usage_metadata", None) or {}
+                if usage:
+                    LLM_TOKENS.observe(usage.get("input_tokens", 0), "prompt")
+                    LLM_TOKENS.observe(usage.get("output_tokens", 0), "completion")
+                else:
+                    # Estimated at ~4 characters per token when the provider reports no usage
+                    LLM_TOKENS.observe(max(1, len(gen.text) // 4), "completion_estimated")
+
+
+LLM_CALLBACK = LLMMetricsCallback()
+
+
+def instrument_llm(llm):
+    '''Attach the token callback to an LLM client (once) when tracing is enabled; returns the client.'''
+    if enabled():
+        callbacks = list(getattr(llm, "callbacks", None) or [])
+        if LLM_CALLBACK not in callbacks:
+            try:
+                llm.callbacks = callbacks + [LLM_CALLBACK]
+            except Exception as e:
+                log.warning("LLM client not instrumented", error=str(e))
+    return llm
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+class TracingMiddleware:
+    '''ASGI middleware: binds a request id for structlog, scopes stage timings to the request and
+    logs them, with the request latency, once the response body is fully sent.'''
+
+    def __init__(self, app, skip_paths: Sequence[str] = ("/metrics", "/health", "/static")):
+        self.app = app
+        self.skip_paths = tuple(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_paths):
+            await self.app(scope, receive, send)
+            return
+        request_id = uuid.uuid4().hex[:16]
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", []).append((b"x-request-id", request_id.encode()))
+            await send(message)
+
+        tokens = structlog.contextvars.bind_contextvars(request_id=request_id)
+        try:
+            with stage_scope() as stages:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            endpoint = scope.get("endpoint")
+            route = getattr(endpoint, "__name__", None) or "unmatched"
+            REQUEST_SECONDS.observe(elapsed, route, scope["method"], status["code"])
+            log.info(
+                "Request completed",
+                method=scope["method"],
+                path=scope["path"],
+                route=route,
+                status=status["code"],
+                duration_ms=round(elapsed * 1000, 1),
+                stages=stages.summary(),
+            )
+            structlog.contextvars.reset_contextvars(**tokens)